@@ -0,0 +1,49 @@
+"""
+Camera frames per second written by H5Builder with gzip compression done by h5py on the writer
+thread (0 workers), then by 1 to N compression threads with direct chunk writes.
+
+    python -m laser_monitoring.Benchmarks.Chunk_Benchmark
+"""
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from laser_monitoring.Data_Saver.h5_Builder import H5Builder
+
+frames = 200
+batch = 20  # Frames per append_rows, as DataSaver batches them
+shape = (808, 608)
+compression = {'codec': 'gzip', 'level': 4, 'shuffle': True}
+
+
+def frames_per_second(workers: int, stack: np.ndarray) -> float:
+    device = SimpleNamespace(name='bench', graph_type='density_2d', shape=shape, dtype=stack.dtype.name,
+                             compression=compression, chunks=None, bit_depth=12)
+    with tempfile.TemporaryDirectory() as root_path:
+        builder = H5Builder(persistent=True, compression_workers=workers)
+        builder.create_file(file_name='bench.h5', root_path=root_path, devices={'bench': device})
+        t_0 = time.perf_counter()
+        for start in range(0, frames, batch):
+            builder.append_rows('bench', stack[start:start + batch], np.arange(start, start + batch, dtype='f8'))
+        builder.close()
+        return frames / (time.perf_counter() - t_0)
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng()
+    # 12-bit camera: a gaussian spot over read noise
+    y, x = np.indices(shape)
+    spot = 3000 * np.exp(-((x - 300) ** 2 + (y - 400) ** 2) / (2 * 40 ** 2))
+    stack = (spot + rng.normal(100, 10, (frames, *shape))).clip(0, 4095).astype('uint16')
+    megabytes = stack[0].nbytes / 1e6
+
+    worker_counts = [0] + [n for n in (1, 2, 4, 8, 16, 32) if n <= (os.cpu_count() or 1)]
+    print(f"{'workers':>8} {'frames/s':>9} {'MB/s':>7} {'speed-up':>9}")
+    reference = None
+    for workers in worker_counts:
+        rate = frames_per_second(workers, stack)
+        reference = reference or rate
+        print(f'{workers if workers else "h5py":>8} {rate:>9.1f} {rate * megabytes:>7.0f} {rate / reference:>8.1f}x')
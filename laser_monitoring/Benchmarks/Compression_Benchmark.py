@@ -0,0 +1,71 @@
+"""
+Compression ratio, write and read throughput of the HDF5 filter pipelines of h5_Filters, on stacks
+of the bundled FOCAL_SPOT.TIFF and SPECTRUM.TIFF sample images, one image per chunk as saved by
+H5Builder. Codecs needing hdf5plugin fall back to gzip when it is not installed.
+
+    python -m laser_monitoring.Benchmarks.Compression_Benchmark
+"""
+import os
+import tempfile
+import time
+from importlib.resources import files
+from types import SimpleNamespace
+
+import h5py
+import numpy as np
+from PIL import Image
+
+from laser_monitoring.Data_Saver import h5_Filters
+from laser_monitoring.Data_Saver.h5_Builder import H5Builder
+
+samples = ('FOCAL_SPOT.TIFF', 'SPECTRUM.TIFF')
+frames = 50
+
+pipelines = (
+    'none',
+    {'codec': 'gzip', 'level': 4},
+    {'codec': 'gzip', 'level': 1, 'shuffle': True},
+    'lzf',
+    {'codec': 'lzf', 'shuffle': True},
+    {'codec': 'lz4', 'shuffle': True},
+    {'codec': 'zstd', 'level': 3, 'shuffle': True},
+    'bitshuffle',
+    {'codec': 'blosc', 'cname': 'lz4', 'level': 5, 'shuffle': 'bit'},
+    {'codec': 'blosc', 'cname': 'zstd', 'level': 5, 'shuffle': 'bit'},
+)
+
+
+def measure(image: np.ndarray, compression) -> tuple[float, float, float]:
+    """Compression ratio, write MB/s and read MB/s of frames copies of image"""
+    stack = np.repeat(image[np.newaxis], frames, axis=0)
+    device = SimpleNamespace(name='bench', graph_type='density_2d', shape=image.shape, dtype=image.dtype.name,
+                             compression=compression, chunks=None, bit_depth=None)
+    megabytes = stack.nbytes / 1e6
+
+    with tempfile.TemporaryDirectory() as root_path:
+        builder = H5Builder(persistent=True)
+        builder.create_file(file_name='bench.h5', root_path=root_path, devices={'bench': device})
+        t_0 = time.perf_counter()
+        builder.append_rows('bench', stack, np.arange(frames, dtype='f8'))
+        builder.close()
+        write_time = time.perf_counter() - t_0
+
+        with h5py.File(builder.file, 'r') as f:
+            t_0 = time.perf_counter()
+            f['devices/bench/data'][...]
+            read_time = time.perf_counter() - t_0
+        ratio = stack.nbytes / os.path.getsize(builder.file)
+
+    return ratio, megabytes / write_time, megabytes / read_time
+
+
+if __name__ == "__main__":
+    if h5_Filters.hdf5plugin is None:
+        print('hdf5plugin not installed, lz4, zstd, bitshuffle and blosc are measured as gzip')
+    for sample in samples:
+        image = np.array(Image.open(files("laser_monitoring.Device_Classes.SampleImages") / sample))
+        print(f'\n{sample} {image.shape} {image.dtype}, {frames} frames')
+        print(f"{'filters':>40} {'ratio':>6} {'write (MB/s)':>13} {'read (MB/s)':>12}")
+        for compression in pipelines:
+            ratio, write_rate, read_rate = measure(image, compression)
+            print(f'{h5_Filters.describe(compression):>40} {ratio:>6.2f} {write_rate:>13.0f} {read_rate:>12.0f}')
@@ -0,0 +1,84 @@
+"""
+Compare the QThread-per-device and asyncio acquisition engines on virtual devices.
+
+For 10, 100 and 500 scalar virtual devices polled every 100 ms, reports the CPU time used,
+the number of OS threads of the process and the frames received, for each engine.
+
+    python -m laser_monitoring.Benchmarks.Engine_Benchmark [duration_s]
+"""
+import contextlib
+import io
+import sys
+import threading
+import time
+
+from PyQt6.QtCore import QCoreApplication, QEventLoop, QTimer
+
+from laser_monitoring.Device_Classes.Devices import DeviceMaker
+from laser_monitoring.Device_Classes.Acquisition_Engine import AcquisitionEngine
+
+
+def thread_count() -> int:
+    """OS threads of the process, QThreads included (threading only sees python threads)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('Threads:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().num_threads()
+    except ImportError:
+        return threading.active_count()
+
+
+def run_events(duration_s: float):
+    loop = QEventLoop()
+    QTimer.singleShot(int(duration_s * 1000), loop.quit)
+    loop.exec()
+
+
+def run(engine: str, device_count: int, duration_s: float, polling_period: float = 0.1) -> dict:
+    definitions = [{'name': f'Virtual {i}', 'address': '', 'type': 'dummy device', 'is virtual': True,
+                    'saving period': 1, 'polling period': polling_period, 'acquisition engine': engine}
+                   for i in range(device_count)]
+    frames = [0]
+
+    def count(device_id, data, timestamp):
+        frames[0] += 1
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        devices = [DeviceMaker.create(definition) for definition in definitions]
+    for device in devices:
+        device.worker.data_received.connect(count)
+
+    cpu_0, wall_0 = time.process_time(), time.perf_counter()
+    for device in devices:
+        device.start_device()
+    run_events(duration_s)
+    threads = thread_count()
+    cpu, wall = time.process_time() - cpu_0, time.perf_counter() - wall_0
+
+    for device in devices:
+        device.stop_device()
+        if device.thread is not None:
+            device.thread.wait()
+    AcquisitionEngine.shutdown()
+
+    return {'engine': engine, 'devices': device_count, 'threads': threads,
+            'cpu_percent': 100 * cpu / wall, 'frames': frames[0],
+            'expected_frames': int(device_count * duration_s / polling_period)}
+
+
+if __name__ == "__main__":
+    app = QCoreApplication(sys.argv)
+    duration_s = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    print(f"{'engine':>8} {'devices':>8} {'threads':>8} {'cpu %':>8} {'frames':>14}")
+    for device_count in (10, 100, 500):
+        for engine in ('qthread', 'asyncio'):
+            result = run(engine, device_count, duration_s)
+            print(f"{result['engine']:>8} {result['devices']:>8} {result['threads']:>8} "
+                  f"{result['cpu_percent']:>8.1f} {result['frames']:>7}/{result['expected_frames']:<6}")
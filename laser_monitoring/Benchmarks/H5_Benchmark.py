@@ -0,0 +1,43 @@
+"""
+Points per second written by H5Builder.append_batch, one call per point as DataSaver does,
+with the file opened for every call (before) and kept open with geometric growth (persistent).
+
+    python -m laser_monitoring.Benchmarks.H5_Benchmark
+"""
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from laser_monitoring.Data_Saver.h5_Builder import H5Builder
+
+cases = {
+    # name: (graph type, shape, dtype, points)
+    'scalar': ('rolling_1d', (1,), 'float64', 20000),
+    'spectrum 2048': ('static_1d', (2048,), 'float64', 2000),
+    'image 808x608': ('density_2d', (808, 608), 'uint16', 100),
+}
+
+
+def points_per_second(persistent: bool, graph_type: str, shape: tuple, dtype: str, points: int) -> float:
+    device = SimpleNamespace(name='bench', graph_type=graph_type, shape=shape, dtype=dtype)
+    rng = np.random.default_rng()
+    pool = rng.integers(0, 4096, (16, *shape)).astype(dtype)
+
+    with tempfile.TemporaryDirectory() as root_path:
+        builder = H5Builder(persistent=persistent)
+        builder.create_file(file_name='bench.h5', root_path=root_path, devices={'bench': device})
+        t_0 = time.perf_counter()
+        for i in range(points):
+            builder.append_batch('bench', pool[i % len(pool)], time.time())
+        builder.close()
+        return points / (time.perf_counter() - t_0)
+
+
+if __name__ == "__main__":
+    print(f"{'device':>15} {'before (pts/s)':>15} {'persistent (pts/s)':>19} {'speed-up':>9}")
+    for name, (graph_type, shape, dtype, points) in cases.items():
+        before = points_per_second(False, graph_type, shape, dtype, points)
+        after = points_per_second(True, graph_type, shape, dtype, points)
+        print(f"{name:>15} {before:>15.0f} {after:>19.0f} {after / before:>8.1f}x")
@@ -0,0 +1,61 @@
+"""
+Hot analysis loop over a spectrum device, repeated passes computing the mean spectrum of a sliding
+window: rows read through H5Loader.get_range from gzip chunks, then mapped by H5Loader.as_memmap
+from a contiguous dataset ("contiguous rows").
+
+    python -m laser_monitoring.Benchmarks.Memmap_Benchmark
+"""
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from laser_monitoring.Data_Saver.h5_Builder import H5Builder
+from laser_monitoring.Data_Saver.h5_Loader import H5Loader
+
+rows = 100_000
+size = 1024
+batch = 5000
+window = 1000  # Rows per analysis step
+passes = 5
+
+
+def write_file(root_path: str, contiguous: bool):
+    device = SimpleNamespace(name='spectrum', graph_type='static_1d', shape=(size,), dtype='float32',
+                             compression=None if contiguous else {'codec': 'gzip', 'level': 4},
+                             chunks=None, bit_depth=None, contiguous_rows=rows if contiguous else None)
+    rng = np.random.default_rng(0)
+    builder = H5Builder(persistent=True)
+    builder.create_file(file_name=f'{"hot" if contiguous else "gzip"}.h5', root_path=root_path,
+                        devices={'spectrum': device})
+    for start in range(0, rows, batch):
+        builder.append_rows('spectrum', rng.normal(100, 10, (batch, size)).astype('f4'),
+                            np.arange(start, start + batch, dtype='f8'))
+    builder.close()
+    return builder.file
+
+
+def analysis(get_rows) -> float:
+    t_0 = time.perf_counter()
+    for _ in range(passes):
+        for start in range(0, rows - window + 1, window):
+            get_rows(start, start + window).mean(axis=0)
+    return time.perf_counter() - t_0
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as root_path:
+        gzip_file, hot_file = write_file(root_path, False), write_file(root_path, True)
+
+        with H5Loader(gzip_file) as loader:
+            chunked = analysis(lambda start, stop: loader.get_range('spectrum', start, stop - 1)[1])
+        with H5Loader(hot_file) as loader:
+            _, data = loader.as_memmap('spectrum')
+            assert isinstance(data, np.memmap) and len(data) == rows
+            mapped = analysis(lambda start, stop: data[start:stop])
+
+        megabytes = passes * rows * size * 4 / 1e6
+        print(f"{'path':>14} {'s':>7} {'MB/s':>7}")
+        print(f"{'gzip chunks':>14} {chunked:>7.2f} {megabytes / chunked:>7.0f}")
+        print(f"{'memmap':>14} {mapped:>7.2f} {megabytes / mapped:>7.0f}   {chunked / mapped:.1f}x")
@@ -0,0 +1,65 @@
+"""
+Full-span column scan of a scalar and a spectrum device: reading the gzip'd HDF5 datasets through
+H5Loader, then the Parquet export of the same file through pyarrow. Requires pyarrow.
+
+    python -m laser_monitoring.Benchmarks.Parquet_Benchmark
+"""
+import pathlib
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pyarrow.parquet as pq
+
+from laser_monitoring.Data_Saver.h5_Builder import H5Builder
+from laser_monitoring.Data_Saver.h5_Loader import H5Loader
+from laser_monitoring.Data_Saver.Parquet_Export import export_file
+
+rows = 2_000_000
+spectrum_rows = 50_000
+spectrum_size = 1024
+batch = 10000
+t_0 = 1.7e9  # Two days of samples
+
+
+def write_file(root_path: str) -> pathlib.Path:
+    devices = {
+        'energy': SimpleNamespace(name='energy', graph_type='rolling_1d', shape=(1,), dtype='float64',
+                                  compression={'codec': 'gzip', 'level': 4}, chunks=None, bit_depth=None),
+        'spectrum': SimpleNamespace(name='spectrum', graph_type='static_1d', shape=(spectrum_size,), dtype='float32',
+                                    compression={'codec': 'gzip', 'level': 4}, chunks=None, bit_depth=None),
+    }
+    rng = np.random.default_rng()
+    builder = H5Builder(persistent=True)
+    builder.create_file(file_name='bench.h5', root_path=root_path, devices=devices)
+    for start in range(0, rows, batch):
+        builder.append_rows('energy', rng.normal(1, 0.05, (batch, 1)),
+                            t_0 + np.arange(start, start + batch) * 172800 / rows)
+    for start in range(0, spectrum_rows, batch):
+        builder.append_rows('spectrum', rng.normal(100, 10, (batch, spectrum_size)).astype('f4'),
+                            t_0 + np.arange(start, start + batch) * 172800 / spectrum_rows)
+    builder.close()
+    return builder.file
+
+
+def timed(read) -> tuple[float, int]:
+    t = time.perf_counter()
+    n = read()
+    return time.perf_counter() - t, n
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as root_path:
+        file = write_file(root_path)
+        out_dir = pathlib.Path(root_path) / 'parquet'
+        duration, _ = timed(lambda: export_file(file, out_dir))
+        print(f'Export: {duration:.2f} s')
+
+        print(f"{'device':>10} {'hdf5 s':>8} {'parquet s':>10} {'speed-up':>9}")
+        for device_id in ('energy', 'spectrum'):
+            with H5Loader(file) as loader:
+                hdf5, n = timed(lambda: len(loader.get_range(device_id, -np.inf, np.inf)[1]))
+            parquet, m = timed(lambda: pq.read_table(out_dir / f'device={device_id}', columns=['value']).num_rows)
+            assert n == m, (n, m)
+            print(f'{device_id:>10} {hdf5:>8.3f} {parquet:>10.3f} {hdf5 / parquet:>8.1f}x')
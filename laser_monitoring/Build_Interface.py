@@ -194,6 +194,11 @@ class Monitoring_Interface(QMainWindow):
         else:
             print(f"Warning: No graph found for device '{device.name}'")
 
+    def update_static(self, device: Device, data: dict):
+        graph = self.graphs.get(device.name)
+        if graph:
+            graph.update_static(data)
+
     def clear_graphs(self):
         for device_id, graph in self.graphs.items():
             graph.clear_graph()
@@ -0,0 +1,145 @@
+"""
+SQLite catalog of the archive under a data root (root/YYYY/MM/DD/<file>.h5), stored as
+root/catalog.sqlite. For each file and device it records the time span, rows, frame shape and dtype,
+so a query over days opens only the files it needs.
+
+DataSaver adds each file when it closes or rotates it. To index an existing archive:
+
+    python -m laser_monitoring.Data_Saver.Archive_Catalog <data root>
+"""
+import contextlib
+import json
+import pathlib
+import sqlite3
+import sys
+
+import h5py
+import numpy as np
+
+from laser_monitoring.Data_Saver import h5_Filters  # Registers the hdf5plugin filters, when installed
+from laser_monitoring.Data_Saver.h5_Builder import written_rows
+
+catalog_name = 'catalog.sqlite'
+
+schema = """
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime REAL, size INTEGER);
+CREATE TABLE IF NOT EXISTS devices (path TEXT, device TEXT, t_start REAL, t_end REAL, rows INTEGER,
+                                    shape TEXT, dtype TEXT, PRIMARY KEY (path, device));
+CREATE INDEX IF NOT EXISTS devices_time ON devices (device, t_start, t_end);
+"""
+
+
+def _rows(dataset: h5py.Dataset) -> int:
+    return int(min(dataset.shape[0], dataset.attrs.get('rows', dataset.shape[0])))
+
+
+class ArchiveCatalog:
+
+    def __init__(self, root_path: str | pathlib.Path):
+        self.root = pathlib.Path(root_path)
+        self.path = self.root / catalog_name
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(schema)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """One connection per call, so the saver threads can update the catalog concurrently"""
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:  # Commits, or rolls back on error
+                yield db
+        finally:
+            db.close()
+
+    def _relative(self, file: pathlib.Path) -> str:
+        return pathlib.Path(file).resolve().relative_to(self.root.resolve()).as_posix()
+
+    def add_file(self, file: str | pathlib.Path):
+        """Index (or re-index) the devices of a closed file"""
+        file = pathlib.Path(file)
+        entries = []
+        with h5py.File(file, 'r') as f:
+            for device_id, group in f.get('devices', {}).items():
+                if 'data' not in group or 'timestamps' not in group:
+                    continue
+                data, timestamps = group['data'], group['timestamps']
+                if timestamps.chunks is None:
+                    rows = written_rows(timestamps)  # Contiguous datasets are preallocated
+                else:
+                    rows = min(_rows(data), _rows(timestamps))
+                if rows == 0:
+                    continue
+                t_start, t_end = timestamps[0, 0], timestamps[rows - 1, 0]
+                entries.append((device_id, float(t_start), float(t_end), rows,
+                                json.dumps(list(data.shape[1:])), data.dtype.name))
+
+        path, stat = self._relative(file), file.stat()
+        with self._connect() as db:
+            db.execute('DELETE FROM devices WHERE path = ?', (path,))
+            db.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?)', (path, stat.st_mtime, stat.st_size))
+            db.executemany('INSERT INTO devices VALUES (?, ?, ?, ?, ?, ?, ?)',
+                           [(path, *entry) for entry in entries])
+
+    def rebuild(self) -> int:
+        """Index the files of the tree added or changed since they were last indexed, returns their number"""
+        with self._connect() as db:
+            known = dict(db.execute('SELECT path, mtime FROM files'))
+        updated = 0
+        for file in sorted(self.root.glob('[0-9][0-9][0-9][0-9]/[0-9][0-9]/[0-9][0-9]/*.h5')):
+            if known.get(self._relative(file)) == file.stat().st_mtime:
+                continue
+            try:
+                self.add_file(file)
+                updated += 1
+            except OSError as e:
+                print(f'Could not index {file}: {e}')
+        return updated
+
+    def summary(self) -> dict:
+        """Rows and files per device"""
+        with self._connect() as db:
+            return {device_id: {'files': files, 'rows': rows} for device_id, files, rows
+                    in db.execute('SELECT device, COUNT(*), SUM(rows) FROM devices GROUP BY device')}
+
+    def device_files(self, device_id: str) -> list[dict]:
+        """Files holding a device, with time span, rows, shape and dtype, in time order"""
+        with self._connect() as db:
+            rows = db.execute('SELECT path, t_start, t_end, rows, shape, dtype FROM devices '
+                              'WHERE device = ? ORDER BY t_start', (device_id,)).fetchall()
+        return [{'file': self.root / path, 't_start': t_start, 't_end': t_end, 'rows': n,
+                 'shape': tuple(json.loads(shape)), 'dtype': dtype}
+                for path, t_start, t_end, n, shape, dtype in rows]
+
+    def query(self, device_id: str, t_start: float, t_end: float) -> list[tuple[pathlib.Path, slice]]:
+        """
+        (file, row slice) pairs holding the rows of device_id with t_start <= timestamp <= t_end, in
+        time order. Files entirely inside the range are not opened, the ones at its edges are opened
+        to binary-search their timestamps.
+        """
+        with self._connect() as db:
+            rows = db.execute('SELECT path, t_start, t_end, rows FROM devices '
+                              'WHERE device = ? AND t_start <= ? AND t_end >= ? ORDER BY t_start',
+                              (device_id, t_end, t_start)).fetchall()
+
+        pairs = []
+        for path, file_start, file_end, n in rows:
+            file = self.root / path
+            if t_start <= file_start and file_end <= t_end:
+                pairs.append((file, slice(0, n)))
+                continue
+            with h5py.File(file, 'r') as f:
+                timestamps = f[f'devices/{device_id}/timestamps'][:n, 0]
+            first = int(np.searchsorted(timestamps, t_start, side='left'))
+            last = int(np.searchsorted(timestamps, t_end, side='right'))
+            if last > first:
+                pairs.append((file, slice(first, last)))
+        return pairs
+
+
+if __name__ == "__main__":
+    root = sys.argv[1] if len(sys.argv) > 1 else './Data'
+    catalog = ArchiveCatalog(root)
+    print(f'Indexed {catalog.rebuild()} files in {catalog.path}')
+    for device_id, entry in catalog.summary().items():
+        print(f"  {device_id}: {entry['rows']} rows in {entry['files']} files")
@@ -1,5 +1,14 @@
 from laser_monitoring.Data_Saver.h5_Builder import H5Builder
-from queue import Queue, Full
+from laser_monitoring.Data_Saver.File_Rotation import FileRotation, update_manifest
+from laser_monitoring.Data_Saver.Journal import Journal
+from laser_monitoring.Data_Saver.Ring_Buffer import RingBuffer
+from laser_monitoring.Data_Saver.Memory_Budget import MemoryBudget
+from laser_monitoring.Data_Saver.Archive_Catalog import ArchiveCatalog
+from datetime import datetime
+import os
+import shutil
+import sqlite3
+import tempfile
 import threading
 import time
 from PyQt6.QtCore import pyqtSlot, QObject, pyqtSignal
@@ -11,28 +20,73 @@ class DataSaver(QObject):
     
     # Signals for monitoring
     buffer_warning = pyqtSignal(int)  # Emitted when buffer fills up
-    data_saved = pyqtSignal(int)      # Emitted after batch write (count)
+    data_saved = pyqtSignal(int, float, float)  # Emitted after batch write (count, MB/s, rows/s)
     
-    def __init__(self, batch_size=2048, max_buffer=20480, flush_interval=30):
+    def __init__(self, batch_size=2048, max_buffer=20480, flush_interval=30, persistent_file=True, swmr=False,
+                 rotation: FileRotation | None = None, journal_dir=None, compression_workers=0,
+                 buffer_bytes=64 * 2**20, memory_budget: MemoryBudget | None = None):
         super().__init__()
-        self.batch_size = batch_size
-        self.max_buffer = max_buffer
+        self.batch_size = batch_size  # Rows of a device written at once
+        self.max_buffer = max_buffer  # Rows buffered per device, at most
+        self.buffer_bytes = buffer_bytes  # Bytes buffered per device, at most
         self.flush_interval = flush_interval  # seconds
         
-        # Thread-safe buffer
-        self.buffer = Queue(maxsize=max_buffer)
+        # Thread-safe preallocated ring buffer per device, with the overflow policy of the device
+        self.buffers = {}
+        self._retired_buffers = []  # Replaced after a format change, drained then dropped
+        self._retired_lock = threading.Lock()  # Retired by on_data_event, taken by the writer thread
+
+        # Buffers are sized from what the memory budget has left, samples of 'spill' devices not fitting,
+        # or arriving while the budget is exceeded, go to a temporary on-disk journal, written by the
+        # writer thread once it catches up
+        self.memory_budget = memory_budget
+        self._over_budget = False  # Checked by the writer thread, usage() is too costly for every sample
+        self.spill = None
+        self._spilling = set()  # Devices whose new samples go to the spill journal, to keep them in order
+        self._spill_lock = threading.Lock()
+        if memory_budget is not None:
+            memory_budget.track('saver buffers', self.buffer_usage)
+            memory_budget.track('saver spill (disk)', lambda: self.spill.nbytes if self.spill else 0,
+                                in_memory=False)
         
         # Control flags
         self.running = False
         self.writer_thread = None
         
+        # Latest static data per device, written once per file rather than per sample
+        self.static_data = {}
+
         # Statistics
         self.total_saved = 0
         self.dropped_count = 0
         
-        # HDF5 file and table
-        self.h5_file = H5Builder()
-        
+        # HDF5 file and table, kept open for the run in persistent mode, readable while written in SWMR mode
+        self.persistent_file = persistent_file
+        self.swmr = swmr
+        self.compression_workers = compression_workers  # Threads compressing image chunks, 0 for h5py filters
+        self.h5_file = self._new_builder()
+
+        # Files rotated by size, period or at midnight, the next one prepared in the background
+        self.rotation = rotation
+        self._file_started = None
+        self._next_file = None
+        self._next_date = None  # Date folder of the next file
+        self._preparing = None
+        self.catalog = None  # SQLite catalog under the data root, updated as files are closed
+
+        # Journal mode: samples go to an mmap journal, compacted into the HDF5 file by the writer thread
+        self.journal = Journal(journal_dir) if journal_dir is not None else None
+        self.compact_interval = 1.  # seconds
+
+    def _new_builder(self) -> H5Builder:
+        return H5Builder(persistent=self.persistent_file, flush_interval=self.flush_interval, swmr=self.swmr,
+                         compression_workers=self.compression_workers)
+
+    def _open_file(self, builder: H5Builder, filename: str, date=None):
+        builder.create_file(devices=self.devices, file_name=filename, root_path=self.root_path, date=date)
+        for device_id, (data, timestamp) in self.static_data.items():
+            builder.write_static(device_id, data, timestamp)
+        builder.start_swmr()
 
     def start(self, devices: dict, filename: str, root_path: str):
         """Initialize HDF5 file and start writer thread"""
@@ -40,11 +94,26 @@ class DataSaver(QObject):
             return
             
         # Configure HDF5 file
-        self.h5_file.create_file(devices=devices, file_name=filename, root_path=root_path)
+        self.devices, self.filename, self.root_path = devices, filename, root_path
+        self.catalog = ArchiveCatalog(root_path)
+        self._open_file(self.h5_file, filename)
+        self.buffers, self._retired_buffers = {}, []
+        self.spill = Journal(tempfile.mkdtemp(prefix='laser_monitoring_spill_'), max_age=0.)
+        self.spill.open()
+        for device_id, device in devices.items():
+            try:
+                self.buffers[device_id] = self._new_buffer(device_id, device.shape, device.dtype)
+            except (ConnectionError, TimeoutError, AttributeError):
+                pass  # Shape unknown yet, or not a saved device, buffer made from the first sample
+        self._file_started = datetime.now()
+        update_manifest(self.h5_file)
 
-        # Start writer thread
+        # Start writer thread, compacting the journal in journal mode
         self.running = True
-        self.writer_thread = threading.Thread(target=self._write_loop, daemon=True)
+        if self.journal is not None:
+            self.journal.open()
+        self.writer_thread = threading.Thread(target=self._write_loop if self.journal is None else self._compact_loop,
+                                              daemon=True)
         self.writer_thread.start()
         
         print(f"Data saver started: {filename}")
@@ -61,10 +130,32 @@ class DataSaver(QObject):
             self.writer_thread.join(timeout=5.0)
         
         # Flush any remaining data
-        self._flush_buffer()
+        self._drain_buffers(flush_all=True)
+        if self.spill.kept_rows:
+            print(f'{self.spill.kept_rows} spilled points could not be saved')
+        shutil.rmtree(self.spill.directory, ignore_errors=True)
+        if self.journal is not None:
+            self.journal.close_segments()
+            self._compact()
+            if self.journal.kept_rows:
+                print(f'{self.journal.kept_rows} journal points could not be saved, '
+                      f'kept in {self.journal.directory} for the next start')
+        self._close_file(self.h5_file)
+        self._discard_next_file()
 
         print(f"Data saver stopped. Saved: {self.total_saved}, Dropped: {self.dropped_count}")
+        for device_id, buffer in self.buffers.items():
+            if buffer.dropped:
+                print(f'  {device_id}: {buffer.dropped} dropped ({buffer.policy})')
         
+    def on_static_data(self, device_id: str, data: dict, timestamp: float):
+        """Keep static data, and update the file if it changes while saving"""
+        self.static_data[device_id] = (data, timestamp)
+        if self.running:
+            self.h5_file.write_static(device_id, data, timestamp)
+            if self._next_file is not None:
+                self._next_file.write_static(device_id, data, timestamp)
+
     @pyqtSlot(float, int, int)
     @pyqtSlot(object)
     def on_data_event(self, *args):
@@ -81,72 +172,212 @@ class DataSaver(QObject):
         else:
             data_point = args
 
+        device_id, value, timestamp = data_point
+        if self.journal is not None:
+            self.journal.append(device_id, value, timestamp)
+            return
+
+        if device_id in self._spilling:
+            with self._spill_lock:
+                if device_id in self._spilling:
+                    self.spill.append(device_id, value, timestamp)
+                    return
+
+        # Copy into the device buffer (non-blocking, unless the device policy is 'block': then the calling
+        # thread, the GUI thread through DataSaveScheduler, waits up to block_timeout for the writer)
+        buffer = self.buffers.get(device_id)
+        if buffer is None or not buffer.accepts(value):
+            if buffer is not None:
+                with self._retired_lock:
+                    self._retired_buffers.append((device_id, buffer))
+            value = np.asarray(value)
+            buffer = self.buffers[device_id] = self._new_buffer(device_id, value.shape or (1,), value.dtype.name)
+
+        if buffer.policy == 'spill' and self._over_budget:
+            with self._spill_lock:
+                self.spill.append(device_id, value, timestamp)
+                self._spilling.add(device_id)
+            return
+
+        if not buffer.put(value, timestamp):
+            if buffer.policy == 'spill':
+                with self._spill_lock:
+                    self.spill.append(device_id, value, timestamp)
+                    self._spilling.add(device_id)
+                return
 
-        # Add to buffer (non-blocking)
-        try:
-            self.buffer.put_nowait(data_point)
-        except Full:
             # Buffer is full - drop the data point
             self.dropped_count += 1
             
             # Emit warning if buffer is consistently full
             if self.dropped_count % 100 == 1:
-                self.buffer_warning.emit(self.buffer.qsize())
+                self.buffer_warning.emit(len(buffer))
+
+    def _new_buffer(self, device_id: str, shape: tuple, dtype: str) -> RingBuffer:
+        device = self.devices.get(device_id)
+        policy = getattr(device, 'overflow_policy', 'spill')
+        max_bytes = self.buffer_bytes
+        if self.memory_budget is not None:
+            # Share what is left of the budget between the devices still without a buffer
+            unbuffered = max(1, len(self.devices) - len(self.buffers))
+            max_bytes = min(max_bytes, max(0, self.memory_budget.available()) // unbuffered)
+        return RingBuffer.for_frames(tuple(shape), dtype, max_bytes, self.max_buffer, policy)
+
+    def buffer_usage(self) -> int:
+        """Bytes allocated to the ring buffers"""
+        with self._retired_lock:
+            retired = [buffer for _, buffer in self._retired_buffers]
+        buffers = list(self.buffers.values()) + retired
+        return sum(buffer.nbytes for buffer in buffers)
 
     def _write_loop(self):
-        """Background thread that writes batches to disk"""
-        batch = []
+        """Background thread draining the device buffers to disk, in bulk"""
         last_flush = time.time()
-        
-        while self.running or not self.buffer.empty():
-            # Collect data points into a batch
-            try:
-                # Use timeout to periodically check running flag
-                data = self.buffer.get(timeout=0.1)
-                batch.append(data)
-                
-            except:
-                pass  # Timeout - continue to check if we should flush
-                
-            # Write batch if it's large enough or enough time has passed
-            self.current_time = time.time()
-            self.should_flush = (
-                len(batch) >= self.batch_size or
-                (batch and self.current_time - last_flush >= self.flush_interval)
-            )
-            
-            if self.should_flush:
-                self._write_batch(batch)
-                batch.clear()
-                last_flush = self.current_time
-                
-        # Write any remaining data
-        if batch:
-            self._write_batch(batch)
-
-    def _write_batch(self, batch):
-        """Write a batch of data points to HDF5"""
-        print(f'Writing batch')
-        if not batch or self.h5_file is None:
-            print("No data to write or h5 file not initialized.")
+
+        while self.running:
+            self._check_budget()
+            # Write devices with a batch ready, or every device when enough time has passed
+            current_time = time.time()
+            flush_all = current_time - last_flush >= self.flush_interval
+            if (flush_all or self._spilling
+                    or any(len(buffer) >= self._batch_rows(buffer) for buffer in list(self.buffers.values()))):
+                self._rotate_if_due()
+                self._drain_buffers(flush_all)
+                if flush_all:
+                    last_flush = current_time
+            else:
+                time.sleep(0.1)
+
+    def _check_budget(self):
+        """While the memory budget is exceeded (e.g. by graph histories), 'spill' devices spill every new sample"""
+        over_budget = self.memory_budget is not None and self.memory_budget.exceeded()
+        if over_budget != self._over_budget:
+            print('Memory budget exceeded, spilling new samples to disk' if over_budget
+                  else 'Memory budget no longer exceeded, buffering new samples')
+        self._over_budget = over_budget
+
+    def _batch_rows(self, buffer: RingBuffer) -> int:
+        return max(1, min(self.batch_size, buffer.capacity // 2))
+
+    def _drain_buffers(self, flush_all: bool):
+        """Write each buffer holding a batch (all non-empty ones if flush_all), one contiguous write per device"""
+        t_0 = time.perf_counter()
+        count, written_bytes = 0, 0
+        with self._retired_lock:
+            retired, self._retired_buffers = self._retired_buffers, []
+        buffers = [(device_id, buffer, True) for device_id, buffer in retired]
+        buffers += [(device_id, buffer, flush_all or device_id in self._spilling)
+                    for device_id, buffer in list(self.buffers.items())]
+
+        for device_id, buffer, drain_all in buffers:
+            if len(buffer) == 0 or (not drain_all and len(buffer) < self._batch_rows(buffer)):
+                continue
+            rows, timestamps = buffer.drain()
+            written_bytes += self._write_rows(device_id, rows, timestamps)
+            count += len(rows)
+
+        # Spilled samples are newer than the buffered ones of their device, written after them
+        if self._spilling:
+            spilled, spilled_bytes = self._write_journal(self.spill)
+            count += spilled
+            written_bytes += spilled_bytes
+            with self._spill_lock:
+                self._spilling = {device_id for device_id in self._spilling if self.spill.pending(device_id)}
+
+        if count:
+            elapsed = max(time.perf_counter() - t_0, 1e-9)
+            self.total_saved += count
+            self.data_saved.emit(count, written_bytes / elapsed / 1e6, count / elapsed)
+
+    def _write_rows(self, device_id: str, rows: np.ndarray, timestamps: np.ndarray) -> int:
+        """Append the rows of one device in a single write, returns the bytes written"""
+        try:
+            self.h5_file.append_rows(device_id, rows, timestamps)
+        except ValueError as e:
+            print(f'Could not save {len(rows)} points of {device_id}: {e}')
+            return 0
+        return rows.nbytes + 8 * len(timestamps)
+
+    def _compact_loop(self):
+        """Journal mode writer thread, moves closed journal segments to the HDF5 file"""
+        while self.running:
+            self._rotate_if_due()
+            self._compact()
+            time.sleep(self.compact_interval)
+
+    def _write_journal(self, journal: Journal) -> tuple[int, int]:
+        """Write the segments of journal to the HDF5 file, returns the rows and bytes written"""
+        written_bytes = 0
+
+        def write_rows(device_id, rows, timestamps) -> bool:
+            nonlocal written_bytes
+            written = self._write_rows(device_id, rows, timestamps)
+            written_bytes += written
+            return written > 0
+
+        return journal.compact(write_rows), written_bytes
+
+    def _compact(self):
+        t_0 = time.perf_counter()
+        count, written_bytes = self._write_journal(self.journal)
+        if count:
+            elapsed = max(time.perf_counter() - t_0, 1e-9)
+            self.total_saved += count
+            self.data_saved.emit(count, written_bytes / elapsed / 1e6, count / elapsed)
+
+    #######################################################################
+    #                    Rotation
+    #######################################################################
+
+    def _rotate_if_due(self):
+        """Swap to the prepared file when rotation is due, without waiting for it to be ready"""
+        if self.rotation is None:
             return
-            
-        # Convert batch to numpy structured array for efficient writing
-        for device_id, value , timestamp in batch:
-            data = np.array(value)
-            self.h5_file.append_batch(device_id, data, timestamp)
+        if (self._next_file is None and self._preparing is None
+                and self.rotation.should_prepare(self.h5_file, self._file_started)):
+            self._preparing = threading.Thread(target=self._prepare_next_file, name='DataSaver next file',
+                                               daemon=True)
+            self._preparing.start()
 
-        self.total_saved += len(batch)
-        self.data_saved.emit(len(batch))
-        
-    def _flush_buffer(self):
-        """Flush all remaining data in buffer"""
-        batch = []
-        while not self.buffer.empty():
-            try:
-                batch.append(self.buffer.get_nowait())
-            except:
-                break
-                
-        if batch:
-            self._write_batch(batch)
\ No newline at end of file
+        if self._next_file is None or not self.rotation.due(self.h5_file, self._file_started):
+            return
+        if self._next_date.date() > datetime.now().date():
+            return  # Prepared for tomorrow's folder, a size rotation just before midnight waits for it
+        previous, self.h5_file = self.h5_file, self._next_file
+        self._next_file = None
+        self._file_started = datetime.now()
+        update_manifest(self.h5_file)
+        print(f'Rotated {previous.file} to {self.h5_file.file}')
+        for journal in (self.spill, self.journal):
+            if journal is not None:
+                journal.retry_kept()  # Segments the previous file could not take
+        threading.Thread(target=self._close_file, args=(previous,), name='DataSaver close', daemon=True).start()
+
+    def _prepare_next_file(self):
+        try:
+            builder = self._new_builder()
+            file_name, date = self.rotation.prepare(self.root_path, self.filename, self._file_started)
+            self._open_file(builder, file_name, date)
+            self._next_file, self._next_date = builder, date
+        except Exception as e:
+            print(f'Could not prepare the next file: {e}')
+        finally:
+            self._preparing = None
+
+    def _close_file(self, builder: H5Builder):
+        builder.close()
+        update_manifest(builder)
+        try:
+            self.catalog.add_file(builder.file)
+        except (OSError, sqlite3.Error) as e:
+            print(f'Could not add {builder.file} to the archive catalog: {e}')
+
+    def _discard_next_file(self):
+        """Remove the prepared file, never written to"""
+        preparing = self._preparing
+        if preparing is not None:
+            preparing.join()
+        if self._next_file is not None:
+            self._next_file.close()
+            os.remove(self._next_file.file)
+            self._next_file = None
\ No newline at end of file
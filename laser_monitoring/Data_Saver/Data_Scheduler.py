@@ -1,4 +1,5 @@
 from PyQt6.QtCore import QTimer
+from laser_monitoring.Data_Saver.Memory_Budget import nbytes
 
 
 class DataSaveScheduler:
@@ -12,7 +13,7 @@ class DataSaveScheduler:
         """Register a device with its save interval"""
         timer = QTimer()
         timer.timeout.connect(lambda: self._save_if_available(device_id))
-        timer.start(saving_period * 1000)
+        timer.start(int(saving_period * 1000))
         self.timers[device_id] = timer
         self.latest_data[device_id] = None
 
@@ -22,6 +23,10 @@ class DataSaveScheduler:
         self.latest_data[device_id] = data
         self.latest_timestamp[device_id] = timestamp
 
+    def memory_usage(self) -> int:
+        """Bytes held by the latest data snapshots"""
+        return sum(nbytes(data) for data in list(self.latest_data.values()) if data is not None)
+
     def _save_if_available(self, device_id):
         """Timer callback - saves if data is available"""
         data = self.latest_data.get(device_id)
@@ -0,0 +1,116 @@
+"""
+Rotation of the HDF5 files written by DataSaver, by size, by wall-clock period and at midnight.
+
+The next file is created (with its datasets) in the background shortly before rotation is due,
+so the writer thread only swaps files. Rotated files go to the date folder of the day they start,
+as <name>_001.h5, <name>_002.h5... when <name>.h5 is taken.
+
+Each day folder holds a manifest.json listing, for each file, the devices saved, the time span
+(epoch seconds) and the rows written per device, so reads can skip files with files_between.
+"""
+import math
+import os
+import pathlib
+import threading
+from datetime import datetime, timedelta
+
+from laser_monitoring.Config.Config_RW import readConfig, writeConfig
+from laser_monitoring.Data_Saver.Nested_Dir import create_date_folders
+
+manifest_name = 'manifest.json'
+_manifest_lock = threading.Lock()
+
+
+class FileRotation:
+
+    def __init__(self, max_bytes: int | None = None, period: float | None = None, at_midnight: bool = True,
+                 lead_time: float = 60., prepare_fraction: float = 0.9):
+        self.max_bytes = max_bytes
+        self.period = period  # seconds
+        self.at_midnight = at_midnight
+        self.lead_time = lead_time  # Prepare the next file this many seconds before a time rotation
+        self.prepare_fraction = prepare_fraction  # and at this fraction of max_bytes
+
+    def seconds_left(self, started: datetime) -> float:
+        """Seconds until the next time rotation of a file started at started"""
+        now = datetime.now()
+        left = math.inf
+        if self.period is not None:
+            left = min(left, self.period - (now - started).total_seconds())
+        if self.at_midnight:
+            left = min(left, (self.midnight(started) - now).total_seconds())
+        return left
+
+    def _size(self, builder) -> int:
+        """Bytes written, space preallocated for contiguous datasets counts once filled"""
+        return os.path.getsize(builder.file) - builder.unwritten_bytes() if self.max_bytes is not None else 0
+
+    def should_prepare(self, builder, started: datetime) -> bool:
+        return (self.seconds_left(started) <= self.lead_time
+                or (self.max_bytes is not None and self._size(builder) >= self.prepare_fraction * self.max_bytes))
+
+    def due(self, builder, started: datetime) -> bool:
+        return (self.seconds_left(started) <= 0
+                or (self.max_bytes is not None and self._size(builder) >= self.max_bytes))
+
+    def midnight(self, started: datetime) -> datetime:
+        """Midnight ending the day of a file started at started"""
+        return datetime.combine(started.date() + timedelta(days=1), datetime.min.time())
+
+    def next_date(self, started: datetime) -> datetime:
+        """
+        Date folder of the next file: the next day when it is prepared for the midnight rotation, else
+        the day folder of the current file, started at started, for size and period rotations
+        """
+        if self.at_midnight and (self.midnight(started) - datetime.now()).total_seconds() <= self.lead_time:
+            return self.midnight(started)
+        return started
+
+    @staticmethod
+    def next_name(folder: pathlib.Path, file_name: str) -> str:
+        """file_name if free in folder, else the first free <stem>_<n>"""
+        file_name = pathlib.Path(file_name)
+        name, n = file_name.name, 0
+        while (folder / name).exists():
+            n += 1
+            name = f'{file_name.stem}_{n:03d}{file_name.suffix}'
+        return name
+
+    def prepare(self, root_path, file_name: str, started: datetime) -> tuple[str, datetime]:
+        """Name and date of the next file"""
+        date = self.next_date(started)
+        return self.next_name(create_date_folders(root_path, date), file_name), date
+
+
+def update_manifest(builder):
+    """Record the devices, time span and rows of the file of builder in the manifest of its day folder"""
+    path = builder.file.parent / manifest_name
+    with _manifest_lock:
+        manifest = readConfig(path) if path.exists() else {}
+        entry = builder.summary()
+        previous = manifest.get(builder.file.name)
+        if previous is not None and previous['start'] is not None:
+            # File appended to by a later run
+            entry['devices'] = sorted(set(entry['devices']) | set(previous['devices']))
+            entry['start'] = previous['start'] if entry['start'] is None else min(entry['start'], previous['start'])
+            entry['end'] = previous['end'] if entry['end'] is None else max(entry['end'], previous['end'])
+        manifest[builder.file.name] = entry
+        # Write then rename, so readers never see a partial manifest
+        writeConfig(path.with_suffix('.tmp'), manifest)
+        os.replace(path.with_suffix('.tmp'), path)
+
+
+def files_between(root_path, start: float, end: float, device_id: str | None = None) -> list[pathlib.Path]:
+    """Files holding data between epoch times start and end (of device_id if given), from the manifests"""
+    files = []
+    day = datetime.fromtimestamp(start).date()
+    while day <= datetime.fromtimestamp(end).date():
+        folder = pathlib.Path(root_path) / f'{day.year:04d}' / f'{day.month:02d}' / f'{day.day:02d}'
+        manifest = readConfig(folder / manifest_name) if (folder / manifest_name).exists() else {}
+        for file_name, entry in manifest.items():
+            if device_id is not None and device_id not in entry['devices']:
+                continue
+            if entry['start'] is None or (entry['start'] <= end and entry['end'] >= start):
+                files.append(folder / file_name)  # No span yet: file being written
+        day += timedelta(days=1)
+    return files
@@ -0,0 +1,209 @@
+"""
+Append-only journal, the low latency write path of DataSaver in journal mode.
+
+Samples are copied, uncompressed, into mmap-backed segment files, one open segment per device:
+an append is a memory copy, with no HDF5 call and no compression, so acquisition never waits for
+the writer. Segments are closed when full or older than max_age, and a compactor (the DataSaver
+writer thread) moves the rows of closed segments into the HDF5 file, then deletes them. Segments
+that could not be written (e.g. device not in the current file) are kept for the next file.
+
+Segment layout, in journal_dir/<device>/<sequence>.seg:
+    0      magic b'LMJ1'
+    4      closed flag (uint32)
+    8      rows written (uint64), updated after each row, so a crash loses at most the row being written
+    16     header length (uint32), then a JSON header {device_id, shape, dtype}
+    4096   records (timestamp float64, frame in its native dtype and shape)
+
+Segments left by a crash are found on open and compacted like closed ones.
+"""
+import json
+import mmap
+import os
+import pathlib
+import struct
+import threading
+import time
+
+import numpy as np
+
+magic = b'LMJ1'
+header_bytes = 4096
+
+
+def record_dtype(shape: tuple, dtype: str) -> np.dtype:
+    return np.dtype([('timestamp', '<f8'), ('data', dtype, tuple(shape))])
+
+
+class JournalSegment:
+
+    def __init__(self, path: pathlib.Path, file, mm: mmap.mmap, device_id: str, shape: tuple, dtype: str):
+        self.path = path
+        self._file = file
+        self._mm = mm
+        self.device_id = device_id
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.opened = time.monotonic()
+        self.rows = struct.unpack_from('<Q', mm, 8)[0]
+        self.closed = bool(struct.unpack_from('<I', mm, 4)[0])
+        self.records = np.frombuffer(mm, dtype=record_dtype(shape, dtype), offset=header_bytes)
+
+    @classmethod
+    def create(cls, path: pathlib.Path, device_id: str, shape: tuple, dtype: str,
+               segment_bytes: int) -> 'JournalSegment':
+        header = json.dumps({'device_id': device_id, 'shape': list(shape), 'dtype': dtype}).encode()
+        capacity = max(1, (segment_bytes - header_bytes) // record_dtype(shape, dtype).itemsize)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        file = open(path, 'w+b')
+        file.truncate(header_bytes + capacity * record_dtype(shape, dtype).itemsize)  # Sparse until written
+        mm = mmap.mmap(file.fileno(), 0)
+        mm[0:4] = magic
+        struct.pack_into('<IQI', mm, 4, 0, 0, len(header))
+        mm[20:20 + len(header)] = header
+        return cls(path, file, mm, device_id, shape, dtype)
+
+    @classmethod
+    def open(cls, path: pathlib.Path) -> 'JournalSegment':
+        file = open(path, 'r+b')
+        mm = mmap.mmap(file.fileno(), 0)
+        if mm[0:4] != magic:
+            mm.close()
+            file.close()
+            raise ValueError(f'{path} is not a journal segment')
+        length = struct.unpack_from('<I', mm, 16)[0]
+        header = json.loads(mm[20:20 + length])
+        return cls(path, file, mm, header['device_id'], header['shape'], header['dtype'])
+
+    @property
+    def full(self) -> bool:
+        return self.rows >= len(self.records)
+
+    def accepts(self, value: np.ndarray) -> bool:
+        return value.shape == self.shape and value.dtype.name == self.dtype
+
+    def append(self, value: np.ndarray, timestamp: float):
+        self.records['timestamp'][self.rows] = timestamp
+        self.records['data'][self.rows] = value
+        self.rows += 1
+        struct.pack_into('<Q', self._mm, 8, self.rows)
+
+    def close(self):
+        """Mark the segment closed, ready for compaction"""
+        struct.pack_into('<I', self._mm, 4, 1)
+        self.closed = True
+        self._mm.flush()
+
+    def read(self) -> tuple[np.ndarray, np.ndarray]:
+        """Copies of the timestamps and frames written"""
+        records = self.records[:self.rows]
+        return records['timestamp'].copy(), records['data'].copy()
+
+    def delete(self):
+        del self.records  # Release the mmap buffer before closing it
+        self._mm.close()
+        self._file.close()
+        os.remove(self.path)
+
+
+class Journal:
+
+    def __init__(self, directory: str | pathlib.Path, segment_bytes: int = 64 * 2**20, max_age: float = 30.):
+        self.directory = pathlib.Path(directory)
+        self.segment_bytes = segment_bytes
+        self.max_age = max_age  # seconds, so slow devices reach the HDF5 file too
+        self._lock = threading.Lock()
+        self._open_segments = {}  # device_id -> JournalSegment being written
+        self._closed_segments = []
+        self._kept_segments = []  # Not written to the current file, see retry_kept
+        self._sequence = 0
+
+    def open(self):
+        """Recover segments left by a previous run, they are compacted first"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        leftovers = sorted(self.directory.glob('*/*.seg'))
+        for path in leftovers:
+            try:
+                segment = JournalSegment.open(path)
+            except (ValueError, OSError, json.JSONDecodeError) as e:
+                print(f'Could not recover journal segment {path}: {e}')
+                continue
+            segment.close()
+            self._closed_segments.append(segment)
+            self._sequence = max(self._sequence, int(path.stem) + 1)
+        if leftovers:
+            print(f'Recovered {len(self._closed_segments)} journal segments from {self.directory}')
+
+    def append(self, device_id: str, value, timestamp: float):
+        value = np.asarray(value)
+        with self._lock:
+            segment = self._open_segments.get(device_id)
+            if segment is not None and (segment.full or not segment.accepts(value)):
+                self._close(device_id)
+                segment = None
+            if segment is None:
+                segment = self._new_segment(device_id, value)
+            segment.append(value, timestamp)
+
+    def _new_segment(self, device_id: str, value: np.ndarray) -> JournalSegment:
+        path = self.directory / device_id.replace('/', '_') / f'{self._sequence:09d}.seg'
+        self._sequence += 1
+        segment = JournalSegment.create(path, device_id, value.shape, value.dtype.name, self.segment_bytes)
+        self._open_segments[device_id] = segment
+        return segment
+
+    def _close(self, device_id: str):
+        segment = self._open_segments.pop(device_id)
+        segment.close()
+        self._closed_segments.append(segment)
+
+    def close_segments(self, max_age: float | None = None):
+        """Close the open segments older than max_age (all of them if None)"""
+        now = time.monotonic()
+        with self._lock:
+            for device_id, segment in list(self._open_segments.items()):
+                if max_age is None or now - segment.opened >= max_age:
+                    self._close(device_id)
+
+    def pending(self, device_id: str) -> bool:
+        """Whether rows of device_id are still in the journal"""
+        with self._lock:
+            return (device_id in self._open_segments
+                    or any(segment.device_id == device_id for segment in self._closed_segments))
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes written in the segments not compacted yet"""
+        with self._lock:
+            segments = list(self._open_segments.values()) + self._closed_segments + self._kept_segments
+        return sum(segment.rows * segment.records.itemsize for segment in segments)
+
+    @property
+    def kept_rows(self) -> int:
+        """Rows of the segments that could not be written"""
+        with self._lock:
+            return sum(segment.rows for segment in self._kept_segments)
+
+    def compact(self, write_rows) -> int:
+        """
+        Hand the rows of each closed segment to write_rows(device_id, rows, timestamps), and delete it
+        if write_rows returns True. Returns the rows written.
+        """
+        self.close_segments(self.max_age)
+        with self._lock:
+            segments, self._closed_segments = self._closed_segments, []
+
+        compacted = 0
+        for segment in segments:
+            timestamps, rows = segment.read()
+            if len(timestamps) and not write_rows(segment.device_id, rows, timestamps):
+                with self._lock:
+                    self._kept_segments.append(segment)
+                continue
+            segment.delete()
+            compacted += len(timestamps)
+        return compacted
+
+    def retry_kept(self):
+        """Compact the segments that could not be written again, e.g. once the next file is open"""
+        with self._lock:
+            self._closed_segments[:0], self._kept_segments = self._kept_segments, []
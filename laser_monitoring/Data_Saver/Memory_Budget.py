@@ -0,0 +1,43 @@
+"""
+Memory budget in bytes, shared by the DataSaver ring buffers, the DataSaveScheduler snapshots and
+the graph histories, which report their usage through a callable.
+
+Samples that don't fit the budget spill to a journal on disk instead of being dropped, see DataSaver.
+Usage per component is given by usage(), and by the diag server on '__MEMORY__'.
+"""
+import threading
+from typing import Callable
+
+
+def nbytes(value) -> int:
+    """Size of a sample, numpy arrays by their buffer, anything else as one float64"""
+    return getattr(value, 'nbytes', 8)
+
+
+class MemoryBudget:
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._components = {}  # name -> (usage callable, counted in the budget)
+        self._lock = threading.Lock()
+
+    def track(self, component: str, usage: Callable[[], int], in_memory: bool = True):
+        """Report usage() bytes for component, not counted in the budget if in_memory is False (e.g. disk)"""
+        with self._lock:
+            self._components[component] = (usage, in_memory)
+
+    def usage(self) -> dict:
+        """Bytes used per component, and the total in memory and budget"""
+        with self._lock:
+            components = dict(self._components)
+        usage = {component: int(usage()) for component, (usage, _) in components.items()}
+        usage['total in memory'] = sum(usage[component] for component, (_, in_memory) in components.items()
+                                       if in_memory)
+        usage['budget'] = self.max_bytes
+        return usage
+
+    def available(self) -> int:
+        return self.max_bytes - self.usage()['total in memory']
+
+    def exceeded(self) -> bool:
+        return self.available() < 0
@@ -0,0 +1,145 @@
+"""
+Export of the scalar and spectrum devices of archive files to Parquet, for analysis with pandas,
+pyarrow or any columnar engine. Cameras are not exported.
+
+The output is partitioned by device and UTC day, one part file per source file:
+
+    <out dir>/device=<name>/day=YYYY-MM-DD/<source day folder>_<file stem>.parquet
+
+with columns 'timestamp' (epoch seconds) and 'value' (a float for scalars, a fixed size list for
+spectra). Rows are streamed from HDF5 one row group at a time, so memory stays bounded whatever the
+file size, and files are exported in parallel on a process pool. Requires pyarrow.
+
+    python -m laser_monitoring.Data_Saver.Parquet_Export <out dir> <file or data root>...
+"""
+import concurrent.futures
+import datetime
+import pathlib
+import sys
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+from laser_monitoring.Data_Saver.h5_Loader import H5Loader
+from laser_monitoring.Data_Saver.Summary_Tiers import frame_kind
+
+row_group_rows = 65536  # Rows per Parquet row group, and per read from HDF5
+parquet_compression = 'zstd'
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError('Parquet export requires pyarrow, pip install pyarrow')
+
+
+def _table(timestamps: np.ndarray, data: np.ndarray, kind: str) -> 'pa.Table':
+    if kind == 'scalar':
+        values = pa.array(data.reshape(len(data)))
+    else:
+        values = pa.FixedSizeListArray.from_arrays(pa.array(data.reshape(-1)), data[0].size)
+    return pa.table({'timestamp': pa.array(timestamps, type=pa.float64()), 'value': values})
+
+
+def _day(day: int) -> str:
+    return (datetime.date(1970, 1, 1) + datetime.timedelta(days=day)).isoformat()
+
+
+def part_name(file: pathlib.Path) -> str:
+    """
+    Part file name of a source file. Archive files of every (local time) day folder share their name,
+    and two of them can hold rows of the same UTC day, so the day folder is part of the name.
+    """
+    folder = '-'.join(file.parent.parts[-3:])  # root/YYYY/MM/DD -> YYYY-MM-DD
+    if not folder.replace('-', '').isdigit():
+        folder = file.parent.name  # File outside a date tree
+    return f'{folder}_{file.stem}.parquet'
+
+
+def export_file(file: str | pathlib.Path, out_dir: str | pathlib.Path, devices: list | None = None,
+                rows: int = row_group_rows, compression: str = parquet_compression) -> dict:
+    """Export one HDF5 file, returns the rows written per device. On error its part files are removed"""
+    _require_pyarrow()
+    file, out_dir = pathlib.Path(file), pathlib.Path(out_dir)
+    exported = {}
+    paths = []
+    try:
+        _export_devices(file, out_dir, devices, rows, compression, exported, paths)
+    except BaseException:
+        for path in paths:
+            path.unlink(missing_ok=True)
+        raise
+    return exported
+
+
+def _export_devices(file: pathlib.Path, out_dir: pathlib.Path, devices: list | None, rows: int, compression: str,
+                    exported: dict, paths: list):
+    with H5Loader(file) as loader:
+        available = loader.device_ids()
+        for device_id in devices or available:
+            if device_id not in available:
+                continue
+            kind = frame_kind(loader.frame_shape(device_id))
+            if kind == 'image':
+                continue
+
+            writers = {}  # UTC day -> ParquetWriter of its partition
+            try:
+                for timestamps, data in loader.iter_range(device_id, -np.inf, np.inf, chunk_rows=rows):
+                    days = np.floor(timestamps / 86400).astype(np.int64)
+                    # Split the chunk at day boundaries, timestamps are sorted
+                    bounds = np.flatnonzero(np.diff(days)) + 1
+                    for start, stop in zip(np.r_[0, bounds], np.r_[bounds, len(days)]):
+                        table = _table(timestamps[start:stop], data[start:stop], kind)
+                        day = int(days[start])
+                        if day not in writers:
+                            path = out_dir / f'device={device_id}' / f'day={_day(day)}' / part_name(file)
+                            path.parent.mkdir(parents=True, exist_ok=True)
+                            paths.append(path)
+                            writers[day] = pq.ParquetWriter(path, table.schema, compression=compression)
+                        writers[day].write_table(table, row_group_size=rows)
+                        exported[device_id] = exported.get(device_id, 0) + len(table)
+            finally:
+                for writer in writers.values():
+                    writer.close()
+
+
+def archive_files(paths: list) -> list[pathlib.Path]:
+    """HDF5 files of the paths given, data roots expanded to the files of their date tree"""
+    files = []
+    for path in map(pathlib.Path, paths):
+        if path.is_dir():
+            files += sorted(path.glob('[0-9][0-9][0-9][0-9]/[0-9][0-9]/[0-9][0-9]/*.h5'))
+        else:
+            files.append(path)
+    return files
+
+
+def export(files: list, out_dir: str | pathlib.Path, devices: list | None = None, workers: int | None = None,
+           rows: int = row_group_rows, compression: str = parquet_compression) -> dict:
+    """Export files in parallel, one process per file, returns the rows written per device"""
+    _require_pyarrow()
+    exported = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(export_file, file, out_dir, devices, rows, compression): file for file in files}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                for device_id, n in future.result().items():
+                    exported[device_id] = exported.get(device_id, 0) + n
+            except Exception as e:  # A damaged or unreadable file must not stop the others
+                print(f'Could not export {futures[future]}: {e!r}')
+    return exported
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+    out_dir, files = sys.argv[1], archive_files(sys.argv[2:])
+    print(f'Exporting {len(files)} files to {out_dir}')
+    for device_id, n in export(files, out_dir).items():
+        print(f'  {device_id}: {n} rows')
@@ -0,0 +1,93 @@
+"""
+Preallocated ring buffer of the samples of one device, between acquisition and the DataSaver writer.
+
+Frames are copied into a numpy array of the device shape and dtype allocated once, so buffering a
+sample allocates nothing, and the buffer size is a number of bytes rather than of Python objects.
+The writer drains every buffered row at once, as two slices at most.
+
+Overflow policies, when the writer falls behind:
+    'drop newest': refuse the new sample (default of RingBuffer, devices default to 'spill')
+    'drop oldest': overwrite the oldest buffered sample
+    'block': wait up to block_timeout for the writer, then drop the new sample. The caller waits:
+             in the application that is the GUI thread, frozen meanwhile, so keep it for headless runs
+    'spill': refuse the new sample, not counted as dropped, DataSaver spills it to disk
+"""
+import threading
+
+import numpy as np
+
+overflow_policies = ('drop newest', 'drop oldest', 'block', 'spill')
+
+
+class RingBuffer:
+
+    def __init__(self, capacity: int, shape: tuple, dtype: str, policy: str = 'drop newest',
+                 block_timeout: float = 1.):
+        if policy not in overflow_policies:
+            raise ValueError(f'Unknown overflow policy {policy}, expected one of {overflow_policies}')
+        self.capacity = capacity
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.data = np.empty((capacity, *shape), dtype=dtype)
+        self.timestamps = np.empty(capacity, dtype='f8')
+        self.dropped = 0
+
+        self._written = 0  # Rows put since creation, the next row goes to _written % capacity
+        self._read = 0  # Rows drained (or dropped by 'drop oldest')
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+
+    @classmethod
+    def for_frames(cls, shape: tuple, dtype: str, max_bytes: int, max_rows: int, policy: str = 'drop newest'):
+        """Buffer of as many frames as fit in max_bytes, at most max_rows and at least 2"""
+        frame_bytes = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize + 8)
+        return cls(max(2, min(max_rows, max_bytes // frame_bytes)), shape, dtype, policy)
+
+    def __len__(self) -> int:
+        return self._written - self._read
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + self.timestamps.nbytes
+
+    def accepts(self, value) -> bool:
+        """Whether value fits a row, scalars fit rows of one element"""
+        shape = np.shape(value)
+        return shape == self.data.shape[1:] or (shape == () and self.data[0].size == 1)
+
+    def put(self, value, timestamp: float) -> bool:
+        """Copy a sample in, False if it was dropped"""
+        with self._lock:
+            if self._written - self._read >= self.capacity:
+                if self.policy == 'drop oldest':
+                    self._read += 1
+                    self.dropped += 1
+                elif self.policy == 'block' and self._not_full.wait_for(
+                        lambda: self._written - self._read < self.capacity, self.block_timeout):
+                    pass
+                elif self.policy == 'spill':
+                    return False
+                else:
+                    self.dropped += 1
+                    return False
+
+            i = self._written % self.capacity
+            self.data[i] = value
+            self.timestamps[i] = timestamp
+            self._written += 1
+            return True
+
+    def drain(self) -> tuple[np.ndarray, np.ndarray]:
+        """Copies of every buffered row and its timestamp, oldest first"""
+        with self._lock:
+            start, count = self._read % self.capacity, self._written - self._read
+            end = start + count
+            if end <= self.capacity:
+                rows, timestamps = self.data[start:end].copy(), self.timestamps[start:end].copy()
+            else:
+                end -= self.capacity
+                rows = np.concatenate((self.data[start:], self.data[:end]))
+                timestamps = np.concatenate((self.timestamps[start:], self.timestamps[:end]))
+            self._read += count
+            self._not_full.notify_all()
+            return rows, timestamps
@@ -0,0 +1,146 @@
+"""
+Downsampled summaries of each device, kept by H5Builder next to the raw data, for plots over long
+ranges. Buckets of 1 s, 1 min and 1 h are summarised into devices/<name>/tiers/<width>s/:
+    timestamps  bucket start (epoch seconds)
+    count       samples in the bucket
+    mean        mean value, mean spectrum, or mean thumbnail (frames binned to at most 64 px a side)
+    min, max, std   for scalars only
+
+Summaries are computed incrementally from the rows appended, never by reading the file back. The
+bucket being filled is kept in memory and written when a later bucket starts, or on close.
+"""
+import math
+
+import h5py
+import numpy as np
+
+tier_widths = (1, 60, 3600)  # seconds
+thumbnail_size = 64  # pixels, longest side of camera thumbnails
+
+
+def frame_kind(shape: tuple) -> str:
+    if int(np.prod(shape)) == 1:
+        return 'scalar'
+    return 'image' if len(shape) == 2 else 'spectrum'
+
+
+def tier_name(width: float) -> str:
+    return f'{width:g}s'
+
+
+class _Bucket:
+    """Running sums of the bucket being filled"""
+
+    def __init__(self, bucket: int, count: int, total, squares=None, low=None, high=None):
+        self.bucket, self.count, self.total = bucket, count, total
+        self.squares, self.low, self.high = squares, low, high
+
+    def merge(self, other: '_Bucket'):
+        self.count += other.count
+        self.total = self.total + other.total
+        if self.squares is not None:
+            self.squares = self.squares + other.squares
+            self.low = np.minimum(self.low, other.low)
+            self.high = np.maximum(self.high, other.high)
+
+
+class SummaryTiers:
+
+    def __init__(self, prefix: str, shape: tuple):
+        self.prefix = prefix  # devices/<name>/tiers
+        self.shape = tuple(shape)
+        self.kind = frame_kind(self.shape)
+        self.factor = max(1, math.ceil(max(self.shape) / thumbnail_size)) if self.kind == 'image' else 1
+        self._open_buckets = {width: None for width in tier_widths}
+
+    @property
+    def value_shape(self) -> tuple:
+        if self.kind == 'scalar':
+            return ()
+        if self.kind == 'image':
+            return tuple(size // self.factor for size in self.shape)
+        return self.shape
+
+    @property
+    def fields(self) -> tuple:
+        return ('mean', 'min', 'max', 'std') if self.kind == 'scalar' else ('mean',)
+
+    def create(self, f: h5py.File):
+        """Create the (empty) tier datasets, if not in the file yet"""
+        for width in tier_widths:
+            group = f'{self.prefix}/{tier_name(width)}'
+            if group in f:
+                continue
+            f.create_dataset(f'{group}/timestamps', shape=(0,), maxshape=(None,), dtype='f8', chunks=(1024,))
+            f.create_dataset(f'{group}/count', shape=(0,), maxshape=(None,), dtype='i8', chunks=(1024,))
+            chunk_rows = 16 if self.kind == 'image' else 256
+            for field in self.fields:
+                f.create_dataset(f'{group}/{field}', shape=(0, *self.value_shape), maxshape=(None, *self.value_shape),
+                                 dtype='f8' if self.kind == 'scalar' else 'f4',
+                                 chunks=(chunk_rows, *self.value_shape), compression='gzip', compression_opts=4)
+            f[group].attrs['width'] = width
+
+    def _values(self, rows: np.ndarray) -> np.ndarray:
+        """Rows as the values summarised: floats, thumbnails for cameras"""
+        if self.kind == 'scalar':
+            return rows.reshape(len(rows)).astype('f8')
+        if self.kind == 'image':
+            height, width = self.value_shape
+            rows = rows[:, :height * self.factor, :width * self.factor]
+            return rows.reshape(len(rows), height, self.factor, width, self.factor).mean(axis=(2, 4), dtype='f4')
+        return rows.reshape(len(rows), *self.shape).astype('f4')
+
+    def append(self, f: h5py.File, timestamps: np.ndarray, rows: np.ndarray):
+        """Add rows to the open buckets, and write the buckets they complete"""
+        values = self._values(rows)
+        for width in tier_widths:
+            buckets = np.floor(timestamps / width).astype(np.int64)
+            starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+            counts = np.diff(np.r_[starts, len(buckets)])
+            totals = np.add.reduceat(values, starts, axis=0)
+            if self.kind == 'scalar':
+                squares = np.add.reduceat(values ** 2, starts, axis=0)
+                lows, highs = np.minimum.reduceat(values, starts), np.maximum.reduceat(values, starts)
+
+            completed = []
+            for i, start in enumerate(starts):
+                bucket = _Bucket(int(buckets[start]), int(counts[i]), totals[i],
+                                 *((squares[i], lows[i], highs[i]) if self.kind == 'scalar' else ()))
+                current = self._open_buckets[width]
+                if current is not None and current.bucket == bucket.bucket:
+                    current.merge(bucket)
+                else:
+                    if current is not None:
+                        completed.append(current)
+                    self._open_buckets[width] = bucket
+            self._write(f, width, completed)
+
+    def flush(self, f: h5py.File):
+        """Write the buckets being filled, e.g. before closing the file"""
+        for width, bucket in self._open_buckets.items():
+            if bucket is not None:
+                self._write(f, width, [bucket])
+            self._open_buckets[width] = None
+
+    def _write(self, f: h5py.File, width: float, buckets: list):
+        if not buckets:
+            return
+        counts = np.array([bucket.count for bucket in buckets])
+        columns = {'timestamps': np.array([bucket.bucket * width for bucket in buckets], dtype='f8'),
+                   'count': counts}
+        means = np.stack([bucket.total for bucket in buckets]) / counts.reshape(-1, *[1] * len(self.value_shape))
+        columns['mean'] = means
+        if self.kind == 'scalar':
+            squares = np.array([bucket.squares for bucket in buckets])
+            columns['min'] = np.array([bucket.low for bucket in buckets])
+            columns['max'] = np.array([bucket.high for bucket in buckets])
+            columns['std'] = np.sqrt(np.maximum(squares / counts - means ** 2, 0))
+
+        group = f[f'{self.prefix}/{tier_name(width)}']
+        for name, column in columns.items():
+            dataset = group[name]
+            start = dataset.shape[0]
+            dataset.resize(start + len(column), axis=0)
+            dataset[start:] = column
+            if f.swmr_mode:
+                dataset.flush()
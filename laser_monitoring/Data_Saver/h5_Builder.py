@@ -2,123 +2,475 @@ import h5py
 import numpy as np
 from typing import Any
 from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import math
 import time
+import zlib
 from laser_monitoring.Data_Saver.Nested_Dir import create_date_folders
+from laser_monitoring.Data_Saver import h5_Filters
+from laser_monitoring.Data_Saver.Summary_Tiers import SummaryTiers
+
+# Bit depths of camera sensors, the bit depth of integer data is rounded up to one of them
+sensor_bit_depths = (8, 10, 12, 14, 16, 24, 32, 64)
+bit_depth_rows = 8  # Rows of each batch looked at for the bit depth, spread over the batch
+
+
+def bit_depth(data: np.ndarray) -> int:
+    """Bits actually used by integer data (rounded up to a sensor bit depth), all bits for floats"""
+    bits = data.dtype.itemsize * 8
+    if data.dtype.kind not in 'iu' or data.size == 0:
+        return bits
+    used = int(data.max()).bit_length()
+    if data.dtype.kind == 'i':
+        # Two's complement: -2**(n-1) fits in n bits, as 2**(n-1) - 1 does
+        used = max(used, (-int(data.min()) - 1).bit_length()) + 1
+    return min(bits, next((depth for depth in sensor_bit_depths if depth >= used), bits))
+
+
+def written_rows(timestamps: h5py.Dataset) -> int:
+    """Rows written to a contiguous dataset, whose unwritten timestamps are NaN, by bisection"""
+    low, high = 0, timestamps.shape[0]
+    while low < high:
+        middle = (low + high) // 2
+        if np.isnan(timestamps[middle, 0]):
+            high = middle
+        else:
+            low = middle + 1
+    return low
 
 
 class H5Builder:
-    def __init__(self):
+    """
+    Persistent mode keeps the file open from create_file to close, grows datasets geometrically
+    rather than by one row per sample, and trims them to the rows written on close. The number
+    of rows written is kept in the 'rows' attribute of each dataset, updated on every flush, so
+    a file left untrimmed by a crash can still be read.
+
+    Data is stored in the native dtype of the device, and the bit depth it uses (e.g. 12 for a
+    12-bit camera delivering uint16) in the 'bit_depth' attribute, from the "bit depth" config key
+    or from the data written so far.
+
+    SWMR mode (single writer, multiple readers) lets H5Loader.follow and other readers open the
+    file while it is written. Datasets grow by exactly the rows written and are flushed on every
+    batch, so readers see whole rows only. Once start_swmr is called no dataset or attribute can be
+    created: devices still pending are saved from the next file, and bit depths are not updated.
+
+    With compression_workers > 0, datasets of one frame per chunk with the standard gzip filter
+    (and optional shuffle) are compressed by a thread pool, zlib releasing the GIL, and written
+    with write_direct_chunk. Files are the same as with h5py filters and read back as usual.
+
+    Devices with "contiguous rows" get contiguous, uncompressed datasets of that many rows, allocated
+    on creation, which H5Loader.as_memmap maps without copying. They cannot grow: rows past the end
+    are refused, so size them for a file (e.g. a day with daily rotation). Unwritten timestamps are
+    NaN, giving the rows written even when the 'rows' attribute is stale.
+
+    Datasets are created from the device format known when the file is created, possibly a cached
+    one. When the rows of a device no longer fit them (e.g. camera ROI changed), they are recreated
+    from the rows, the ones holding rows already kept as devices/<name>/previous_<n>/.
+    """
+    def __init__(self, persistent: bool = False, flush_interval: float = 5., growth_factor: float = 2.,
+                 min_growth_rows: int = 1024, swmr: bool = False, compression_workers: int = 0):
         self.lock = Lock()  # Thread safety for async operations
         self.defined_datasets = ['rolling_1d', 'static_1d', 'density_2d']
+        self.pending_devices = {}
+        self.devices = {}
+
+        self.swmr = swmr
+        self.persistent = persistent or swmr  # SWMR needs the file kept open
+        self.flush_interval = flush_interval  # seconds
+        self.growth_factor = growth_factor
+        self.min_growth_rows = min_growth_rows
+        self.h5 = None
+        self.rows = {}  # device_id -> rows written, datasets may be longer in persistent mode
+        self.bit_depths = {}  # device_id -> bit depth recorded in the 'bit_depth' attribute
+        self.time_span = {}  # device_id -> [first, last] timestamp written
+        self.contiguous = {}  # device_id -> (rows allocated, bytes per row, rows written when opened)
+        self.tiers = {}  # device_id -> SummaryTiers, 1 s / 1 min / 1 h summaries next to the data
+        self._last_flush = time.monotonic()
 
-    def create_file(self, file_name: str, root_path: str, devices: dict[str, Any]):
-        created_path = create_date_folders(root_path)
+        self.compression_workers = compression_workers
+        self._executor = None
+
+    def _open(self):
+        """File handle, kept open in persistent mode, opened for the call otherwise"""
+        if self.h5 is not None:
+            return contextlib.nullcontext(self.h5)
+        return h5py.File(self.file, 'a')
+
+    def create_file(self, file_name: str, root_path: str, devices: dict[str, Any], date=None):
+        created_path = create_date_folders(root_path, date)
         print(f'Created path: {created_path}')
+        self.close()
         self.file = created_path / file_name
+        self.devices = dict(devices)
+        # Devices not reachable yet, their datasets are created from their first sample
+        self.pending_devices = {}
+        self.rows = {}
+        self.bit_depths = {}
+        self.tiers = {}
+        self.time_span = {}
+        self.contiguous = {}
+        if self.swmr:
+            self.h5 = h5py.File(self.file, 'a', libver='latest')
+        elif self.persistent:
+            self.h5 = h5py.File(self.file, 'a')
 
         """Initialize datasets for each device"""
-        with h5py.File(self.file, 'a') as f:
+        with self._open() as f:
             for device_id, device in devices.items():
-                dim_y = device.shape[0]
+                if device.graph_type not in self.defined_datasets:
+                    continue
                 try:
-                    dim_x = device.shape[1]
-                except:
-                    dim_x = 0
-
-                if device.graph_type in self.defined_datasets:
-                    dataset_name = f'devices/{device_id}/data'
-                    timestamp_dataset_name = f'devices/{device_id}/timestamps'
-
-                    if device.graph_type == 'density_2d':
-                        _format = {
-                            "name": dataset_name,
-                            "shape": (0, dim_y, dim_x),  # Start with 0 images
-                            "maxshape": (None, dim_y, dim_x),  # Allow unlimited images
-                            "dtype": 'i2',
-                            "chunks": (1, dim_y, dim_x),  # One image per chunk
-                            "compression": 'gzip',
-                            "compression_opts": 4
-                        }
-                    else :
-                        _format = {
-                            "name": dataset_name,
-                            "shape": (dim_x, dim_y),
-                            "maxshape": (None, dim_y),
-                            "dtype": 'f4',
-                            "chunks": (1000, dim_y),
-                            "compression": 'gzip',
-                            "compression_opts": 4
-                        }
-
-
-                    if dataset_name not in f:
-                        # Create dataset for data using _format dictionary
-                        f.create_dataset(
-                            name=_format["name"],
-                            shape=_format["shape"],  # ← Use _format
-                            maxshape=_format["maxshape"],
-                            dtype=_format["dtype"],  # ← Use _format
-                            chunks=_format["chunks"],  # ← Use _format
-                            compression=_format["compression"],
-                            compression_opts=_format["compression_opts"]
-                        )
-
-                        # Store metadata as attributes
-                        f[dataset_name].attrs['device_name'] = device.name
-                        f[dataset_name].attrs['graph_type'] = device.graph_type
-
-                        # Create dataset for associated timestamp
-                        f.create_dataset(
-                            name=timestamp_dataset_name,
-                            shape=(0, 1),
-                            maxshape=(None, 1),
-                            dtype='f8',
-                            chunks=(1000, 1),
-                            compression='gzip',
-                            compression_opts= 4
-                        )
-
-                        # Store metadata as attributes
-                        f[dataset_name].attrs['device_name'] = device.name
-                        f[dataset_name].attrs['graph_type'] = device.graph_type
-
-            print(f"Success! Created datasets for {len(devices)} devices")
+                    shape, dtype = device.shape, device.dtype
+                except (ConnectionError, TimeoutError) as e:
+                    print(f'Shape of {device_id} unknown ({e}), datasets created on first sample')
+                    self.pending_devices[device_id] = device
+                    continue
+                self._create_device_datasets(f, device_id, device, shape, dtype)
+
+            print(f"Success! Created datasets for {len(devices) - len(self.pending_devices)} devices")
+
+    def _create_device_datasets(self, f: h5py.File, device_id: str, device, shape: tuple, dtype: str):
+        dim_y = shape[0]
+        try:
+            dim_x = shape[1]
+        except:
+            dim_x = 0
+
+        dataset_name = f'devices/{device_id}/data'
+        timestamp_dataset_name = f'devices/{device_id}/timestamps'
+        # Filter pipeline and chunk shape from the device config ("compression", "chunks")
+        compression = getattr(device, 'compression', None)
+        chunks = getattr(device, 'chunks', None)
+        contiguous_rows = getattr(device, 'contiguous_rows', None)
+        if contiguous_rows is not None:
+            self._create_contiguous_datasets(f, device_id, device, shape, dtype, contiguous_rows)
+            return
+
+        if device.graph_type == 'density_2d':
+            _format = {
+                "name": dataset_name,
+                "shape": (0, dim_y, dim_x),  # Start with 0 images
+                "maxshape": (None, dim_y, dim_x),  # Allow unlimited images
+                "dtype": dtype,  # Native camera dtype, e.g. uint16 for 12 and 16-bit cameras
+                "chunks": (1, dim_y, dim_x),  # One image per chunk
+            }
+        else :
+            _format = {
+                "name": dataset_name,
+                "shape": (dim_x, dim_y),
+                "maxshape": (None, dim_y),
+                "dtype": dtype,
+                "chunks": (1000, dim_y),
+            }
+        if chunks is not None:
+            if len(chunks) != len(_format["maxshape"]):
+                raise ValueError(f'{device_id}: chunks {chunks} do not match data shape {_format["maxshape"]}')
+            _format["chunks"] = tuple(chunks)
+
+
+        if dataset_name not in f:
+            # Create dataset for data using _format dictionary
+            f.create_dataset(
+                name=_format["name"],
+                shape=_format["shape"],  # ← Use _format
+                maxshape=_format["maxshape"],
+                dtype=_format["dtype"],  # ← Use _format
+                chunks=_format["chunks"],  # ← Use _format
+                **h5_Filters.dataset_options(compression)
+            )
+
+            # Store metadata as attributes
+            f[dataset_name].attrs['device_name'] = device.name
+            f[dataset_name].attrs['graph_type'] = device.graph_type
+            f[dataset_name].attrs['compression'] = h5_Filters.describe(h5_Filters.applied(f[dataset_name]))
+            if getattr(device, 'bit_depth', None) is not None:
+                f[dataset_name].attrs['bit_depth'] = device.bit_depth
+
+            # Create dataset for associated timestamp
+            f.create_dataset(
+                name=timestamp_dataset_name,
+                shape=(0, 1),
+                maxshape=(None, 1),
+                dtype='f8',
+                chunks=(1000, 1),
+                compression='gzip',
+                compression_opts= 4
+            )
+
+        self._create_tiers(f, device_id, f[dataset_name].shape[1:])
+
+    def _create_contiguous_datasets(self, f: h5py.File, device_id: str, device, shape: tuple, dtype: str,
+                                    rows: int):
+        """Fixed size, uncompressed datasets stored in one block each, see H5Loader.as_memmap"""
+        if getattr(device, 'compression', None) is not None or getattr(device, 'chunks', None) is not None:
+            print(f'{device_id}: "contiguous rows" set, "compression" and "chunks" ignored')
+        row_shape = tuple(shape) if device.graph_type == 'density_2d' else (shape[0],)
+        dataset_name = f'devices/{device_id}/data'
+        timestamp_dataset_name = f'devices/{device_id}/timestamps'
+
+        if dataset_name not in f:
+            # Allocated now so the file offset is known, data left unfilled, timestamps filled with NaN
+            dcpl = h5py.h5p.create(h5py.h5p.DATASET_CREATE)
+            dcpl.set_alloc_time(h5py.h5d.ALLOC_TIME_EARLY)
+            dcpl.set_fill_time(h5py.h5d.FILL_TIME_NEVER)
+            f.create_dataset(dataset_name, shape=(rows, *row_shape), dtype=dtype, dcpl=dcpl)
+            f[dataset_name].attrs['device_name'] = device.name
+            f[dataset_name].attrs['graph_type'] = device.graph_type
+            f[dataset_name].attrs['compression'] = 'none'
+            f[dataset_name].attrs['layout'] = 'contiguous'
+            if getattr(device, 'bit_depth', None) is not None:
+                f[dataset_name].attrs['bit_depth'] = device.bit_depth
+
+            dcpl = h5py.h5p.create(h5py.h5p.DATASET_CREATE)
+            dcpl.set_alloc_time(h5py.h5d.ALLOC_TIME_EARLY)
+            dcpl.set_fill_time(h5py.h5d.FILL_TIME_ALLOC)
+            f.create_dataset(timestamp_dataset_name, shape=(rows, 1), dtype='f8', fillvalue=np.nan, dcpl=dcpl)
+
+        data = f[dataset_name]
+        self.contiguous[device_id] = (data.shape[0], data[0].nbytes + 8, written_rows(f[timestamp_dataset_name]))
+        self._create_tiers(f, device_id, f[dataset_name].shape[1:])
+
+    def _create_tiers(self, f: h5py.File, device_id: str, shape: tuple):
+        self.tiers[device_id] = SummaryTiers(f'devices/{device_id}/tiers', shape)
+        self.tiers[device_id].create(f)
+
+    def start_swmr(self):
+        """Let readers in, call once every dataset and static data is created"""
+        with self.lock:
+            if self.swmr and self.h5 is not None and not self.h5.swmr_mode:
+                self.h5.swmr_mode = True
+                print(f'{self.file} open for SWMR readers')
+
+    @property
+    def _swmr_started(self) -> bool:
+        return self.h5 is not None and self.h5.swmr_mode
+
+    def write_static(self, device_id: str, data: dict, timestamp: float):
+        """Store static data (e.g. spectrometer axis) once per device, as devices/<name>/<key>"""
+        with self.lock:
+            with self._open() as f:
+                for key, value in data.items():
+                    value = np.asarray(value)
+                    dataset_name = f'devices/{device_id}/{key}'
+                    if self._swmr_started:
+                        # Only values of existing datasets can change in SWMR mode
+                        if dataset_name in f and f[dataset_name].shape == value.shape:
+                            f[dataset_name][...] = value
+                            f[dataset_name].flush()
+                        else:
+                            print(f'{dataset_name} changed shape, saved from the next file (SWMR mode)')
+                        continue
+                    if dataset_name in f and f[dataset_name].shape != value.shape:
+                        del f[dataset_name]
+                    if dataset_name in f:
+                        f[dataset_name][...] = value
+                    else:
+                        f.create_dataset(name=dataset_name, data=value)
+                    f[dataset_name].attrs['static'] = True
+                    f[dataset_name].attrs['timestamp'] = timestamp
 
     def append_batch(self, device_id: str, data: np.ndarray, timestamps: np.ndarray):
-        """Append multiple (timestamp, value) pairs at once
+        """Append one (timestamp, value) pair"""
+        self.append_rows(device_id, np.asarray(data)[np.newaxis], np.atleast_1d(timestamps))
 
-        """
-        t_0 = time.time()
+    def append_rows(self, device_id: str, rows: np.ndarray, timestamps: np.ndarray):
+        """Append rows stacked along the first axis, with one timestamp per row"""
+        timestamps = np.asarray(timestamps, dtype='f8').ravel()
 
         with self.lock:
-            with h5py.File(self.file, 'a') as f:
+            with self._open() as f:
                 dataset_name = f'devices/{device_id}/data'
-                timestamp_dataset_name = f'devices/{device_id}/timestamps'
-                print(f'Dataset name: {dataset_name}')
                 
+                if dataset_name not in f and device_id in self.pending_devices and not self._swmr_started:
+                    self._create_device_datasets(f, device_id, self.pending_devices.pop(device_id),
+                                                 rows.shape[1:] or (1,), rows.dtype.name)
+
                 if dataset_name not in f:
                     raise ValueError(f"Dataset {dataset_name} not found")
-                
-                dataset = f[dataset_name]
-                timestamp_dataset = f[timestamp_dataset_name]
-                graph_type = dataset.attrs.get('graph_type')
 
-                current_size = dataset.shape[0]
-                if graph_type == 'density_2d':
-                    # Resize dataset and add new image
-                    dataset.resize((dataset.shape[0] + 1, *dataset.shape[1:]))
-                    # Add image to the last position
-                    dataset[-1] = data
-                else:
-                    # Resize and append
-                    dataset.resize(current_size + 1, axis=0)
-                    dataset[current_size:] = data
+                if not self._fits(f[dataset_name], rows):
+                    self._replace_device_datasets(f, device_id, rows)
+
+                self._append_rows(f, device_id, rows, timestamps)
+                if self._swmr_started:
+                    f[dataset_name].flush()
+                    f[f'devices/{device_id}/timestamps'].flush()
+                elif self.persistent and time.monotonic() - self._last_flush >= self.flush_interval:
+                    self._flush(f)
+
+    def _append_rows(self, f: h5py.File, device_id: str, data: np.ndarray, timestamps: np.ndarray):
+        dataset = f[f'devices/{device_id}/data']
+        timestamp_dataset = f[f'devices/{device_id}/timestamps']
+
+        start = self._rows_written(device_id, dataset, timestamp_dataset)
+        end = start + len(timestamps)
+
+        self._reserve(dataset, end)
+        self._reserve(timestamp_dataset, end)
+        data = data.reshape((len(timestamps), *dataset.shape[1:]))
+        if self._direct_chunks(dataset):
+            self._write_direct_chunks(dataset, start, data)
+        else:
+            dataset[start:end] = data
+        timestamp_dataset[start:end] = timestamps.reshape(-1, 1)
+        self.rows[device_id] = end
+        self.time_span.setdefault(device_id, [timestamps[0], timestamps[-1]])[1] = timestamps[-1]
+        self._summarise(f, device_id, dataset, data, timestamps)
+        self._record_bit_depth(dataset, device_id, data)
+
+    def _rows_written(self, device_id: str, dataset: h5py.Dataset, timestamp_dataset: h5py.Dataset) -> int:
+        if device_id in self.rows:
+            return self.rows[device_id]
+        if dataset.chunks is None:
+            return written_rows(timestamp_dataset)
+        return int(dataset.attrs.get('rows', dataset.shape[0]))
+
+    @staticmethod
+    def _fits(dataset: h5py.Dataset, rows: np.ndarray) -> bool:
+        """Whether rows have the frame shape of dataset, or its size for 1D data (scalars come as (n,) or (n, 1))"""
+        if dataset.ndim == 3:
+            return rows.shape[1:] == dataset.shape[1:]
+        return int(np.prod(rows.shape[1:])) == dataset.shape[1]
+
+    def _replace_device_datasets(self, f: h5py.File, device_id: str, rows: np.ndarray):
+        """Recreate the datasets of a device from rows of a new format, keeping the rows already written"""
+        group = f[f'devices/{device_id}']
+        old_shape = group['data'].shape[1:]
+        if self._swmr_started:
+            raise ValueError(f'{device_id} format changed from {old_shape} to {rows.shape[1:]}, '
+                             f'saved from the next file (SWMR mode)')
+        print(f'{device_id}: format changed from {old_shape} to {rows.shape[1:]}, datasets recreated')
+
+        if device_id not in self.devices:
+            raise ValueError(f'{device_id} format changed from {old_shape} to {rows.shape[1:]}, device unknown')
+        if device_id in self.tiers:
+            self.tiers[device_id].flush(f)
 
-                current_size = timestamp_dataset.shape[0]
-                timestamp_dataset.resize(current_size + 1, axis=0)
-                timestamp_dataset[current_size:] = timestamps
+        written = self._rows_written(device_id, group['data'], group['timestamps'])
+        names = [name for name in ('data', 'timestamps', 'tiers') if name in group]
+        if written:
+            for name in ('data', 'timestamps'):
+                if group[name].chunks is not None:
+                    group[name].resize(written, axis=0)
+                group[name].attrs['rows'] = written
+            previous = group.create_group(f'previous_{1 + sum(name.startswith("previous_") for name in group)}')
+            for name in names:
+                group.move(name, f'{previous.name}/{name}')
+        else:
+            for name in names:
+                del group[name]
+        for state in (self.rows, self.bit_depths, self.time_span, self.tiers, self.contiguous):
+            state.pop(device_id, None)
+        self._create_device_datasets(f, device_id, self.devices[device_id], rows.shape[1:] or (1,), rows.dtype.name)
 
+    def _summarise(self, f: h5py.File, device_id: str, dataset: h5py.Dataset, data: np.ndarray,
+                   timestamps: np.ndarray):
+        """Update the summary tiers of the device with the rows just written"""
+        if device_id not in self.tiers:
+            # Datasets of a previous run of the same file
+            tiers = SummaryTiers(f'devices/{device_id}/tiers', dataset.shape[1:])
+            if tiers.prefix not in f:
+                if self._swmr_started:
+                    return
+                tiers.create(f)
+            self.tiers[device_id] = tiers
+        self.tiers[device_id].append(f, timestamps, data)
 
-        print(f'saving batch took {time.time()-t_0}s')
-    
+    def _record_bit_depth(self, dataset: h5py.Dataset, device_id: str, data: np.ndarray):
+        """Raise 'bit_depth' when the data written uses more bits than recorded (or configured)"""
+        if device_id not in self.bit_depths:
+            self.bit_depths[device_id] = int(dataset.attrs.get('bit_depth', 0))
+        if self.bit_depths[device_id] >= data.dtype.itemsize * 8:
+            return  # Every bit in use already
+        # A few rows spread over the batch, rather than an extra pass over every frame
+        depth = bit_depth(data[::max(1, len(data) // bit_depth_rows)])
+        if depth > self.bit_depths[device_id] and not self._swmr_started:
+            self.bit_depths[device_id] = depth
+            dataset.attrs['bit_depth'] = depth
 
+    def _direct_chunks(self, dataset: h5py.Dataset) -> bool:
+        """Whether rows of dataset can be compressed here and written as chunks"""
+        return (self.compression_workers > 0 and dataset.compression == 'gzip'
+                and dataset.chunks == (1, *dataset.shape[1:])
+                and not dataset.fletcher32 and dataset.scaleoffset is None)
+
+    def _write_direct_chunks(self, dataset: h5py.Dataset, start: int, data: np.ndarray):
+        """Compress one chunk per row in the thread pool, then write them in order"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.compression_workers,
+                                                thread_name_prefix='H5Builder compression')
+        data = np.ascontiguousarray(data, dtype=dataset.dtype)
+        level, shuffle = dataset.compression_opts, dataset.shuffle
+
+        def compress(row: np.ndarray) -> bytes:
+            if shuffle:
+                # HDF5 shuffle filter: byte 0 of every element, then byte 1...
+                row = row.view(np.uint8).reshape(-1, row.dtype.itemsize).T
+            return zlib.compress(np.ascontiguousarray(row).tobytes(), level)
+
+        zero = (0,) * (dataset.ndim - 1)
+        for i, chunk in enumerate(self._executor.map(compress, data)):
+            dataset.id.write_direct_chunk((start + i, *zero), chunk, filter_mask=0)
+
+    def _reserve(self, dataset: h5py.Dataset, rows: int):
+        """Make room for rows, in geometric steps in persistent mode (unwritten chunks cost no space)"""
+        if dataset.shape[0] >= rows:
+            return
+        if dataset.chunks is None:
+            raise ValueError(f'{dataset.name} is contiguous and full ({dataset.shape[0]} rows), '
+                             f'raise its "contiguous rows"')
+        if self.persistent and not self.swmr:  # SWMR readers take the dataset length as the rows written
+            rows = max(rows, math.ceil(dataset.shape[0] * self.growth_factor), self.min_growth_rows)
+        dataset.resize(rows, axis=0)
+
+    def _flush(self, f: h5py.File):
+        for device_id, rows in self.rows.items():
+            f[f'devices/{device_id}/data'].attrs['rows'] = rows
+            f[f'devices/{device_id}/timestamps'].attrs['rows'] = rows
+        f.flush()
+        self._last_flush = time.monotonic()
+
+    def unwritten_bytes(self) -> int:
+        """Bytes allocated to contiguous datasets for rows not written yet, part of the file size already"""
+        with self.lock:
+            return sum((allocated - self.rows.get(device_id, written)) * row_bytes
+                       for device_id, (allocated, row_bytes, written) in self.contiguous.items())
+
+    def summary(self) -> dict:
+        """Devices, time span and rows written, as recorded in the day folder manifest"""
+        with self.lock:
+            spans = list(self.time_span.values())
+            return {'devices': sorted(self.rows),
+                    'start': float(min(span[0] for span in spans)) if spans else None,
+                    'end': float(max(span[1] for span in spans)) if spans else None,
+                    'rows': {device_id: int(rows) for device_id, rows in self.rows.items()}}
+
+    def flush(self):
+        with self.lock:
+            if self.h5 is not None and not self._swmr_started:
+                self._flush(self.h5)
+
+    def close(self):
+        """Trim datasets to the rows written and close the file, in persistent mode"""
+        with self.lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+            if self.tiers:
+                # Buckets still being filled
+                with self._open() as f:
+                    for tiers in self.tiers.values():
+                        tiers.flush(f)
+                self.tiers = {}
+            if self.h5 is None:
+                return
+            for device_id, rows in ({} if self._swmr_started else self.rows).items():
+                for name in ('data', 'timestamps'):
+                    dataset = self.h5[f'devices/{device_id}/{name}']
+                    if dataset.chunks is not None:  # Contiguous datasets keep their size
+                        dataset.resize(rows, axis=0)
+                    dataset.attrs['rows'] = rows
+            self.h5.close()
+            self.h5 = None
@@ -0,0 +1,97 @@
+"""
+Compression filter pipelines for the device datasets, chosen per device in the JSON config with
+"compression", either a codec name or a dict:
+
+    "compression": "lzf"
+    "compression": {"codec": "gzip", "level": 1, "shuffle": true}
+    "compression": {"codec": "blosc", "cname": "zstd", "level": 5, "shuffle": "bit"}
+
+Codecs: "none", "gzip" (level 0-9), "lzf", and through hdf5plugin, when installed, "lz4", "zstd"
+(level), "bitshuffle" (bitshuffle + lz4) and "blosc" (cname lz4, lz4hc, zstd, zlib or blosclz,
+level, shuffle "byte", "bit" or "none"). "shuffle": true adds the HDF5 byte shuffle filter in
+front of gzip, lzf, lz4 and zstd.
+
+Importing this module registers the hdf5plugin filters, so files written with them can be read.
+"""
+try:
+    import hdf5plugin
+except ImportError:
+    hdf5plugin = None
+
+default_compression = {'codec': 'gzip', 'level': 4}
+plugin_codecs = ('lz4', 'zstd', 'bitshuffle', 'blosc')
+filter_codecs = {1: 'gzip', 32000: 'lzf', 32004: 'lz4', 32015: 'zstd', 32008: 'bitshuffle', 32001: 'blosc'}
+blosc_cnames = {0: 'blosclz', 1: 'lz4', 2: 'lz4hc', 4: 'zlib', 5: 'zstd'}
+blosc_shuffles = {0: 'none', 1: 'byte', 2: 'bit'}
+
+
+def normalize(spec) -> dict:
+    """Dict form of a "compression" config value"""
+    if spec is None:
+        return dict(default_compression)
+    if isinstance(spec, str):
+        return {'codec': spec}
+    return dict(spec)
+
+
+def describe(spec) -> str:
+    """Short text form of a filter pipeline, stored with the dataset and printed by benchmarks"""
+    spec = normalize(spec)
+    options = ' '.join(f'{key}={value}' for key, value in spec.items() if key != 'codec')
+    return f"{spec['codec']} {options}".strip()
+
+
+def applied(dataset) -> dict:
+    """
+    Dict form of the filter pipeline a dataset was created with, read from its creation property
+    list: it differs from the one asked for when a codec fell back (e.g. hdf5plugin not installed)
+    """
+    plist = dataset.id.get_create_plist()
+    filters = {}
+    for index in range(plist.get_nfilters()):
+        code, _, values, _ = plist.get_filter(index)
+        filters[code] = values
+    codec = next((filter_codecs[code] for code in filters if code in filter_codecs), 'none')
+
+    spec = {'codec': codec}
+    if codec == 'gzip':
+        spec['level'] = filters[1][0]
+    elif codec == 'zstd':
+        spec['level'] = filters[32015][0]
+    elif codec == 'blosc' and len(filters[32001]) >= 7:
+        values = filters[32001]
+        spec.update(cname=blosc_cnames.get(values[6], values[6]), level=values[4],
+                    shuffle=blosc_shuffles.get(values[5], values[5]))
+    if 2 in filters and codec in ('gzip', 'lzf', 'lz4', 'zstd'):
+        spec['shuffle'] = True
+    return spec
+
+
+def dataset_options(spec) -> dict:
+    """Keyword arguments of h5py create_dataset for a "compression" config value"""
+    spec = normalize(spec)
+    codec = spec['codec']
+    shuffle = spec.get('shuffle') is True
+
+    if codec in plugin_codecs and hdf5plugin is None:
+        print(f'hdf5plugin not installed, {codec} replaced by {describe(default_compression)}')
+        return dataset_options(default_compression)
+
+    if codec == 'none':
+        return {}
+    if codec == 'gzip':
+        return {'compression': 'gzip', 'compression_opts': spec.get('level', 4), 'shuffle': shuffle}
+    if codec == 'lzf':
+        return {'compression': 'lzf', 'shuffle': shuffle}
+    if codec == 'lz4':
+        return {**hdf5plugin.LZ4(), 'shuffle': shuffle}
+    if codec == 'zstd':
+        return {**hdf5plugin.Zstd(clevel=spec.get('level', 3)), 'shuffle': shuffle}
+    if codec == 'bitshuffle':
+        return dict(hdf5plugin.Bitshuffle(cname='lz4'))
+    if codec == 'blosc':
+        shuffles = {'none': hdf5plugin.Blosc.NOSHUFFLE, 'byte': hdf5plugin.Blosc.SHUFFLE,
+                    'bit': hdf5plugin.Blosc.BITSHUFFLE}
+        return dict(hdf5plugin.Blosc(cname=spec.get('cname', 'lz4'), clevel=spec.get('level', 5),
+                                     shuffle=shuffles[spec.get('shuffle', 'byte')]))
+    raise ValueError(f'Unknown compression codec {codec}')
@@ -1,14 +1,34 @@
+import math
+
 import h5py
 import numpy as np
 import pathlib
+from laser_monitoring.Data_Saver import h5_Filters  # Registers the hdf5plugin filters, when installed
+from laser_monitoring.Data_Saver.h5_Builder import written_rows
 
 class H5Loader:
+    """
+    Reads files written by H5Builder through one handle, kept open across calls until close
+    (opened in SWMR mode when the file allows it). get_range and iter_range read the rows of a time
+    range only, found by binary search in a cached copy of the device timestamps.
+    """
+    chunk_rows = 256  # Rows per chunk yielded by iter_range
 
     def __init__(self, file: pathlib.Path):
         self.file = file
+        self._live = None  # Handle kept open across calls
+        self._timestamps = {}  # device_id -> cached timestamps
+        self._datasets = {}  # name -> dataset of the open handle
+        self._followed_rows = {}
         self._device_groups = self._get_device_groups()
         self._device_datasets = self._get_device_datasets()
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
     @property
     def device_groups(self):
         return self._device_groups
@@ -17,23 +37,195 @@ class H5Loader:
     def device_datasets(self):
         return self._device_datasets
 
+    def _handle(self) -> h5py.File:
+        if self._live is None:
+            try:
+                self._live = h5py.File(self.file, 'r', libver='latest', swmr=True)
+            except OSError:
+                self._live = h5py.File(self.file, 'r')  # Not written in SWMR mode
+        return self._live
+
+    def device_ids(self) -> list:
+        """Devices with rows, devices with static data only (e.g. unreachable at the start of the file) have none"""
+        f = self._handle()
+        return [device_id for device_id in f.get('devices', {}) if f'devices/{device_id}/data' in f]
+
+    def frame_shape(self, device_id: str) -> tuple:
+        """Shape of one frame of a device, () for scalars"""
+        data, _, _ = self._device_rows(device_id)
+        return data.shape[1:]
+
     def _get_device_groups(self) -> list:
-        with h5py.File(self.file, 'r') as f:
-            return list(f.keys())
+        return list(self._handle().keys())
 
     def _get_device_datasets(self) -> list:
-        with h5py.File(self.file, 'r') as f:
-            a_group_key = list(f.keys())[0]
-            return list(f[a_group_key])
+        f = self._handle()
+        a_group_key = list(f.keys())[0]
+        return list(f[a_group_key])
 
     def get_device_data(self, group_name: str, dataset_name: str) -> np.ndarray:
             """Retrieve all data for a specific device"""
-            with h5py.File(self.file, 'r') as f:
-                dataset_name = f'{group_name}/{dataset_name}'
-                if dataset_name in f:
-                    return f[dataset_name][:]
-                else:
-                    raise ValueError(f"Dataset {dataset_name} not found")
+            f = self._handle()
+            dataset_name = f'{group_name}/{dataset_name}'
+            if dataset_name in f:
+                return f[dataset_name][:]
+            else:
+                raise ValueError(f"Dataset {dataset_name} not found")
+
+    def _dataset(self, name: str) -> h5py.Dataset:
+        """
+        One object per dataset for the life of the handle: refreshing a second object of a dataset
+        breaks reads through the first one, on files not written in SWMR mode
+        """
+        if name not in self._datasets:
+            self._datasets[name] = self._handle()[name]
+        return self._datasets[name]
+
+    def _device_rows(self, device_id: str) -> tuple[h5py.Dataset, h5py.Dataset, int]:
+        """Data and timestamp datasets of a device, and the number of rows written, once per call"""
+        f = self._handle()
+        if f'devices/{device_id}/data' not in f:
+            raise ValueError(f"Device {device_id} not found in {self.file}")
+        data, timestamps = self._dataset(f'devices/{device_id}/data'), self._dataset(f'devices/{device_id}/timestamps')
+        if timestamps.chunks is None:
+            # Contiguous datasets are preallocated, rows past the written ones have NaN timestamps
+            if f.swmr_mode:
+                timestamps.refresh()
+            return data, timestamps, written_rows(timestamps)
+        if f.swmr_mode:
+            data.refresh()
+            timestamps.refresh()
+            return data, timestamps, min(data.shape[0], timestamps.shape[0])
+        end = min(data.shape[0], timestamps.shape[0])
+        return data, timestamps, min(end, data.attrs.get('rows', end))  # Persistent files are longer than the rows written
+
+    def timestamps(self, device_id: str) -> np.ndarray:
+        """Timestamps of a device, cached, only rows appended since the last call are read"""
+        _, timestamps, end = self._device_rows(device_id)
+        return self._cached_timestamps(device_id, timestamps, end)
+
+    def _cached_timestamps(self, device_id: str, timestamps: h5py.Dataset, end: int) -> np.ndarray:
+        cached = self._timestamps.get(device_id, np.empty(0))
+        if len(cached) < end:
+            cached = np.concatenate((cached, timestamps[len(cached):end, 0]))
+            self._timestamps[device_id] = cached
+        return cached[:end]
+
+    def _range_rows(self, device_id: str, timestamps: h5py.Dataset, end: int, t_start: float,
+                    t_end: float) -> tuple[np.ndarray, int, int]:
+        """Cached timestamps, and first and last rows of the time range, from datasets already resolved"""
+        cached = self._cached_timestamps(device_id, timestamps, end)
+        return (cached, int(np.searchsorted(cached, t_start, side='left')),
+                int(np.searchsorted(cached, t_end, side='right')))
+
+    def iter_range(self, device_id: str, t_start: float, t_end: float, step: int | None = None,
+                   columns=(), chunk_rows: int | None = None):
+        """
+        Yield (timestamps, data) of the rows with t_start <= timestamp <= t_end, in chunks of at most
+        chunk_rows rows. step keeps one row in step, columns indexes the axes of a row, e.g.
+        slice(100, 200) for a band of a spectrum or (slice(0, 300), slice(200, 500)) for an image region.
+        """
+        data, timestamps, end = self._device_rows(device_id)
+        timestamps, first, last = self._range_rows(device_id, timestamps, end, t_start, t_end)
+        step = step or 1
+        chunk_rows = chunk_rows or self.chunk_rows
+        columns = columns if isinstance(columns, tuple) else (columns,)
+
+        for start in range(first, last, chunk_rows * step):
+            stop = min(start + chunk_rows * step, last)
+            yield timestamps[start:stop:step], data[(slice(start, stop, step), *columns)]
+
+    def get_range(self, device_id: str, t_start: float, t_end: float, step: int | None = None,
+                  columns=()) -> tuple[np.ndarray, np.ndarray]:
+        """Timestamps and data of the rows with t_start <= timestamp <= t_end, see iter_range"""
+        data, timestamps, end = self._device_rows(device_id)
+        timestamps, first, last = self._range_rows(device_id, timestamps, end, t_start, t_end)
+        columns = columns if isinstance(columns, tuple) else (columns,)
+        rows = slice(first, last, step or 1)
+        return timestamps[rows], data[(rows, *columns)]
+
+    def _memmap(self, dataset: h5py.Dataset, rows: int) -> np.ndarray:
+        """View of the first rows of dataset mapped from the file, or a copy if its layout can't be mapped"""
+        offset = dataset.id.get_offset() if dataset.chunks is None and dataset.external is None else None
+        if offset is None or dataset.file.driver != 'sec2':
+            return dataset[:rows]  # Chunked (compressed), external or not yet allocated
+        return np.memmap(self.file, dtype=dataset.dtype, mode='r', offset=offset, shape=dataset.shape)[:rows]
+
+    def as_memmap(self, device_id: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Timestamps and data of every row of a device as numpy.memmap views of the file: no
+        decompression, no copy, pages read as they are touched. Only contiguous, uncompressed
+        datasets ("contiguous rows" in the device config) can be mapped, others are read as usual.
+        """
+        data, timestamps, end = self._device_rows(device_id)
+        return self._memmap(timestamps, end)[:, 0], self._memmap(data, end)
+
+    def _tier_timestamps(self, device_id: str, group: h5py.Group) -> np.ndarray:
+        """Bucket start times of a summary tier, cached like the raw timestamps"""
+        key = (device_id, group.name)
+        timestamps = self._dataset(f'{group.name}/timestamps')
+        if self._handle().swmr_mode:
+            timestamps.refresh()
+        cached = self._timestamps.get(key, np.empty(0))
+        if len(cached) < timestamps.shape[0]:
+            cached = np.concatenate((cached, timestamps[len(cached):]))
+            self._timestamps[key] = cached
+        return cached
+
+    def get_summary(self, device_id: str, t_start: float, t_end: float,
+                    max_points: int = 2000) -> tuple[str, dict]:
+        """
+        The time range at the finest resolution holding at most max_points rows: the raw data if it
+        fits, else the first summary tier (1 s, 1 min, 1 h) that does, else the coarsest one.
+        Returns the tier name ('raw', '1s'...) and a dict of arrays: timestamps and data for raw,
+        timestamps (bucket starts), count, mean, and min, max, std for scalars, for tiers.
+        """
+        data, timestamps, end = self._device_rows(device_id)
+        timestamps, first, last = self._range_rows(device_id, timestamps, end, t_start, t_end)
+        f = self._handle()
+        tiers = f.get(f'devices/{device_id}/tiers')
+        if last - first <= max_points or tiers is None:
+            # Files without tiers: decimate the raw data
+            rows = slice(first, last, max(1, math.ceil((last - first) / max_points)))
+            return 'raw', {'timestamps': timestamps[rows], 'data': data[rows]}
+
+        groups = sorted(tiers.values(), key=lambda group: group.attrs['width'])
+        for group in groups:
+            timestamps = self._tier_timestamps(device_id, group)
+            # Buckets overlapping the range, the first one may start before t_start
+            first = int(np.searchsorted(timestamps, t_start - group.attrs['width'], side='right'))
+            last = int(np.searchsorted(timestamps, t_end, side='right'))
+            if last - first <= max_points or group is groups[-1]:
+                fields = {name: self._dataset(f'{group.name}/{name}') for name in group if name != 'timestamps'}
+                if f.swmr_mode:
+                    for dataset in fields.values():
+                        dataset.refresh()
+                last = min([last] + [dataset.shape[0] for dataset in fields.values()])
+                summary = {name: dataset[first:last] for name, dataset in fields.items()}
+                return group.name.rsplit('/', 1)[-1], {'timestamps': timestamps[first:last], **summary}
+
+    def follow(self, device_ids: list | None = None) -> dict:
+        """
+        Rows appended since the previous call, as {device_id: (timestamps, data)}, all rows on the
+        first call. Tails a file written in SWMR mode without copying it, the file stays open until close.
+        """
+        if device_ids is None:
+            device_ids = self.device_ids()
+        new_rows = {}
+        for device_id in device_ids:
+            data, timestamps, end = self._device_rows(device_id)
+            start = self._followed_rows.get(device_id, 0)
+            new_rows[device_id] = (timestamps[start:end, 0], data[start:end])
+            self._followed_rows[device_id] = end
+        return new_rows
+
+    def close(self):
+        if self._live is not None:
+            self._live.close()
+            self._live = None
+            self._followed_rows = {}
+            self._timestamps = {}
+            self._datasets = {}
 
 
 if __name__ == '__main__':
@@ -43,6 +235,7 @@ if __name__ == '__main__':
         for dataset_name in h5_file.device_datasets:
             print(f'Dataset name: {dataset_name}, data: '
                   f'{h5_file.get_device_data(device_group, dataset_name)}')
+    h5_file.close()
 
 
 
@@ -0,0 +1,174 @@
+"""
+Optional acquisition engine: every device is driven by one asyncio loop, running in one thread,
+instead of one QThread and one timer chain per device.
+
+Workers keep the data_received / error_occurred / static_received signals of Data_Acquisition,
+emitted from the engine thread and delivered to the GUI thread through queued connections.
+Tango devices use the PyTango asyncio green mode proxy of the ProxyPool, so reads of all devices
+overlap, with one green mode proxy per address shared by its asyncio devices.
+
+To use it, set "acquisition engine": "asyncio" in a device definition, or pass
+acquisition_engine='asyncio' to Laser_Data to make it the default.
+"""
+import asyncio
+import threading
+import time
+from datetime import datetime
+
+import tango
+
+from laser_monitoring.Device_Classes.Data_Acquisition import VirtualDevice, TangoDevice
+from laser_monitoring.Device_Classes.Proxy_Pool import ProxyPool
+
+
+class AcquisitionEngine:
+    """Single asyncio loop in a dedicated thread, shared by every asyncio device"""
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name='AcquisitionEngine', daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def instance(cls) -> 'AcquisitionEngine':
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    @classmethod
+    def shutdown(cls, timeout: float = 5.0):
+        """Cancel every device task, then stop the loop and its thread"""
+        with cls._instance_lock:
+            engine, cls._instance = cls._instance, None
+        if engine is not None:
+            asyncio.run_coroutine_threadsafe(engine._cancel_all(), engine.loop).result(timeout)
+            engine.loop.call_soon_threadsafe(engine.loop.stop)
+            engine.thread.join(timeout)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        self.loop.close()
+
+    async def _cancel_all(self):
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def submit(self, coroutine):
+        """Schedule a coroutine on the engine loop, from any thread"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+
+class AsyncVirtualDevice(VirtualDevice):
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._task = None
+
+    def _generate_data(self):
+        self._task = AcquisitionEngine.instance().submit(self._poll())
+
+    def stop(self):
+        super().stop()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _poll(self):
+        while self.running:
+            self.scheduler.tick()
+            data = self.data_generator()
+            self.data_received.emit(self.device_id, data, datetime.now().timestamp())
+            await asyncio.sleep(self.scheduler.next_delay())
+
+
+class AsyncTangoDevice(TangoDevice):
+    """
+    Polling runs on the engine loop with the asyncio green mode proxy of the ProxyPool, shared by every
+    asyncio device on the address. Event acquisition needs no thread of its own (tango calls back from
+    its event thread), so it is shared with TangoDevice, polling is the fallback. Events are subscribed
+    once the pool has connected the device, and again on the new proxy after each reconnection.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._task = None
+        self._async_proxy = None
+        self._generation = None  # Pool generation of _async_proxy
+        self._events_unavailable = False
+
+    def start(self):
+        self.running = True
+        self.period_ms = int(self.polling_period*1000)
+        self._t0 = datetime.now().timestamp()
+        self.scheduler.start()
+        self._subscribed = None
+        self._events_unavailable = self.acquisition_mode != 'event'
+        self._task = AcquisitionEngine.instance().submit(self._poll())
+
+    def stop(self):
+        self.running = False
+        if self._task is not None:
+            self._task.cancel()
+        self._unsubscribe(self._event_ids)
+        self._print_stats()
+
+    async def _read_attributes_async(self, keys: list | None = None) -> tuple[dict, float]:
+        keys = self._tango_keys if keys is None else keys
+        t_0 = time.perf_counter()
+        replies = await self._async_proxy.read_attributes([self.parent.attrs[key] for key in keys])
+        return self._unpack_replies(keys, replies, time.perf_counter() - t_0)
+
+    async def _connect(self):
+        """Green mode proxy of the ProxyPool, waits while the pool (re)connects with its backoff"""
+        while self.running:
+            try:
+                self._async_proxy = await ProxyPool.instance().async_proxy(self.parent.address)
+                self._generation = self.parent.device_proxy.generation  # The one async_proxy was made in
+                return
+            except tango.DevFailed as e:
+                self._on_read_failure(e)
+                await asyncio.sleep(ProxyPool.instance().initial_backoff)
+
+    async def _events_active(self) -> bool:
+        """Subscribe to events on the current pooled proxy if not done yet, False when polling"""
+        if self._events_unavailable:
+            return False
+        if self._subscribed == self.parent.device_proxy.generation:
+            return True
+        self._event_ids.clear()  # Subscriptions of a dropped proxy went with it
+        if await asyncio.to_thread(self._subscribe_events):
+            print(f'{self.device_id}: acquiring on {self.event_type} events')
+            return True
+        self._events_unavailable = True
+        return False
+
+    async def _poll(self):
+        """Read static attributes every 'static refresh period', and dynamic ones every polling period"""
+        await self._connect()
+
+        next_static_refresh = 0.
+        while self.running:
+            events = False
+            try:
+                if self.parent.device_proxy.generation != self._generation:
+                    await self._connect()  # The pool reconnected: new proxy, events to subscribe again
+                events = await self._events_active()
+                if self._static_keys and time.monotonic() >= next_static_refresh:
+                    data, timestamp = await self._read_attributes_async(list(self._static_keys))
+                    self._update_static(data, timestamp)
+                    next_static_refresh = time.monotonic() + self.static_refresh_ms / 1000
+                if not events:
+                    self.scheduler.tick()
+                    data, timestamp = await self._read_attributes_async()
+                    self._emit_frame(data, timestamp)
+            except tango.DevFailed as e:
+                self._on_read_failure(e)
+                await self._connect()
+
+            # With events, wake up only to refresh static attributes and to notice reconnections
+            await asyncio.sleep(min(self.static_refresh_ms / 1000, 1.) if events else self.scheduler.next_delay())
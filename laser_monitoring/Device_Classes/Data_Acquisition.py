@@ -1,9 +1,12 @@
-from PyQt6.QtCore import pyqtSignal, QObject, QTimer
+from PyQt6.QtCore import pyqtSignal, QObject, QTimer, Qt
 from datetime import datetime
+import time
 import random
 from importlib.resources import files
 from PIL import Image
 import numpy as np
+import tango
+from laser_monitoring.Device_Classes.Poll_Scheduler import DeadlineScheduler
 
 image_path = files("laser_monitoring.Device_Classes.SampleImages") / "FOCAL_SPOT.TIFF"
 
@@ -12,6 +15,7 @@ class Data_Acquisition(QObject):
     # Signal must be a class attribute
     data_received = pyqtSignal(str, dict, float)  # (device_id, data, timestamp)
     error_occurred = pyqtSignal(str, str)  # (device_id, error_message)
+    static_received = pyqtSignal(str, dict, float)  # (device_id, static data, timestamp), sent on change only
 
     def __init__(self, parent=None):
         super().__init__()
@@ -27,6 +31,8 @@ class Data_Acquisition(QObject):
             self.running = False
             self.polling_period = 2
         self._t0 = None
+        self.static_data = {}
+        self.scheduler = DeadlineScheduler(self.polling_period)
 
 
           
@@ -36,11 +42,21 @@ class Data_Acquisition(QObject):
         self.running = True
         self.period_ms = int(self.polling_period*1000)  # Set default period if not set
         self._t0 = datetime.now().timestamp()
+        self.scheduler.start()
         self._generate_data()  # Start the cycle 
     
     def stop(self):
         self.running = False
 
+    @property
+    def timing_stats(self) -> dict:
+        """Polling jitter and missed ticks, see DeadlineScheduler"""
+        return self.scheduler.stats
+
+    def _schedule_next(self):
+        """Re-arm on the next absolute deadline, rather than one period after the read finished"""
+        QTimer.singleShot(self.scheduler.next_delay_ms(), Qt.TimerType.PreciseTimer, self._generate_data)
+
 class VirtualDevice(Data_Acquisition):
 
     def __init__(self, parent=None):
@@ -52,17 +68,50 @@ class VirtualDevice(Data_Acquisition):
         }
         #self.im = np.array(Image.open('./Device_Classes/SampleImages/FOCAL_SPOT.TIFF')).T
         self.im = np.array(Image.open(image_path)).T
+        self.data_dtypes = {
+            'rolling_1d': 'float64',
+            'static_1d': 'float64',
+            'density_2d': self.im.dtype.name
+        }
+        self._rng = np.random.default_rng()
+        self._noise_index = 0
+        self._noise_pool = None
+
+    def _image_noise(self):
+        """Noise frames drawn once in the image dtype, cycled through rather than drawn every frame"""
+        if self._noise_pool is None:
+            self._noise_pool = self._rng.integers(0, 20, (16, *self.data_shapes['density_2d'])).astype(self.im.dtype)
+            if np.issubdtype(self.im.dtype, np.integer):
+                # Leave room for the noise in the native dtype
+                self.im = np.minimum(self.im, np.iinfo(self.im.dtype).max - 20)
+        self._noise_index = (self._noise_index + 1) % len(self._noise_pool)
+        return self._noise_pool[self._noise_index]
 
     def setup(self):
         pass
 
+    def data_format(self, key: str) -> tuple[tuple, str]:
+        """Shape and dtype name of the data generated for key"""
+        return self.data_shapes[key], self.data_dtypes[key]
+
+    def start(self):
+        if self.data_type == 'static_1d':
+            # Axis never changes, sent once rather than with every waveform
+            self.static_data = {'x': np.arange(self.data_shapes['static_1d'][0])}
+            self.static_received.emit(self.device_id, self.static_data, datetime.now().timestamp())
+        super().start()
+
     def _generate_data(self):
+        if not self.running:
+            return
+
+        self.scheduler.tick()
         data = self.data_generator()
         timestamp = (datetime.now()).timestamp()
         self.data_received.emit(self.device_id, data, timestamp)
         
         # Schedule next call
-        QTimer.singleShot(self.period_ms, self._generate_data)
+        self._schedule_next()
 
     def data_generator(self):
         data_generators = {
@@ -85,51 +134,316 @@ class VirtualDevice(Data_Acquisition):
     def waveform_data(self):
         data_shape = self.data_shapes['static_1d'][0]
         return {
-            'x': [i for i in range(data_shape)],
-            'y': [random.uniform(0, 100) for _ in range(data_shape)],
+            'y': self._rng.uniform(0, 100, data_shape),
         }
 
     def image_data(self):
-        data_shape = self.data_shapes['density_2d']
-        data = self.im + np.random.randint(0, 20, data_shape)
+        data = self.im + self._image_noise()
         return {
             'image': data,
         }
 
 
 class TangoDevice(Data_Acquisition):
+    _event_types = {
+        'change': tango.EventType.CHANGE_EVENT,
+        'data ready': tango.EventType.DATA_READY_EVENT,
+    }
+
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.acquisition_mode = getattr(parent, 'acquisition_mode', 'polling')
+        self.event_type = getattr(parent, 'event_type', 'change')
+        self._event_ids = []
+        self._static_event_ids = []
+        # Pool generations of the proxies holding the subscriptions, they die with a dropped proxy
+        self._subscribed = None
+        self._static_subscribed = None
+        self.event_check_ms = 1000  # Period of the reconnection check once acquiring on events
+        self._latest = {}
+        self.static_refresh_ms = int(getattr(parent, 'static_refresh_period', 60) * 1000)
+        # Per-device read statistics, one read_attributes call replaces one read_attribute per attribute
+        self.stats = {'reads': 0, 'round_trips_saved': 0, 'last_latency_ms': 0., 'mean_latency_ms': 0.}
 
     def setup(self):
         pass
 
+    @property
+    def _tango_keys(self) -> list:
+        """Keys of the attributes read on every frame"""
+        return [key for key, attribute in self.parent.attrs.items()
+                if attribute is not None and key not in self._static_keys]
+
+    @property
+    def _static_keys(self) -> tuple:
+        """Keys of the attributes read once, then only refreshed on change (e.g. spectrometer axis)"""
+        return getattr(self.parent, 'static_attrs', ())
+
+    @property
+    def data_formats(self) -> dict:
+        """Shape and dtype name of every dynamic attribute, from one live read"""
+        _data_format = dict({})
+        data, _ = self._read_attributes()
+
+        for key, value in data.items():
+            value = np.asarray(value)
+            _data_format[key] = (value.shape or (1,), value.dtype.name)
+            print (f'Format of {self.parent.attrs[key]}: {_data_format[key]}')
+        return _data_format
+
     @property
     def data_shapes(self):
-        _data_shape = dict({})
-    
-        for key, attribute in self.parent.attrs.items():
-            if attribute is not None: 
-                print (f'Getting value from key : {key}, attribute: {attribute}')
-                _data_shape[key]=np.shape(self.parent.device_proxy.read_attribute(attribute).value)
-                if _data_shape[key] == ():
-                    _data_shape[key] = (1,)
-                print (f'Attribute value: {_data_shape[key]}')
-        return _data_shape
+        return {key: shape for key, (shape, _) in self.data_formats.items()}
 
-    def _generate_data(self):
-        data = {}
-        timestamp = (datetime.now()).timestamp()
+    def data_format(self, key: str) -> tuple[tuple, str]:
+        return self.data_formats[key]
+
+    def _read_attributes(self, keys: list | None = None) -> tuple[dict, float]:
+        """Read tango attributes of the device in a single round-trip, all dynamic ones by default
+
+        Returns values by key, and the server timestamp of the read, shared by all values.
+        """
+        keys = self._tango_keys if keys is None else keys
+        t_0 = time.perf_counter()
+        replies = self.parent.device_proxy.read_attributes([self.parent.attrs[key] for key in keys])
+        return self._unpack_replies(keys, replies, time.perf_counter() - t_0)
+
+    def _unpack_replies(self, keys: list, replies: list, latency_s: float) -> tuple[dict, float]:
+        """Values by key and server timestamp, DevFailed if any attribute could not be read, as read_attribute"""
+        self._record_read(len(keys), latency_s)
+        for reply in replies:
+            # read_attributes reports per-attribute errors in the reply rather than raising
+            if getattr(reply, 'has_failed', False):
+                raise tango.DevFailed(*reply.get_err_stack())
+            if reply.value is None:
+                tango.Except.throw_exception('API_AttrValueNotSet', f'{reply.name} has no value ({reply.quality})',
+                                             f'{self.device_id} read_attributes')
+        data = {key: reply.value for key, reply in zip(keys, replies)}
+        timestamp = replies[0].time.totime() if replies else datetime.now().timestamp()
+        return data, timestamp
+
+    def _record_read(self, attribute_count: int, latency_s: float):
+        self.stats['reads'] += 1
+        self.stats['round_trips_saved'] += attribute_count - 1
+        self.stats['last_latency_ms'] = latency_s * 1000
+        self.stats['mean_latency_ms'] += (latency_s * 1000 - self.stats['mean_latency_ms']) / self.stats['reads']
+
+    def start(self):
+        """Called when moved to thread, subscribes to events if asked, polls otherwise
+
+        Subscriptions and static reads are deferred to the first poll where the pooled proxy is
+        connected, so a device unreachable at start resumes on its own once it is back.
+        """
+        self.running = True
+        self.period_ms = int(self.polling_period*1000)
+        self._t0 = datetime.now().timestamp()
+        self.scheduler.start()
+        self._static_pending = bool(self._static_keys)
+        self._try_events = self.acquisition_mode == 'event'
+        self._subscribed = self._static_subscribed = None
+        self._generate_data()
 
+    def stop(self):
+        self.running = False
+        self._unsubscribe(self._event_ids)
+        self._unsubscribe(self._static_event_ids)
+        self._print_stats()
+
+    def _print_stats(self):
+        print(f"{self.device_id}: {self.stats['reads']} reads, {self.stats['round_trips_saved']} round-trips saved, "
+              f"mean read latency {self.stats['mean_latency_ms']:.1f} ms")
+
+    #######################################################################
+    #                    Polling
+    #######################################################################
+
+    def _emit_frame(self, data: dict, timestamp: float):
+        """Attributes without tango name (e.g. energy meter time axis) are time since start"""
         for key, attribute in self.parent.attrs.items():
-            if attribute is not None :
-                data[key] = self.parent.device_proxy.read_attribute(attribute).value
-            else : 
-                data[key] = datetime.now().timestamp() - self._t0
+            if attribute is None:
+                data[key] = timestamp - self._t0
         self.data_received.emit(self.device_id, data, timestamp)
 
+    def _generate_data(self):
+        if not self.running:
+            return
+
+        self.scheduler.tick()
+        if self.parent.device_proxy.connected:
+            try:
+                if self._static_pending:
+                    self._start_static()
+                self._restore_static_events()
+                if self._try_events:
+                    self._try_events = False
+                    if self._subscribe_events():
+                        print(f'{self.device_id}: acquiring on {self.event_type} events')
+                        QTimer.singleShot(self.event_check_ms, self._watch_events)
+                        return
+                data, timestamp = self._read_attributes()
+                self._emit_frame(data, timestamp)
+            except tango.DevFailed as e:
+                self._on_read_failure(e)
+
         # Schedule next call
-        QTimer.singleShot(self.period_ms, self._generate_data)
+        self._schedule_next()
+
+    def _on_read_failure(self, e: tango.DevFailed):
+        """Report the error, and have the pool reconnect if the device is unreachable"""
+        self.error_occurred.emit(self.device_id, str(e.args[0].desc))
+        if isinstance(e, (tango.ConnectionFailed, tango.CommunicationFailed)):
+            self.parent.device_proxy.report_failure()
+
+    #######################################################################
+    #                    Static attributes
+    #######################################################################
+
+    def _start_static(self):
+        self._refresh_static()
+        self._static_pending = False
+        if not self._subscribe_static():
+            QTimer.singleShot(self.static_refresh_ms, self._refresh_static_periodically)
+
+    def _refresh_static(self):
+        """Read static attributes, and send them downstream only if they changed"""
+        data, timestamp = self._read_attributes(list(self._static_keys))
+        self._update_static(data, timestamp)
+
+    def _refresh_static_periodically(self):
+        if not self.running:
+            return
+        if self.parent.device_proxy.connected:
+            try:
+                self._refresh_static()
+            except tango.DevFailed as e:
+                self._on_read_failure(e)
+        QTimer.singleShot(self.static_refresh_ms, self._refresh_static_periodically)
+
+    def _update_static(self, data: dict, timestamp: float):
+        changed = any(key not in self.static_data or not np.array_equal(self.static_data[key], value)
+                      for key, value in data.items())
+        if changed:
+            self.static_data.update(data)
+            self.static_received.emit(self.device_id, dict(self.static_data), timestamp)
+
+    def _subscribe_static(self) -> bool:
+        """Follow static attributes with change events, returns False if the server has none"""
+        generation = self.parent.device_proxy.generation
+        self._static_attribute_keys = {self.parent.attrs[key].lower(): key for key in self._static_keys}
+        try:
+            for attribute in self._static_attribute_keys:
+                event_id = self.parent.device_proxy.subscribe_event(
+                    attribute, tango.EventType.CHANGE_EVENT, self._on_static_event)
+                self._static_event_ids.append(event_id)
+        except tango.DevFailed:
+            print(f'{self.device_id}: no change event on {attribute}, '
+                  f'refreshing every {self.static_refresh_ms / 1000} s')
+            self._unsubscribe(self._static_event_ids)
+            return False
+        self._static_subscribed = generation
+        return True
+
+    def _restore_static_events(self):
+        """After the pool reconnected, read static attributes and subscribe again on the new proxy"""
+        if self._static_event_ids and self._static_subscribed != self.parent.device_proxy.generation:
+            self._static_event_ids.clear()
+            self._start_static()
+
+    def _on_static_event(self, event):
+        if not self.running or event.err:
+            return
+        key = self._static_attribute_keys.get(event.attr_name.rsplit('/', 1)[-1].lower())
+        if key is not None:
+            self._update_static({key: event.attr_value.value}, event.attr_value.time.totime())
+
+    #######################################################################
+    #                    Events
+    #######################################################################
+
+    @property
+    def _trigger_key(self):
+        """Frame is emitted when the last tango attribute of the device fires"""
+        return self._tango_keys[-1]
+
+    def _subscribe_events(self) -> bool:
+        """Subscribe to every tango attribute, returns False if the server has no events configured"""
+        event_type = self._event_types.get(self.event_type)
+        if event_type is None:
+            self.error_occurred.emit(self.device_id, f'Unknown event type: {self.event_type}')
+            return False
+
+        generation = self.parent.device_proxy.generation
+        self._attribute_keys = {self.parent.attrs[key].lower(): key for key in self._tango_keys}
+        try:
+            for attribute in self._attribute_keys:
+                event_id = self.parent.device_proxy.subscribe_event(attribute, event_type, self._on_event)
+                self._event_ids.append(event_id)
+        except tango.DevFailed as e:
+            print(f'{self.device_id}: no {self.event_type} event on {attribute}, falling back to polling '
+                  f'({e.args[0].reason})')
+            self._unsubscribe(self._event_ids)
+            return False
+        self._subscribed = generation
+        return True
+
+    def _watch_events(self):
+        """Events die with a dropped proxy: once the pool has reconnected, subscribe again on the new one"""
+        if not self.running:
+            return
+        device_proxy = self.parent.device_proxy
+        if device_proxy.connected and device_proxy.generation != self._subscribed:
+            self._event_ids.clear()
+            try:
+                self._restore_static_events()
+            except tango.DevFailed as e:
+                self._on_read_failure(e)
+            if not self._subscribe_events():
+                self._try_events = True  # Once more on the next poll, polling meanwhile
+                self._schedule_next()
+                return
+            print(f'{self.device_id}: {self.event_type} events subscribed again after reconnection')
+        QTimer.singleShot(self.event_check_ms, self._watch_events)
+
+    def _unsubscribe(self, event_ids: list):
+        for event_id in event_ids:
+            try:
+                self.parent.device_proxy.unsubscribe_event(event_id)
+            except (tango.DevFailed, ConnectionError) as e:
+                print(f'{self.device_id}: could not unsubscribe event {event_id}: {e}')
+        event_ids.clear()
+
+    def _on_event(self, event):
+        """Tango callback, runs in the tango event thread"""
+        if not self.running:
+            return
+        if event.err:
+            self.error_occurred.emit(self.device_id, str(event.errors[0].desc))
+            return
+
+        key = self._attribute_keys.get(event.attr_name.rsplit('/', 1)[-1].lower())
+        if key is None:
+            return
+
+        if self.event_type == 'data ready':
+            # Data ready events carry no value, read the whole device once the trigger is ready
+            if key != self._trigger_key:
+                return
+            try:
+                data, timestamp = self._read_attributes()
+            except tango.DevFailed as e:
+                self._on_read_failure(e)
+                return
+            except ConnectionError as e:  # The pool is reconnecting
+                self.error_occurred.emit(self.device_id, str(e))
+                return
+        else:
+            self._latest[key] = event.attr_value.value
+            if key != self._trigger_key:
+                return
+            data = {_key: self._latest.get(_key) for _key in self._tango_keys}
+            timestamp = event.attr_value.time.totime()
+
+        self._emit_frame(data, timestamp)
 
 
 if __name__ == "__main__":
@@ -1,6 +1,10 @@
-from tango import DeviceProxy
 from laser_monitoring.Device_Classes import Data_Acquisition
+from laser_monitoring.Device_Classes.Proxy_Pool import ProxyPool
+from laser_monitoring.Device_Classes import Acquisition_Engine
+from laser_monitoring.Device_Classes import Load_Generator
+from laser_monitoring.Device_Classes import Replay
 from PyQt6.QtCore import QObject, QThread
+import numpy as np
 
 from dataclasses import dataclass, field
 from typing import Optional, Dict, Tuple
@@ -34,12 +38,107 @@ class Device(QObject):
         self.type = definition['type']
         self.isVirtual = definition['is virtual']
         print(f'Device is virtual: {self.isVirtual is True}')
-        self.thread = QThread()
+        # 'qthread': one thread per device, 'asyncio': every device on the shared AcquisitionEngine loop
+        self.engine = definition.get('acquisition engine', 'qthread')
+        self.thread = QThread() if self.engine == 'qthread' else None
         self.polling_period = definition['polling period']
         self.saving_period = definition['saving period']
+        # 'polling' or 'event', event type is 'change' or 'data ready'
+        self.acquisition_mode = definition.get('acquisition mode', 'polling')
+        self.event_type = definition.get('event type', 'change')
+        # Keys of attrs read once and cached, refreshed on change events or every 'static refresh period' s
+        self.static_attrs = ()
+        self.static_refresh_period = definition.get('static refresh period', 60)
+        # HDF5 filter pipeline (see Data_Saver/h5_Filters.py) and chunk shape of the saved data
+        self.compression = definition.get('compression')
+        self.chunks = definition.get('chunks')
+        # Rows preallocated for a contiguous, uncompressed dataset readable with H5Loader.as_memmap, chunked if unset
+        self.contiguous_rows = definition.get('contiguous rows')
+        # Bits used by the sensor, e.g. 12 for a 12-bit camera delivering uint16, found from the data if unset
+        self.bit_depth = definition.get('bit depth')
+        # Saving buffer overflow policy: 'spill', 'drop newest', 'drop oldest' or 'block', see Data_Saver/Ring_Buffer.py
+        self.overflow_policy = definition.get('overflow policy', 'spill')
+        # Key of worker.data_shapes giving the saved data shape and dtype, discovered once then cached,
+        # on disk too when a ShapeCache is set
+        self.shape_key = None
+        self.shape_cache = None
+        self._shape = None
+        self._dtype = None
+        self._validated = False
 
+    @property
+    def shape(self):
+        if self._shape is None:
+            self._discover_format()
+        return self._shape
+
+    @property
+    def dtype(self) -> str:
+        if self._dtype is None:
+            self._discover_format()
+        return self._dtype
+
+    @property
+    def _cache(self):
+        """Shape cache of tango devices, the format of virtual, load generator and replay devices comes from their config"""
+        return None if self.isVirtual else self.shape_cache
+
+    def _discover_format(self):
+        cached = self._cache.get(self) if self._cache is not None else None
+        if cached is not None:
+            self._shape, self._dtype = cached
+            return
+
+        shape, dtype = self.worker.data_format(self.shape_key)
+        self._shape, self._dtype = tuple(shape), dtype
+        self._validated = True  # Just read from the device
+        if self._cache is not None:
+            self._cache.set(self, self._shape, self._dtype)
+
+    def validate_frame(self, value) -> bool:
+        """
+        Check the shape and dtype against the first real frame, and replace them on mismatch, the saver
+        then recreates the datasets of the device (see H5Builder.append_rows). Devices whose format was
+        never read (timed out at startup) adopt the format of the frame, without reading the device.
+        """
+        if self._validated:
+            return True
+        self._validated = True
+
+        value = np.asarray(value)
+        shape, dtype = value.shape or (1,), value.dtype.name
+        if (shape, dtype) == (self._shape, self._dtype):
+            return True
+        adopted = self._shape is None
+        if not adopted:
+            print(f'{self.name}: format changed from {self._shape} {self._dtype} to {shape} {dtype}')
+        self._shape, self._dtype = shape, dtype
+        if self._cache is not None:
+            self._cache.set(self, shape, dtype)
+        return adopted
+
+    def discover_shape(self, timeout: float | None = None) -> tuple:
+        """Wait up to timeout for the proxy of tango devices, then read the shape"""
+        if not self.isVirtual and not self.device_proxy.wait_connected(timeout):
+            raise TimeoutError(f'{self.name} not connected after {timeout} s')
+        return self.shape
+
+    def move_to(self, thread: QThread):
+        """Hand a device built in a pool thread over to thread (the GUI thread)"""
+        self.moveToThread(thread)
+        if self.thread is None:
+            self.worker.moveToThread(thread)
+        else:
+            self.thread.moveToThread(thread)
 
     def _start_thread(self):
+        if self.engine == 'asyncio':
+            if self.isVirtual:
+                self.worker = Acquisition_Engine.AsyncVirtualDevice(parent=self)
+            else:
+                self.worker = Acquisition_Engine.AsyncTangoDevice(parent=self)
+            return
+
         if self.isVirtual:
             self.worker = Data_Acquisition.VirtualDevice(parent=self)
         else:
@@ -50,23 +149,24 @@ class Device(QObject):
         self.thread.started.connect(self.worker.start)
 
     def setup(self):
-        try:
-            self.device_proxy = DeviceProxy(self.address)
-        except Exception:
-            self.device_proxy = None
-            raise Exception(f"Could not connect to device: {self.name}")
+        """Shared proxy from the pool, connects in the background and never blocks"""
+        self.device_proxy = ProxyPool.instance().acquire(self.address)
 
 
 
     def start_device(self):
-        """Start the device thread"""
-        self.thread.start()
+        """Start the device thread, or the device task on the asyncio engine"""
+        if self.thread is None:
+            self.worker.start()
+        else:
+            self.thread.start()
 
 
     def stop_device(self):
         """Stop the device thread"""
-        self.worker.running = False
-        self.thread.quit()
+        self.worker.stop()
+        if self.thread is not None:
+            self.thread.quit()
 
 
 class DummyDevice(Device):
@@ -75,13 +175,9 @@ class DummyDevice(Device):
         self.labels = {'x_label': 'Time',
                        'y_label': 'Signal', 'x_units': 's', 'y_units': 'a.u.'}
         self.graph_type = 'rolling_1d'
+        self.shape_key = self.graph_type
 
         self._start_thread()
-        print(f'Dummy device 0D shape : {self.shape}')
-
-    @property
-    def shape(self):
-        return self.worker.data_shapes[self.graph_type]
 
 
 class DummyDevice1D(Device):
@@ -89,13 +185,11 @@ class DummyDevice1D(Device):
         super().__init__(definition)
         self.labels = {'x_label': 'Wavelength',
                        'y_label': 'Signal', 'x_units': 'nm', 'y_units': 'a.u.'}
+        self.static_attrs = ('x',)
         self.graph_type = 'static_1d'
+        self.shape_key = self.graph_type
 
         self._start_thread()
-        print (f'Dummy device 1D shape : {self.shape}')
-    @property
-    def shape(self):
-        return self.worker.data_shapes[self.graph_type]
 
 
 
@@ -105,14 +199,10 @@ class DummyDevice2D(Device):
         self.labels = {'x_label': 'x',
                        'y_label': 'y', 'x_units': 'px', 'y_units': 'px'}
         self.graph_type = 'density_2d'
+        self.shape_key = self.graph_type
 
         self._start_thread()
 
-
-    @property
-    def shape(self):
-        return self.worker.data_shapes[self.graph_type]
-
 class Spectrometer(Device):
     def __init__(self, definition: dict):
         super().__init__(definition)
@@ -120,17 +210,14 @@ class Spectrometer(Device):
         self.labels = {'x_label': 'x',
                        'y_label': 'y', 'x_units': 'px', 'y_units': 'px'}
         self.attrs = {'x': 'lambda', 'y': 'intensity'}
+        self.static_attrs = ('x',)
         self.graph_type = 'static_1d'
+        self.shape_key = 'y'
         self.setup()
 
         self._start_thread()
 
 
-    @property
-    def shape(self):
-        return self.worker.data_shapes['y']
-
-
 class BeamProfile(Device):
     # Vérifier nom de l'attribut sur place, pas forcément 'image'...
     def __init__(self, definition: dict):
@@ -141,13 +228,10 @@ class BeamProfile(Device):
 
         self.attrs = {'image': 'image'}
         self.graph_type = 'density_2d'
+        self.shape_key = 'image'
         self.setup()
         self._start_thread()
 
-    @property
-    def shape(self):
-        return self.worker.data_shapes['image']
-
 class EnergyMeter(Device):
     def __init__(self, definition: dict):
         super().__init__(definition)
@@ -155,13 +239,66 @@ class EnergyMeter(Device):
         self.labels = {'x_label': 'time', 'y_label': 'Energy', 'x_units': '(s)', 'y_units': '(mJ)'}
         self.attrs = {'x': None, 'y': 'energy_1'}
         self.graph_type = 'rolling_1d'
+        self.shape_key = 'y'
         self.setup()
         self._start_thread()
-        print(f'Energymeter shape : {self.shape}')
 
-    @property
-    def shape(self):
-        return self.worker.data_shapes['y']
+
+class LoadGenerator(Device):
+    """Vectorized synthetic source for load tests, configured as described in Load_Generator"""
+    _default_shapes = {'rolling_1d': (1,), 'static_1d': (2048,), 'density_2d': (808, 608)}
+
+    def __init__(self, definition: dict):
+        super().__init__(definition)
+        self.isVirtual = True
+        self.graph_type = definition.get('graph type', 'rolling_1d')
+        self.frame_shape = tuple(definition.get('frame shape', self._default_shapes[self.graph_type]))
+        self.frame_dtype = definition.get('dtype', 'uint16' if self.graph_type == 'density_2d' else 'float64')
+        self.rate = definition.get('rate', 1 / self.polling_period)
+        self.labels = {'x_label': 'x', 'y_label': 'y', 'x_units': 'a.u.', 'y_units': 'a.u.'}
+        if self.graph_type == 'static_1d':
+            self.static_attrs = ('x',)
+        self.shape_key = self.graph_type
+
+        self._start_thread()
+
+    def _start_thread(self):
+        if self.engine == 'asyncio':
+            self.worker = Load_Generator.AsyncSyntheticSource(parent=self)
+            return
+
+        self.worker = Load_Generator.SyntheticSource(parent=self)
+        self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.start)
+
+
+class ReplayDevice(Device):
+    """Streams a device recorded by H5Builder as a live source, configured as described in Replay"""
+
+    def __init__(self, definition: dict):
+        super().__init__(definition)
+        self.isVirtual = True
+        self.file = definition['file']
+        self.source = definition.get('source', self.name)
+        self.speed = definition.get('speed', 1)
+        self.loop = definition.get('loop', False)
+        self.recorded_timestamps = definition.get('recorded timestamps', False)
+
+        self.graph_type, self._shape, self._dtype = Replay.recorded_format(self.file, self.source)
+        self._shape = self._shape or (1,)
+        self.shape_key = self.graph_type
+        self.labels = {'x_label': 'x', 'y_label': 'y', 'x_units': 'a.u.', 'y_units': 'a.u.'}
+
+        self._start_thread()
+
+    def _start_thread(self):
+        if self.engine == 'asyncio':
+            self.worker = Replay.AsyncReplaySource(parent=self)
+            return
+
+        self.worker = Replay.ReplaySource(parent=self)
+        self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.start)
 
 
 class DeviceMaker:
@@ -172,6 +309,8 @@ class DeviceMaker:
         'dummy device': DummyDevice,
         'dummy device 1D': DummyDevice1D,
         'dummy device 2D': DummyDevice2D,
+        'load generator': LoadGenerator,
+        'replay': ReplayDevice,
     }
 
     @classmethod
@@ -0,0 +1,161 @@
+"""
+In-process stand-in for tango.DeviceProxy, to exercise TangoDevice without a tango bus.
+
+Attributes are given as name -> callable returning a new value, or raising tango.DevFailed to
+simulate a failed read: read_attribute raises it, read_attributes reports it in the failed reply
+(has_failed, get_err_stack) like tango. When events are enabled,
+a background thread fires them at 'rate_hz' to every subscriber, like a device server
+pushing change or data ready events. AsyncFakeDeviceProxy is its asyncio green mode counterpart,
+registered with it in the ProxyPool for the asyncio engine.
+"""
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import tango
+
+
+class FakeDeviceProxy:
+
+    def __init__(self, attributes: dict, rate_hz: float = 10, events: bool = True,
+                 name: str = 'fake/device/1'):
+        self.attributes = attributes
+        self.rate_hz = rate_hz
+        self.events = events
+        self._name = name
+        self._subscriptions = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.read_count = 0
+
+    def name(self):
+        return self._name
+
+    def _device_attribute(self, attribute: str):
+        if attribute not in self.attributes:
+            tango.Except.throw_exception('API_AttrNotFound', f'{attribute} not found',
+                                         'FakeDeviceProxy.read_attribute')
+        return SimpleNamespace(name=attribute, value=self.attributes[attribute](),
+                               time=tango.TimeVal.now(), quality=tango.AttrQuality.ATTR_VALID)
+
+    def read_attribute(self, attribute: str):
+        self.read_count += 1
+        return self._device_attribute(attribute)
+
+    def read_attributes(self, attributes: list):
+        self.read_count += 1
+        replies = []
+        for attribute in attributes:
+            try:
+                replies.append(self._device_attribute(attribute))
+            except tango.DevFailed as e:
+                replies.append(SimpleNamespace(name=attribute, value=None, has_failed=True,
+                                               get_err_stack=lambda errors=e.args: errors, time=tango.TimeVal.now(),
+                                               quality=tango.AttrQuality.ATTR_INVALID))
+        return replies
+
+    def subscribe_event(self, attribute: str, event_type, callback):
+        if not self.events:
+            tango.Except.throw_exception('API_EventPropertiesNotSet',
+                                         f'Event properties not set for {attribute}',
+                                         'FakeDeviceProxy.subscribe_event')
+        if attribute not in self.attributes:
+            tango.Except.throw_exception('API_AttrNotFound', f'{attribute} not found',
+                                         'FakeDeviceProxy.subscribe_event')
+        event_id = next(self._ids)
+        with self._lock:
+            self._subscriptions[event_id] = (attribute, event_type, callback)
+        # Like tango, subscribing fires a first event synchronously
+        self._push(attribute, event_type, callback)
+
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._fire_loop, daemon=True)
+            self._thread.start()
+        return event_id
+
+    def unsubscribe_event(self, event_id: int):
+        with self._lock:
+            self._subscriptions.pop(event_id, None)
+            if self._subscriptions:
+                return
+        self._stop.set()
+        self._thread = None
+
+    def _push(self, attribute: str, event_type, callback):
+        event = SimpleNamespace(err=False, errors=(), event=str(event_type).lower(),
+                                attr_name=f'tango://fake:10000/{self._name}/{attribute}')
+        if event_type == tango.EventType.DATA_READY_EVENT:
+            event.ctr = self.read_count
+        else:
+            event.attr_value = self._device_attribute(attribute)
+        if hasattr(callback, 'push_event'):
+            callback.push_event(event)
+        else:
+            callback(event)
+
+    def _fire_loop(self):
+        period = 1 / self.rate_hz
+        next_tick = time.perf_counter() + period
+        while not self._stop.is_set():
+            time.sleep(max(0., next_tick - time.perf_counter()))
+            next_tick += period
+            with self._lock:
+                subscriptions = list(self._subscriptions.values())
+            for attribute, event_type, callback in subscriptions:
+                self._push(attribute, event_type, callback)
+
+
+class AsyncFakeDeviceProxy:
+    """Asyncio green mode view of a FakeDeviceProxy, sharing its attributes and subscriptions"""
+
+    def __init__(self, proxy: FakeDeviceProxy):
+        self.proxy = proxy
+
+    async def read_attributes(self, attributes: list):
+        return self.proxy.read_attributes(attributes)
+
+    def __getattr__(self, name):
+        return getattr(self.proxy, name)
+
+
+if __name__ == "__main__":
+    from PyQt6.QtCore import QCoreApplication, QTimer
+    from laser_monitoring.Device_Classes.Data_Acquisition import TangoDevice
+    from laser_monitoring.Device_Classes.Proxy_Pool import ProxyPool
+    import sys
+
+    app = QCoreApplication(sys.argv)
+    rate_hz, duration_s = 50, 2
+
+    def fake_spectrometer(events: bool):
+        proxy = FakeDeviceProxy({'lambda': lambda: np.linspace(700, 900, 2048),
+                                 'intensity': lambda: np.random.uniform(0, 100, 2048)},
+                                rate_hz=rate_hz, events=events, name=f'fake/spectrometer/{int(events)}')
+        return SimpleNamespace(name=f'Fake spectrometer (events: {events})', graph_type='static_1d',
+                               polling_period=0.1, attrs={'x': 'lambda', 'y': 'intensity'},
+                               static_attrs=('x',), acquisition_mode='event', event_type='change',
+                               device_proxy=ProxyPool.instance().register(proxy.name(), proxy))
+
+    counts = {}
+    workers = [TangoDevice(parent=fake_spectrometer(events)) for events in (True, False)]
+    for worker in workers:
+        counts[worker.device_id] = 0
+        worker.data_received.connect(lambda device_id, data, timestamp:
+                                     counts.__setitem__(device_id, counts[device_id] + 1))
+        worker.start()
+
+    def report():
+        for worker in workers:
+            worker.stop()
+        for device_id, count in counts.items():
+            print(f'{device_id}: {count} frames in {duration_s} s '
+                  f'({count / duration_s:.1f} Hz, events fired at {rate_hz} Hz)')
+        app.quit()
+
+    QTimer.singleShot(duration_s * 1000, report)
+    sys.exit(app.exec())
@@ -0,0 +1,134 @@
+"""
+Vectorized synthetic source, to load-test the acquisition, display and saving pipeline without the
+simulator itself being the bottleneck.
+
+Frames are drawn once into a pool of numpy arrays in the native dtype, then cycled through, so
+nothing is generated per frame. Rates above what a timer can tick (kHz scalars) are emitted in
+bursts, with timestamps spread over the tick. The achieved rate is kept in stats.
+
+Config keys of a 'load generator' device, on top of the usual ones:
+    "graph type": "rolling_1d", "static_1d" or "density_2d"
+    "frame shape": e.g. [1], [2048] or [808, 608]
+    "dtype": e.g. "float64" or "uint16"
+    "rate": frames per second, e.g. 2000 for scalars, 10 to 50 for cameras
+    "count": number of identical devices, named "<name> 1" ... "<name> N"
+"""
+import asyncio
+import time
+from datetime import datetime
+
+import numpy as np
+
+from laser_monitoring.Device_Classes.Data_Acquisition import Data_Acquisition
+from laser_monitoring.Device_Classes.Acquisition_Engine import AcquisitionEngine
+from laser_monitoring.Device_Classes.Poll_Scheduler import DeadlineScheduler
+
+
+def expand_counts(device_list: list) -> list:
+    """Definitions with 'count': N become N definitions, named '<name> 1' ... '<name> N'"""
+    expanded = []
+    for definition in device_list:
+        count = definition.get('count', 1)
+        if count == 1:
+            expanded.append(definition)
+            continue
+        for i in range(1, count + 1):
+            copy = dict(definition)
+            copy.pop('count')
+            copy['name'] = f"{definition['name']} {i}"
+            expanded.append(copy)
+    return expanded
+
+
+class SyntheticSource(Data_Acquisition):
+    pool_size = 64
+    min_tick_s = 0.005  # Fastest timer tick, higher rates are emitted in bursts
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rate = parent.rate
+        self.frame_shape = tuple(parent.frame_shape)
+        self.dtype = np.dtype(parent.frame_dtype)
+        self.tick_period = max(1 / self.rate, self.min_tick_s)
+        self.frames_per_tick = max(1, round(self.rate * self.tick_period))
+        self.scheduler = DeadlineScheduler(self.tick_period)
+
+        self._rng = np.random.default_rng()
+        self._pool = self._make_pool()
+        self._index = 0
+        self._emitted = 0
+        self._started = None
+        self.stats = {'target_rate_hz': self.rate, 'achieved_rate_hz': 0.}
+
+    def _make_pool(self) -> np.ndarray:
+        shape = (self.pool_size, *self.frame_shape)
+        if np.issubdtype(self.dtype, np.integer):
+            high = min(int(np.iinfo(self.dtype).max), 4095)  # 12-bit camera like
+            return self._rng.integers(0, high, shape).astype(self.dtype)
+        return self._rng.uniform(0, 100, shape).astype(self.dtype)
+
+    def data_format(self, key: str) -> tuple[tuple, str]:
+        return self.frame_shape, self.dtype.name
+
+    def start(self):
+        if self.data_type == 'static_1d':
+            self.static_data = {'x': np.arange(self.frame_shape[0])}
+            self.static_received.emit(self.device_id, self.static_data, datetime.now().timestamp())
+        self._started = time.monotonic()
+        self._emitted = 0
+        super().start()
+
+    def stop(self):
+        super().stop()
+        print(f"{self.device_id}: {self.stats['achieved_rate_hz']:.1f} Hz achieved, "
+              f"{self.stats['target_rate_hz']} Hz asked")
+
+    def _payload(self, frame: np.ndarray, timestamp: float) -> dict:
+        if self.data_type == 'rolling_1d':
+            return {'x': timestamp - self._t0, 'y': frame[0]}
+        if self.data_type == 'static_1d':
+            return {'y': frame}
+        return {'image': frame}
+
+    def _emit_burst(self):
+        """Emit the frames due this tick, timestamps spread over the tick"""
+        now = datetime.now().timestamp()
+        for i in range(self.frames_per_tick):
+            frame = self._pool[self._index]
+            self._index = (self._index + 1) % self.pool_size
+            timestamp = now - (self.frames_per_tick - 1 - i) / self.rate
+            self.data_received.emit(self.device_id, self._payload(frame, timestamp), timestamp)
+
+        self._emitted += self.frames_per_tick
+        elapsed = time.monotonic() - self._started
+        if elapsed > 0:
+            self.stats['achieved_rate_hz'] = self._emitted / elapsed
+
+    def _generate_data(self):
+        if not self.running:
+            return
+        self.scheduler.tick()
+        self._emit_burst()
+        self._schedule_next()
+
+
+class AsyncSyntheticSource(SyntheticSource):
+    """SyntheticSource ticking on the shared asyncio AcquisitionEngine"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._task = None
+
+    def _generate_data(self):
+        self._task = AcquisitionEngine.instance().submit(self._poll())
+
+    def stop(self):
+        super().stop()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _poll(self):
+        while self.running:
+            self.scheduler.tick()
+            self._emit_burst()
+            await asyncio.sleep(self.scheduler.next_delay())
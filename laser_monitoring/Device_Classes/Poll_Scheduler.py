@@ -0,0 +1,86 @@
+"""
+Deadline-based polling: ticks are aimed at absolute times t0 + k * period, so the time spent
+reading does not add up to the period and the schedule does not drift. Ticks that could not be
+served in time (e.g. after a slow camera read) are skipped and counted, and the period jitter is
+recorded as a histogram.
+"""
+import math
+import time
+
+import numpy as np
+
+# Histogram bin edges of the absolute period jitter, in ms
+jitter_bins_ms = (0, 0.5, 1, 2, 5, 10, 20, 50, 100, 500, math.inf)
+
+
+class DeadlineScheduler:
+
+    def __init__(self, period_s: float):
+        self.period = period_s
+        self._t0 = None
+        self._tick = 0
+        self._last_tick_time = None
+        self._last_tick = None
+
+        self.ticks = 0
+        self.missed_ticks = 0
+        self.jitter_histogram = np.zeros(len(jitter_bins_ms) - 1, dtype=np.int64)
+        self._jitter_sum_ms = 0.
+        self.jitter_max_ms = 0.
+
+    def start(self):
+        self._t0 = time.monotonic()
+        self._tick = 0
+        self._last_tick_time = None
+
+    def tick(self):
+        """Call at the start of each poll, records how far the period was from the nominal one"""
+        now = time.monotonic()
+        if self._last_tick_time is not None:
+            nominal = (self._tick - self._last_tick) * self.period
+            jitter_ms = abs(now - self._last_tick_time - nominal) * 1000
+            self.jitter_histogram[np.searchsorted(jitter_bins_ms, jitter_ms, side='right') - 1] += 1
+            self._jitter_sum_ms += jitter_ms
+            self.jitter_max_ms = max(self.jitter_max_ms, jitter_ms)
+        self._last_tick_time = now
+        self._last_tick = self._tick
+        self.ticks += 1
+
+    def next_delay(self) -> float:
+        """Seconds to wait until the next deadline, skipping (and counting) the ones already passed"""
+        now = time.monotonic()
+        self._tick += 1
+        deadline = self._t0 + self._tick * self.period
+        if now > deadline:
+            missed = math.floor((now - deadline) / self.period) + 1
+            self.missed_ticks += missed
+            self._tick += missed
+            deadline = self._t0 + self._tick * self.period
+        return deadline - now
+
+    def next_delay_ms(self) -> int:
+        return max(0, round(self.next_delay() * 1000))
+
+    @property
+    def stats(self) -> dict:
+        jittered_ticks = max(1, self.ticks - 1)
+        return {
+            'ticks': self.ticks,
+            'missed_ticks': self.missed_ticks,
+            'jitter_mean_ms': self._jitter_sum_ms / jittered_ticks,
+            'jitter_max_ms': self.jitter_max_ms,
+            'jitter_histogram_ms': {f'{low}-{high}': int(count) for low, high, count
+                                    in zip(jitter_bins_ms[:-1], jitter_bins_ms[1:], self.jitter_histogram)},
+        }
+
+
+if __name__ == "__main__":
+    import random
+
+    scheduler = DeadlineScheduler(period_s=0.05)
+    scheduler.start()
+    for _ in range(100):
+        scheduler.tick()
+        time.sleep(random.choice([0.005, 0.01, 0.12]))  # Occasional read slower than the period
+        time.sleep(scheduler.next_delay())
+    print(scheduler.stats)
@@ -0,0 +1,175 @@
+"""
+Shared tango DeviceProxy pool, keyed by tango address.
+
+Devices on the same address share one proxy. Proxies connect lazily in a background thread, so an
+unreachable device no longer blocks startup, and reconnect with exponential backoff when a device
+reports a communication failure. Acquisition resumes by itself once the proxy is back.
+
+An address read by asyncio engine devices has a second connection: their shared asyncio green mode
+proxy (async_proxy), made once the address is connected. Both belong to the same generation, bumped
+by each connection: a failure reported on either drops both, and async_proxy makes a new green mode
+proxy after the reconnection. Devices compare generations to subscribe to their events again.
+"""
+import asyncio
+import threading
+
+import tango
+import tango.asyncio
+
+
+class PooledProxy:
+    """Handle on a pooled DeviceProxy, calls raise ConnectionError while the device is unreachable"""
+
+    def __init__(self, pool: 'ProxyPool', address: str):
+        self._pool = pool
+        self.address = address
+
+    @property
+    def connected(self) -> bool:
+        return self._pool.proxy(self.address) is not None
+
+    @property
+    def generation(self) -> int:
+        """Connections made so far, subscriptions of an older generation were made on a dropped proxy"""
+        return self._pool.entry(self.address).generation
+
+    def wait_connected(self, timeout: float | None = None) -> bool:
+        return self._pool.entry(self.address).connected.wait(timeout)
+
+    def report_failure(self):
+        """Drop the proxy and reconnect in the background"""
+        self._pool.report_failure(self.address)
+
+    def __getattr__(self, name):
+        proxy = self._pool.proxy(self.address)
+        if proxy is None:
+            raise ConnectionError(f'{self.address} is not connected')
+        return getattr(proxy, name)
+
+
+class _PoolEntry:
+    def __init__(self, address: str):
+        self.address = address
+        self.proxy = None
+        self.async_proxy = None  # Future of the asyncio green mode proxy, made on first use
+        self.async_generation = None  # Generation async_proxy was made in
+        self.connected = threading.Event()
+        self.thread = None
+        self.attempts = 0
+        self.generation = 0
+
+
+class ProxyPool:
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, initial_backoff: float = 1., max_backoff: float = 60.):
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._closing = threading.Event()
+
+    @classmethod
+    def instance(cls) -> 'ProxyPool':
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def acquire(self, address: str) -> PooledProxy:
+        """Handle on the proxy for address, connecting in the background on first use"""
+        with self._lock:
+            if address not in self._entries:
+                self._entries[address] = _PoolEntry(address)
+                self._connect(self._entries[address])
+        return PooledProxy(self, address)
+
+    def register(self, address: str, proxy, async_proxy=None) -> PooledProxy:
+        """Use an existing proxy for address, e.g. a FakeDeviceProxy, and its asyncio counterpart if any"""
+        with self._lock:
+            entry = self._entries.setdefault(address, _PoolEntry(address))
+            entry.proxy = proxy
+            entry.async_proxy = async_proxy
+            entry.generation += 1
+            entry.connected.set()
+        return PooledProxy(self, address)
+
+    def entry(self, address: str) -> _PoolEntry:
+        return self._entries[address]
+
+    def proxy(self, address: str):
+        entry = self._entries.get(address)
+        return entry.proxy if entry is not None else None
+
+    def report_failure(self, address: str):
+        with self._lock:
+            entry = self._entries[address]
+            if entry.proxy is None:
+                return
+            print(f'Lost connection to {address}, reconnecting')
+            entry.proxy = None
+            entry.async_proxy = None  # Green mode proxy of the same generation
+            entry.connected.clear()
+            self._connect(entry)
+
+    async def async_proxy(self, address: str):
+        """
+        Asyncio green mode proxy of address, one for all the asyncio devices on it, once the pool has
+        connected the address (waiting meanwhile, the pool retries with its backoff)
+        """
+        entry = self.entry(address)
+        while True:
+            while not entry.connected.is_set():
+                if self._closing.is_set():
+                    raise ConnectionError(f'{address} is not connected')
+                await asyncio.sleep(0.1)
+            if not isinstance(entry.async_proxy, asyncio.Future):
+                if entry.async_proxy is not None:
+                    return entry.async_proxy  # Registered
+                entry.async_proxy = asyncio.ensure_future(tango.asyncio.DeviceProxy(address))
+                entry.async_generation = entry.generation
+            future, generation = entry.async_proxy, entry.async_generation
+            try:
+                proxy = await asyncio.shield(future)
+            except tango.DevFailed:
+                self.report_failure(address)  # Drops both connections, the pool reconnects
+                raise
+            if generation == entry.generation:
+                return proxy
+            # Made for a connection dropped meanwhile, make one for the new connection
+
+    def close(self):
+        """Stop reconnection attempts"""
+        self._closing.set()
+
+    def _connect(self, entry: _PoolEntry):
+        """Start the connection thread of entry, unless one is running. Call with the lock held"""
+        if entry.thread is not None:
+            return
+        entry.thread = threading.Thread(target=self._connect_loop, args=(entry,),
+                                        name=f'ProxyPool {entry.address}', daemon=True)
+        entry.thread.start()
+
+    def _connect_loop(self, entry: _PoolEntry):
+        backoff = self.initial_backoff
+        while not self._closing.is_set():
+            entry.attempts += 1
+            try:
+                proxy = tango.DeviceProxy(entry.address)
+                proxy.ping()
+            except tango.DevFailed as e:
+                print(f'Could not connect to {entry.address} (attempt {entry.attempts}, '
+                      f'retrying in {backoff:.0f} s): {e.args[0].desc.strip()}')
+                self._closing.wait(backoff)
+                backoff = min(2 * backoff, self.max_backoff)
+                continue
+
+            with self._lock:
+                entry.proxy = proxy
+                entry.async_proxy = None
+                entry.generation += 1
+                entry.connected.set()
+                entry.thread = None
+            print(f'Connected to {entry.address}')
+            return
@@ -0,0 +1,213 @@
+"""
+Replay device: streams a device recorded by H5Builder (devices/<name>/data and timestamps) through
+data_received, as a live source, at the recorded speed, N times faster, or as fast as possible.
+Gives realistic, repeatable loads for the GUI, the saver and the diag server without a tango bus.
+
+Chunks are prefetched lazily by a background thread into a bounded queue, so only a few chunks of a
+day file are ever in memory.
+
+Config keys of a 'replay' device, on top of the usual ones:
+    "file": path of the HDF5 archive
+    "source": name of the recorded device, defaults to the device name
+    "speed": 1 for real time, N for N times faster, "max" for as fast as possible
+    "loop": start over at the end of the file, default false
+    "recorded timestamps": emit recorded timestamps instead of shifting them to now, default false
+"""
+from PyQt6.QtCore import QTimer, Qt
+import asyncio
+import queue
+import threading
+import time
+from datetime import datetime
+
+import h5py
+import numpy as np
+
+from laser_monitoring.Device_Classes.Data_Acquisition import Data_Acquisition
+from laser_monitoring.Device_Classes.Acquisition_Engine import AcquisitionEngine
+from laser_monitoring.Data_Saver import h5_Filters  # Registers the hdf5plugin filters, when installed
+from laser_monitoring.Data_Saver.h5_Builder import written_rows
+
+
+def recorded_format(file, source: str) -> tuple[str, tuple, str]:
+    """Graph type, frame shape and dtype of a recorded device"""
+    with h5py.File(file, 'r') as f:
+        dataset = f[f'devices/{source}/data']
+        return dataset.attrs.get('graph_type', 'rolling_1d'), dataset.shape[1:], dataset.dtype.name
+
+
+def replayed_rows(data: h5py.Dataset, timestamps: h5py.Dataset) -> int:
+    """
+    Rows written, not the allocated ones: contiguous datasets are preallocated (NaN timestamps past
+    the last row), and persistent files over-allocated, trimmed to their 'rows' attribute only on a
+    clean close, so a crashed or still open file would replay padding
+    """
+    if timestamps.chunks is None:
+        return written_rows(timestamps)
+    end = min(data.shape[0], timestamps.shape[0])
+    return int(min(end, data.attrs.get('rows', end)))
+
+
+class ReplaySource(Data_Acquisition):
+    chunk_rows = 256
+    prefetch_chunks = 4
+    max_burst_s = 0.01  # At max speed, yield to the event loop after emitting for this long
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.file = parent.file
+        self.source = parent.source
+        self.speed = parent.speed
+        self.loop = parent.loop
+        self.recorded_timestamps = parent.recorded_timestamps
+
+        self._chunks = None
+        self._prefetch_stop = threading.Event()
+        self._timestamps = np.empty(0)
+        self._data = None
+        self._row = 0
+        self.stats = {'replayed': 0, 'achieved_rate_hz': 0.}
+
+    #######################################################################
+    #                    Prefetch
+    #######################################################################
+
+    def _prefetch(self, chunks: queue.Queue, stop: threading.Event):
+        """Background thread, reads the file chunk by chunk into the bounded queue"""
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    chunks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        while not stop.is_set():
+            with h5py.File(self.file, 'r') as f:
+                data = f[f'devices/{self.source}/data']
+                timestamps = f[f'devices/{self.source}/timestamps']
+                rows = replayed_rows(data, timestamps)
+                for start in range(0, rows, self.chunk_rows):
+                    end = min(start + self.chunk_rows, rows)
+                    chunk = (timestamps[start:end, 0], data[start:end])
+                    if not put(chunk):
+                        return
+            if not self.loop or rows == 0:
+                break  # Nothing to loop over in an empty recording
+        put(None)  # End of file
+
+    def _next_chunk(self) -> bool:
+        while self.running:
+            try:
+                chunk = self._chunks.get(timeout=0.1)
+                break
+            except queue.Empty:
+                pass
+        else:
+            return False
+
+        if chunk is None:
+            return False
+        self._timestamps, self._data = chunk
+        self._row = 0
+        return True
+
+    def _emit_static(self):
+        with h5py.File(self.file, 'r') as f:
+            group = f[f'devices/{self.source}']
+            static_data = {key: group[key][...] for key in group
+                           if key not in ('data', 'timestamps') and group[key].attrs.get('static', False)}
+        if static_data:
+            self.static_data = static_data
+            self.static_received.emit(self.device_id, static_data, datetime.now().timestamp())
+
+    #######################################################################
+    #                    Replay
+    #######################################################################
+
+    def start(self):
+        self._emit_static()
+        # Fresh queue and stop flag, so a prefetch thread left from a previous run can't feed this one
+        self._chunks = queue.Queue(maxsize=self.prefetch_chunks)
+        self._prefetch_stop = threading.Event()
+        threading.Thread(target=self._prefetch, args=(self._chunks, self._prefetch_stop),
+                         name=f'Replay {self.device_id}', daemon=True).start()
+
+        self.running = True
+        self._t0 = datetime.now().timestamp()
+        self._wall_0 = time.monotonic()
+        self._recorded_0 = None
+        if self._next_chunk():
+            self._recorded_0 = self._timestamps[0]
+            self._generate_data()
+        else:
+            print(f'{self.device_id}: nothing to replay in {self.file}')
+
+    def stop(self):
+        self.running = False
+        self._prefetch_stop.set()
+        print(f"{self.device_id}: replayed {self.stats['replayed']} frames "
+              f"at {self.stats['achieved_rate_hz']:.1f} Hz")
+
+    def _payload(self, row: np.ndarray, timestamp: float) -> dict:
+        if self.data_type == 'rolling_1d':
+            return {'x': timestamp - self._t0, 'y': row[0]}
+        if self.data_type == 'static_1d':
+            return {'y': row}
+        return {'image': row}
+
+    def _emit_due(self) -> float | None:
+        """Emit frames that are due, returns seconds until the next one, None at the end of the file"""
+        burst_start = time.monotonic()
+        while self.running:
+            if self._row >= len(self._timestamps):
+                if not self._next_chunk():
+                    print(f'{self.device_id}: end of replay')
+                    return None
+                if self._timestamps[0] < self._recorded_0:
+                    # Looped over, restart the clock
+                    self._recorded_0 = self._timestamps[0]
+                    self._wall_0 = time.monotonic()
+
+            recorded = self._timestamps[self._row]
+            now = time.monotonic()
+            if self.speed == 'max':
+                if now - burst_start > self.max_burst_s:
+                    return 0.
+            else:
+                due = self._wall_0 + (recorded - self._recorded_0) / self.speed
+                if due > now:
+                    return due - now
+
+            timestamp = recorded if self.recorded_timestamps else datetime.now().timestamp()
+            self.data_received.emit(self.device_id, self._payload(self._data[self._row], timestamp), timestamp)
+            self._row += 1
+            self.stats['replayed'] += 1
+            self.stats['achieved_rate_hz'] = self.stats['replayed'] / max(now - self._wall_0, 1e-6)
+        return None
+
+    def _generate_data(self):
+        delay = self._emit_due()
+        if delay is not None:
+            QTimer.singleShot(round(delay * 1000), Qt.TimerType.PreciseTimer, self._generate_data)
+
+
+class AsyncReplaySource(ReplaySource):
+    """ReplaySource emitting from the shared asyncio AcquisitionEngine"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._task = None
+
+    def _generate_data(self):
+        self._task = AcquisitionEngine.instance().submit(self._replay())
+
+    def stop(self):
+        super().stop()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _replay(self):
+        while (delay := self._emit_due()) is not None:
+            await asyncio.sleep(delay)
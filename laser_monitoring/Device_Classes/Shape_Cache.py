@@ -0,0 +1,40 @@
+"""
+On-disk cache of the shape and dtype of each device, so startup and Start/Stop cycles don't go
+over the network to discover them. Stored as JSON next to the device config, keyed by tango address.
+
+Virtual, load generator and replay devices are not cached, their format comes from their config.
+Entries are checked against the first real frame of each device and replaced when they no longer match.
+"""
+import pathlib
+from threading import Lock
+
+from laser_monitoring.Config.Config_RW import readConfig, writeConfig
+
+
+class ShapeCache:
+
+    def __init__(self, path: str | pathlib.Path):
+        self.path = pathlib.Path(path)
+        self._lock = Lock()
+        self._entries = readConfig(self.path) if self.path.exists() else {}
+
+    @classmethod
+    def next_to(cls, config_file: str | pathlib.Path) -> 'ShapeCache':
+        """Cache file of a device config, e.g. tango_config.shapes.json for tango_config.json"""
+        config_file = pathlib.Path(config_file)
+        return cls(config_file.with_name(f'{config_file.stem}.shapes.json'))
+
+    @staticmethod
+    def key(device) -> str:
+        return device.address.lower()
+
+    def get(self, device) -> tuple[tuple, str] | None:
+        entry = self._entries.get(self.key(device))
+        if entry is None or entry.get('shape key') != device.shape_key:
+            return None
+        return tuple(entry['shape']), entry['dtype']
+
+    def set(self, device, shape: tuple, dtype: str):
+        with self._lock:
+            self._entries[self.key(device)] = {'shape key': device.shape_key, 'shape': list(shape), 'dtype': dtype}
+            writeConfig(self.path, self._entries)
@@ -4,6 +4,7 @@ from laser_monitoring import Device_Classes as Devices
 
 from PyQt6.QtWidgets import QWidget
 import pyqtgraph as pg
+import numpy as np
 from collections import deque
 from abc import abstractmethod
 
@@ -28,6 +29,14 @@ class Graph(QWidget):
     def update_graph(self, data: dict):
         pass
 
+    def update_static(self, data: dict):
+        """Static data (e.g. spectrometer axis) is only sent when it changes"""
+        pass
+
+    def memory_usage(self) -> int:
+        """Bytes of data history held by the graph"""
+        return 0
+
     @abstractmethod
     def clear_graph(self):
         pass
@@ -54,17 +63,30 @@ class RollingGraph(Graph, Dark_StyleSheet):
         self.x.clear()
         self.y.clear()
 
+    def memory_usage(self) -> int:
+        return 32 * (len(self.x) + len(self.y))  # Python float and its deque slot
+
 class StaticGraph(Graph, Dark_StyleSheet):
     def __init__(self, device: Device):
         super().__init__(device)
         self.set_dark_mode()
         self.set_axes() # From Dark_StyleSheet
         self.set_labels() # From Dark_StyleSheet
+        self.x = None
+
+    def update_static(self, data: dict):
+        self.x = np.asarray(data.get('x'))
 
     def update_graph(self, data: dict):
-        self.x = data.get('x', 0)
-        self.y = data.get('y', 0)
-        self.curve.setData(list(self.x), list(self.y))
+        self.y = np.asarray(data.get('y', 0))
+        if 'x' in data:
+            self.x = np.asarray(data['x'])
+        if self.x is None or len(self.x) != len(self.y):
+            self.x = np.arange(len(self.y))
+        self.curve.setData(self.x, self.y)
+
+    def memory_usage(self) -> int:
+        return sum(array.nbytes for array in (self.x, getattr(self, 'y', None)) if array is not None)
 
 class DensityGraph(Graph, Dark_StyleSheet):
     def __init__(self, device: Device):
@@ -90,6 +112,10 @@ class DensityGraph(Graph, Dark_StyleSheet):
         if image is not None:
             self.img_item.setImage(image)  # Transpose for correct orientation
 
+    def memory_usage(self) -> int:
+        image = self.img_item.image
+        return image.nbytes if image is not None else 0
+
 
 class GraphMaker:
     _graph_types = {
@@ -1,36 +1,72 @@
 import tango
 from PyQt6.QtWidgets import QApplication
-from PyQt6.QtCore import pyqtSlot
+from PyQt6.QtCore import pyqtSlot, QTimer
 from PyQt6 import QtCore
 import sys
 import qdarkstyle
 from laser_monitoring.Device_Classes.Devices import DeviceMaker
+from laser_monitoring.Device_Classes.Acquisition_Engine import AcquisitionEngine
+from laser_monitoring.Device_Classes.Proxy_Pool import ProxyPool
+from laser_monitoring.Device_Classes.Shape_Cache import ShapeCache
+from laser_monitoring.Device_Classes.Load_Generator import expand_counts
 from Build_Interface import Monitoring_Interface
 from laser_monitoring.diagServer.diagServer import diagServer
 from laser_monitoring.Config.Config_RW import readConfig
 from laser_monitoring.Data_Saver.Data_Saver import DataSaver
+from laser_monitoring.Data_Saver.File_Rotation import FileRotation
+from laser_monitoring.Data_Saver.Memory_Budget import MemoryBudget
 from laser_monitoring.Data_Saver.Data_Scheduler import DataSaveScheduler
+import math
 import pathlib
+import time
+import concurrent.futures
 
 class Laser_Data(Monitoring_Interface):
     signalLaserDataDict = QtCore.pyqtSignal(object)
+    read_grace_s = 3  # Tango default client timeout, for a shape read started just before the deadline
+    startup_workers = 32  # Devices created at once, load generator configs can expand to hundreds
 
     def __init__(self, polling_period: float, buffer_size: int = 1000, config_file: str = "./Config/tangoVM_config.json",
                  verbose: bool = False, filename: str = 'laser_data.h5', root_path: str = './Data',
-                 data_flush_period: int = 30):
+                 data_flush_period: int = 30, acquisition_engine: str = 'qthread',
+                 startup_timeout: float = 10, live_read: bool = False,
+                 rotation: FileRotation | None = None, journal_dir: str | None = None,
+                 compression_workers: int = 0, memory_budget: int = 2 * 2**30):
         super().__init__()
         self.verbose = verbose
         self.config_file = config_file
+        self.acquisition_engine = acquisition_engine  # Default for devices not setting 'acquisition engine'
+        self.startup_timeout = startup_timeout  # Per device, for creation and shape discovery
+        self.startup_timings = {}
+        self.shape_cache = ShapeCache.next_to(config_file)
 
         self.setup(filename, root_path, data_flush_period)
         self.devices = {}
         self.polling_period = polling_period
         self._buffer_size = buffer_size
 
-        self.data_saver = DataSaver(flush_interval=self.data_flush_period)
+        # live_read: SWMR file, readable (e.g. with H5Loader.follow) while acquisition writes it
+        # rotation: new file by size, period or at midnight (default), see Data_Saver/File_Rotation.py
+        # Bytes of samples held in memory by the saver buffers, scheduler snapshots and graphs
+        self.memory_budget = MemoryBudget(memory_budget)
+        self.memory_budget.track('scheduler snapshots',
+                                 lambda: self.scheduler.memory_usage() if hasattr(self, 'scheduler') else 0)
+        self.memory_budget.track('graph histories',
+                                 lambda: sum(graph.memory_usage() for graph in list(self.graphs.values())))
+
+        # journal_dir: samples first go to an mmap journal there, see Data_Saver/Journal.py
+        self.data_saver = DataSaver(flush_interval=self.data_flush_period, swmr=live_read,
+                                    rotation=rotation if rotation is not None else FileRotation(),
+                                    journal_dir=journal_dir, compression_workers=compression_workers,
+                                    memory_budget=self.memory_budget)
         self.serv = diagServer(parent=self, data={"state": "starting..."}, name='LaserData') # init the server
         self.serv.start()  # start the server thread
 
+        # Polling jitter and missed ticks, refreshed every second
+        self.stats_timer = QTimer()
+        self.stats_timer.timeout.connect(self._update_status_bar)
+        self.stats_timer.start(1000)
+
 
     def setup(self, filename, root_path, data_flush_period):
 
@@ -47,27 +83,89 @@ class Laser_Data(Monitoring_Interface):
 
         # Read configuration back from file
         loaded_config = readConfig(self.config_file)
-        self.device_list = [loaded_config[key] for key in loaded_config]
+        self.device_list = expand_counts([loaded_config[key] for key in loaded_config])
  
 
     def create_devices(self):
+        """Create devices and discover their shapes concurrently, then add them in config order"""
         print('Creating devices')
+        t_0 = time.perf_counter()
+        workers = max(1, min(self.startup_workers, len(self.device_list)))
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        # Each device has startup_timeout from when a worker takes it, queued devices wait at most
+        # for the batches ahead of them to use theirs
+        last_deadline = t_0 + self.startup_timeout * math.ceil(len(self.device_list) / workers) + self.read_grace_s
+        started = {}  # Device name -> time a worker took it
+        futures = []
         for dev in self.device_list:
+            dev.setdefault('acquisition engine', self.acquisition_engine)
+            futures.append((dev['name'], executor.submit(self._build_device, dev, started)))
+
+        for device_name, future in futures:
             try:
-                # Dictionary of device objects
-                device_name = dev['name']
-                device = DeviceMaker.create(dev)               
-  
+                device = self._wait_device(device_name, future, started, last_deadline)
+            except concurrent.futures.TimeoutError:
+                print(f'Creating {device_name} took more than {self.startup_timeout} s, skipped')
+                self.startup_timings[device_name] = {'status': 'timed out'}
+                device = None
             except Exception as e:
                 print(e)
+                self.startup_timings[device_name] = {'status': f'failed: {e}'}
                 device = None
-            
-            if device is not None : 
+
+            if device is not None :
                 self.devices[device_name] = device
                 self.connect_device_signals(device)
                 self.add_graph(device)
                 self.add_stretch()
+        # Don't wait for hung constructors
+        executor.shutdown(wait=False)
+
+        self._print_startup_timings(time.perf_counter() - t_0)
+
+    def _wait_device(self, device_name: str, future: concurrent.futures.Future, started: dict,
+                     last_deadline: float):
+        """Device built by future, TimeoutError once past its own deadline (plus read_grace_s)"""
+        while True:
+            t_start = started.get(device_name)
+            if t_start is None:
+                # Still queued, its deadline starts when a worker takes it
+                remaining = min(0.1, last_deadline - time.perf_counter())
+            else:
+                remaining = min(t_start + self.startup_timeout + self.read_grace_s, last_deadline) - time.perf_counter()
+            try:
+                return future.result(timeout=max(0., remaining))
+            except concurrent.futures.TimeoutError:
+                if t_start is not None or time.perf_counter() >= last_deadline:
+                    future.cancel()  # Not started yet: never will
+                    raise
+
+    def _build_device(self, dev: dict, started: dict):
+        """Runs in a pool thread: create the device, then discover its shape within startup_timeout"""
+        device_name = dev['name']
+        t_0 = time.perf_counter()
+        started[device_name] = t_0
+        deadline = t_0 + self.startup_timeout
+        device = DeviceMaker.create(dev)
+        device.move_to(self.thread())
+        device.shape_cache = self.shape_cache
+        t_1 = time.perf_counter()
 
+        try:
+            device.discover_shape(timeout=max(0., deadline - time.perf_counter()))
+            status = 'ok'
+        except Exception as e:
+            # Device kept, its datasets are created from its first sample
+            status = f'shape unknown: {e}'
+        self.startup_timings[device_name] = {'create_s': t_1 - t_0, 'shape_s': time.perf_counter() - t_1,
+                                             'status': status}
+        return device
+
+    def _print_startup_timings(self, total_s: float):
+        print(f'Devices created in {total_s:.2f} s')
+        for device_name, timing in self.startup_timings.items():
+            print(f"  {device_name:<30} create {timing.get('create_s', float('nan')):6.2f} s   "
+                  f"shape {timing.get('shape_s', float('nan')):6.2f} s   {timing['status']}")
 
     def configure_h5File(self):
         self.data_saver.start(self.devices, filename=self.filename, root_path=self.root_path)
@@ -76,8 +174,11 @@ class Laser_Data(Monitoring_Interface):
         """Connect device signals to slots"""
         device.worker.data_received.connect(self._on_device_data)
         device.worker.error_occurred.connect(self._on_device_error)
+        device.worker.static_received.connect(self._on_static_data)
         self.data_saver.buffer_warning.connect(lambda size: print(f"WARNING: Buffer filling up! Size: {size}"))
-        self.data_saver.data_saved.connect(lambda count: print(f"Saved batch of {count} points"))
+        self.data_saver.data_saved.connect(lambda count, mb_per_s, rows_per_s:
+                                           print(f"Saved batch of {count} points "
+                                                 f"({mb_per_s:.1f} MB/s, {rows_per_s:.0f} rows/s)"))
 
     def connect_button_signals(self):
         self.start_request.connect(self._on_start_request)
@@ -103,6 +204,22 @@ class Laser_Data(Monitoring_Interface):
         for device in self.devices.values():
             device.stop_device()
 
+    def device_stats(self) -> dict:
+        """Per-device polling jitter and missed ticks, plus read statistics of tango devices"""
+        stats = {}
+        for device_name, device in self.devices.items():
+            stats[device_name] = dict(device.worker.timing_stats)
+            stats[device_name].update(getattr(device.worker, 'stats', {}))
+        return stats
+
+    def _update_status_bar(self):
+        if not self.devices:
+            return
+        self.statusBar.showMessage(' | '.join(
+            f"{device_name}: jitter {stats['jitter_mean_ms']:.1f} ms (max {stats['jitter_max_ms']:.0f}), "
+            f"missed {stats['missed_ticks']}"
+            for device_name, stats in self.device_stats().items()))
+
     #######################################################################
     #                    SIGNAL HANDLERS (Slots)
     #######################################################################
@@ -124,6 +241,8 @@ class Laser_Data(Monitoring_Interface):
             else:
                 raise Exception('Graph type not handled')
 
+            device.validate_frame(_data)
+
             self.scheduler.on_data_received(device_name, _data, timestamp)
 
 
@@ -132,6 +251,13 @@ class Laser_Data(Monitoring_Interface):
         else:
             pass
 
+    @pyqtSlot(str, dict, float)
+    def _on_static_data(self, device_name: str, data: dict, timestamp: float):
+        """Handle static attributes (e.g. spectrometer axis), sent only when they change"""
+        device = self.devices.get(device_name)
+        self.update_static(device, data)
+        self.data_saver.on_static_data(device_name, data, timestamp)
+
     @pyqtSlot()
     def _on_start_request(self):
         self.scheduler = DataSaveScheduler(self.data_saver.on_data_event)
@@ -173,6 +299,8 @@ class Laser_Data(Monitoring_Interface):
     def closeEvent(self, event):
         """Clean up when window closes"""
         self.stop_all_devices()
+        AcquisitionEngine.shutdown()
+        ProxyPool.instance().close()
         self.serv.stop()
         self.data_saver.stop()
         event.accept()
@@ -151,6 +151,8 @@ class diagServer(threading.Thread):
             '__PING__': answer '__PONG__'
             '__DEVICE__': answer  'diagnostics'
             '__FREEDOM__' : degree of freedom. 0 for a camera.
+            '__STATS__': transmit the per-device acquisition statistics of the parent
+            '__MEMORY__': transmit the memory used per component, in bytes
         '''
         print(f"[diagServer {self.name}] Running on {self.address}")
 
@@ -183,6 +185,20 @@ class diagServer(threading.Thread):
                     
                     elif message == "__PING__":
                         self.socket.send_string("__PONG__")
+
+                    elif message == "__STATS__":
+                        try:
+                            response = json.dumps(self._parent.device_stats())
+                        except Exception as e:
+                            response = json.dumps({"error": str(e)})
+                        self.socket.send_string(response)
+
+                    elif message == "__MEMORY__":
+                        try:
+                            response = json.dumps(self._parent.memory_budget.usage())
+                        except Exception as e:
+                            response = json.dumps({"error": str(e)})
+                        self.socket.send_string(response)
                     
                     else :
                         self.socket.send_string("unable to understand the demande")
@@ -0,0 +1,90 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from PyQt6.QtCore import Qt
+
+from laser_monitoring.Device_Classes.Acquisition_Engine import AcquisitionEngine, AsyncTangoDevice
+from laser_monitoring.Device_Classes.Fake_Proxy import AsyncFakeDeviceProxy, FakeDeviceProxy
+from laser_monitoring.Device_Classes.Proxy_Pool import PooledProxy, ProxyPool, _PoolEntry
+
+
+@pytest.fixture(autouse=True)
+def engine():
+    yield
+    AcquisitionEngine.shutdown()
+
+
+def wait_for(condition, timeout: float = 5.):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.02)
+
+
+def energy_meter(address: str) -> tuple[AsyncTangoDevice, list]:
+    pool = ProxyPool.instance()
+    pool._entries[address] = _PoolEntry(address)  # As acquire() before the pool has connected
+    parent = SimpleNamespace(name=address, address=address, graph_type='rolling_1d', polling_period=0.05,
+                             attrs={'energy': 'energy'}, acquisition_mode='event', event_type='change',
+                             device_proxy=PooledProxy(pool, address))
+    worker = AsyncTangoDevice(parent=parent)
+    frames = []
+    # Direct: frames are collected in the engine thread, there is no Qt event loop here
+    worker.data_received.connect(lambda device_id, data, timestamp: frames.append(data['energy']),
+                                 Qt.ConnectionType.DirectConnection)
+    return worker, frames
+
+
+def connect(address: str, energy: float, events: bool = True) -> FakeDeviceProxy:
+    proxy = FakeDeviceProxy({'energy': lambda: energy}, rate_hz=50, events=events, name=address)
+    ProxyPool.instance().register(address, proxy, AsyncFakeDeviceProxy(proxy))
+    return proxy
+
+
+def test_events_subscribed_once_connected_and_after_reconnection():
+    address = 'fake/energy/async_events'
+    worker, frames = energy_meter(address)
+    worker.start()
+    time.sleep(0.2)
+    assert frames == []  # Waits for the pool to connect
+
+    first = connect(address, 1.)
+    wait_for(lambda: 1. in frames)
+    assert first._subscriptions and first.read_count == 0
+
+    # The pool reconnected with a new proxy: subscriptions of the old one are gone
+    second = connect(address, 2.)
+    wait_for(lambda: 2. in frames)
+    assert second._subscriptions and second.read_count == 0
+    worker.stop()
+
+
+def test_polling_fallback_without_events():
+    address = 'fake/energy/async_polling'
+    worker, frames = energy_meter(address)
+    worker.start()
+    proxy = connect(address, 3., events=False)
+    wait_for(lambda: len(frames) >= 3)
+    worker.stop()
+    assert set(frames) == {3.} and proxy.read_count >= 3 and not proxy._subscriptions
+
+
+def test_green_mode_proxy_follows_the_pool_generation(monkeypatch):
+    made = []
+
+    async def device_proxy(address):
+        made.append(AsyncFakeDeviceProxy(ProxyPool.instance().proxy(address)))
+        return made[-1]
+
+    monkeypatch.setattr('tango.asyncio.DeviceProxy', device_proxy)
+    pool = ProxyPool.instance()
+    address = 'fake/energy/green_mode'
+    pool.register(address, FakeDeviceProxy({'energy': lambda: 1.}, name=address))
+    first = AcquisitionEngine.instance().submit(pool.async_proxy(address)).result(5)
+    assert AcquisitionEngine.instance().submit(pool.async_proxy(address)).result(5) is first
+
+    # A reconnection drops the green mode proxy of the old connection with it
+    pool.register(address, FakeDeviceProxy({'energy': lambda: 2.}, name=address))
+    second = AcquisitionEngine.instance().submit(pool.async_proxy(address)).result(5)
+    assert second is not first and len(made) == 2
@@ -0,0 +1,62 @@
+import os
+from datetime import datetime
+from types import SimpleNamespace
+
+import h5py
+import numpy as np
+import pytest
+
+from laser_monitoring.Data_Saver import Archive_Catalog
+from laser_monitoring.Data_Saver.Archive_Catalog import ArchiveCatalog
+from laser_monitoring.Data_Saver.h5_Builder import H5Builder
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """Three day files of 100 rows, one per second from 0, 1000 and 2000 s"""
+    device = SimpleNamespace(name='energy', graph_type='rolling_1d', shape=(1,), dtype='float64',
+                             compression=None, chunks=None, bit_depth=None)
+    files = []
+    for day in range(3):
+        builder = H5Builder(persistent=True)
+        builder.create_file(file_name='laser.h5', root_path=str(tmp_path), devices={'energy': device},
+                            date=datetime(2026, 3, 1 + day))
+        timestamps = 1000. * day + np.arange(100.)
+        builder.append_rows('energy', timestamps.reshape(-1, 1), timestamps)
+        builder.close()
+        files.append(builder.file)
+    return tmp_path, files
+
+
+def test_query_opens_only_the_edge_files(archive, monkeypatch):
+    root, files = archive
+    catalog = ArchiveCatalog(root)
+    assert catalog.rebuild() == 3
+
+    opened = []
+    h5_file = h5py.File
+    monkeypatch.setattr(Archive_Catalog.h5py, 'File', lambda file, *args, **kwargs:
+                        opened.append(file) or h5_file(file, *args, **kwargs))
+    pairs = catalog.query('energy', 50.5, 2010)
+    assert [(file, rows) for file, rows in pairs] == [(files[0], slice(51, 100)), (files[1], slice(0, 100)),
+                                                       (files[2], slice(0, 11))]
+    assert sorted(map(str, opened)) == sorted(map(str, (files[0], files[2])))  # Binary search at the edges
+
+
+def test_query_outside_the_archive(archive):
+    root, files = archive
+    catalog = ArchiveCatalog(root)
+    catalog.rebuild()
+    assert catalog.query('energy', 500, 900) == []
+    assert catalog.query('camera', 0, 3000) == []
+
+
+def test_rebuild_skips_unchanged_files(archive):
+    root, files = archive
+    catalog = ArchiveCatalog(root)
+    assert catalog.rebuild() == 3
+    assert catalog.rebuild() == 0
+    stat = os.stat(files[1])
+    os.utime(files[1], (stat.st_atime, stat.st_mtime + 10))
+    assert catalog.rebuild() == 1
+    assert catalog.summary() == {'energy': {'files': 3, 'rows': 300}}
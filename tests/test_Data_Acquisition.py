@@ -0,0 +1,74 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import tango
+from PyQt6.QtCore import QCoreApplication, Qt
+
+from laser_monitoring.Device_Classes.Data_Acquisition import TangoDevice
+from laser_monitoring.Device_Classes.Fake_Proxy import FakeDeviceProxy
+from laser_monitoring.Device_Classes.Proxy_Pool import ProxyPool
+
+
+def failing():
+    tango.Except.throw_exception('API_AttributeFailed', 'detector saturated', 'test')
+
+
+def energy_meter(attributes: dict, name: str) -> TangoDevice:
+    proxy = FakeDeviceProxy(attributes, events=False, name=name)
+    parent = SimpleNamespace(name=name, graph_type='rolling_1d', polling_period=0.1,
+                             attrs={key: key for key in attributes}, acquisition_mode='polling',
+                             device_proxy=ProxyPool.instance().register(proxy.name(), proxy))
+    return TangoDevice(parent=parent)
+
+
+def test_read_attributes_in_one_round_trip():
+    worker = energy_meter({'energy': lambda: 1.5, 'counts': lambda: np.arange(4)}, 'fake/energy/ok')
+    data, timestamp = worker._read_attributes()
+    assert data['energy'] == 1.5 and list(data['counts']) == [0, 1, 2, 3]
+    assert timestamp > 0
+    assert worker.stats['reads'] == 1 and worker.stats['round_trips_saved'] == 1
+
+
+def test_failed_attribute_raises_like_read_attribute():
+    worker = energy_meter({'energy': lambda: 1.5, 'counts': failing}, 'fake/energy/failing')
+    with pytest.raises(tango.DevFailed) as error:
+        worker._read_attributes()
+    assert error.value.args[0].desc == 'detector saturated'
+
+
+def test_failed_first_attribute_raises():
+    worker = energy_meter({'energy': failing, 'counts': lambda: np.arange(4)}, 'fake/energy/failing_first')
+    with pytest.raises(tango.DevFailed):
+        worker._read_attributes()
+
+
+def test_events_subscribed_again_after_reconnection():
+    app = QCoreApplication.instance() or QCoreApplication([])
+    address = 'fake/energy/reconnected'
+    first = FakeDeviceProxy({'energy': lambda: 1.}, rate_hz=50, name=address)
+    parent = SimpleNamespace(name=address, graph_type='rolling_1d', polling_period=0.05, attrs={'energy': 'energy'},
+                             acquisition_mode='event', event_type='change',
+                             device_proxy=ProxyPool.instance().register(address, first))
+    worker = TangoDevice(parent=parent)
+    worker.event_check_ms = 20
+    frames = []
+    worker.data_received.connect(lambda device_id, data, timestamp: frames.append(data['energy']),
+                                 Qt.ConnectionType.DirectConnection)
+
+    def run_until(condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            assert time.monotonic() < deadline, 'timed out'
+            app.processEvents()
+            time.sleep(0.005)
+
+    worker.start()
+    run_until(lambda: 1. in frames)
+    # The pool replaced the proxy, e.g. after a failed read of another device on the address
+    second = FakeDeviceProxy({'energy': lambda: 2.}, rate_hz=50, name=address)
+    ProxyPool.instance().register(address, second)
+    run_until(lambda: 2. in frames)
+    worker.stop()
+    assert first.read_count == second.read_count == 0  # Events only, no polling
@@ -0,0 +1,36 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from laser_monitoring.Data_Saver.Data_Saver import DataSaver
+from laser_monitoring.Data_Saver.h5_Loader import H5Loader
+from laser_monitoring.Data_Saver.Memory_Budget import MemoryBudget
+
+
+def test_samples_spill_while_memory_budget_exceeded(tmp_path):
+    budget = MemoryBudget(256 * 2 ** 20)
+    histories = {'bytes': 0}
+    budget.track('graph histories', lambda: histories['bytes'])
+    device = SimpleNamespace(name='energy', graph_type='rolling_1d', shape=(1,), dtype='float64',
+                             compression=None, chunks=None, bit_depth=None, overflow_policy='spill')
+    saver = DataSaver(memory_budget=budget)
+    saver.start({'energy': device}, 'test.h5', str(tmp_path))
+    for i in range(10):
+        saver.on_data_event('energy', float(i), 1000. + i)
+    assert len(saver.buffers['energy']) == 10
+
+    histories['bytes'] = 2 ** 30  # Graph histories grew past the budget
+    deadline = time.monotonic() + 5
+    while not saver._over_budget:
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+    for i in range(10, 20):
+        saver.on_data_event('energy', float(i), 1000. + i)
+    assert len(saver.buffers['energy']) <= 10  # New samples went to the spill journal
+    saver.stop()
+
+    with H5Loader(saver.h5_file.file) as loader:
+        timestamps, data = loader.get_range('energy', 0, 2000)
+    np.testing.assert_array_equal(timestamps, 1000. + np.arange(20))
+    np.testing.assert_array_equal(data.ravel(), np.arange(20.))
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from laser_monitoring.Device_Classes.Devices import Device
+from laser_monitoring.Device_Classes.Shape_Cache import ShapeCache
+
+
+def make_device(tmp_path, is_virtual=False) -> Device:
+    device = Device({'name': 'camera', 'address': 'lab/camera/1', 'type': 'beam profile',
+                     'is virtual': is_virtual, 'polling period': 1, 'saving period': 1})
+    device.shape_key = 'image'
+    device.shape_cache = ShapeCache(tmp_path / 'config.shapes.json')
+    return device
+
+
+def test_cached_format_replaced_by_first_frame(tmp_path):
+    device = make_device(tmp_path)
+    device.shape_cache.set(device, (6, 8), 'uint16')
+    assert device.shape == (6, 8)  # From the cache, no device read
+
+    assert not device.validate_frame(np.zeros((4, 5), dtype='uint16'))
+    assert (device.shape, device.dtype) == ((4, 5), 'uint16')
+    assert ShapeCache(tmp_path / 'config.shapes.json').get(device) == ((4, 5), 'uint16')
+    assert device.validate_frame(np.zeros((4, 5), dtype='uint16'))
+
+
+def test_unknown_format_adopted_from_frame_without_reading_the_device(tmp_path):
+    device = make_device(tmp_path)
+
+    class Unreachable:
+        def data_format(self, key):
+            pytest.fail('validate_frame read the device')
+
+    device.worker = Unreachable()
+    assert device.validate_frame(np.zeros((4, 5), dtype='uint8'))
+    assert (device.shape, device.dtype) == ((4, 5), 'uint8')
+
+
+def test_virtual_devices_not_cached(tmp_path):
+    device = make_device(tmp_path, is_virtual=True)
+    device.validate_frame(np.zeros(16))
+    assert device.shape == (16,)
+    assert not (tmp_path / 'config.shapes.json').exists()
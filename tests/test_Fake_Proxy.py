@@ -0,0 +1,63 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from PyQt6.QtCore import QCoreApplication, Qt
+
+from laser_monitoring.Device_Classes.Data_Acquisition import TangoDevice
+from laser_monitoring.Device_Classes.Fake_Proxy import FakeDeviceProxy
+from laser_monitoring.Device_Classes.Proxy_Pool import ProxyPool
+
+wavelengths = np.linspace(700, 900, 2048)
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+def spectrometer(events: bool, name: str) -> tuple[TangoDevice, FakeDeviceProxy, list]:
+    proxy = FakeDeviceProxy({'lambda': lambda: wavelengths, 'intensity': lambda: np.random.uniform(0, 100, 2048)},
+                            rate_hz=50, events=events, name=name)
+    parent = SimpleNamespace(name=name, graph_type='static_1d', polling_period=0.02,
+                             attrs={'x': 'lambda', 'y': 'intensity'}, static_attrs=('x',),
+                             acquisition_mode='event', event_type='change',
+                             device_proxy=ProxyPool.instance().register(proxy.name(), proxy))
+    worker = TangoDevice(parent=parent)
+    frames = []
+    # Direct: event frames are emitted from the fake proxy thread
+    worker.data_received.connect(lambda device_id, data, timestamp: frames.append(data),
+                                 Qt.ConnectionType.DirectConnection)
+    return worker, proxy, frames
+
+
+def run_until(app, condition, timeout: float = 5.):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        app.processEvents()
+        time.sleep(0.005)
+
+
+def test_event_acquisition(app):
+    worker, proxy, frames = spectrometer(events=True, name='fake/spectrometer/events')
+    worker.start()
+    run_until(app, lambda: len(frames) >= 10)
+    worker.stop()
+
+    assert all(frame['y'].shape == (2048,) for frame in frames)
+    np.testing.assert_array_equal(worker.static_data['x'], wavelengths)
+    assert proxy.read_count == 1  # Static attributes read once, frames all came from events
+    assert not proxy._subscriptions
+
+
+def test_polling_fallback_without_events(app):
+    worker, proxy, frames = spectrometer(events=False, name='fake/spectrometer/polling')
+    worker.start()
+    run_until(app, lambda: len(frames) >= 10)
+    worker.stop()
+
+    assert all(frame['y'].shape == (2048,) for frame in frames)
+    np.testing.assert_array_equal(worker.static_data['x'], wavelengths)
+    assert proxy.read_count >= len(frames) and not proxy._subscriptions
@@ -0,0 +1,64 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from laser_monitoring.Data_Saver import File_Rotation
+from laser_monitoring.Data_Saver.File_Rotation import FileRotation
+from laser_monitoring.Data_Saver.h5_Builder import H5Builder
+
+
+def test_size_rotation_ignores_unwritten_contiguous_rows(tmp_path):
+    # 100 000 rows of 1024 float32 preallocated: 400 MB, beyond max_bytes from the start
+    device = SimpleNamespace(name='spectrum', graph_type='static_1d', shape=(1024,), dtype='float32',
+                             compression=None, chunks=None, bit_depth=None, contiguous_rows=100_000)
+    builder = H5Builder(persistent=True)
+    builder.create_file(file_name='hot.h5', root_path=str(tmp_path), devices={'spectrum': device})
+    rotation = FileRotation(max_bytes=20 * 2 ** 20, at_midnight=False)
+    started = datetime.now()
+    assert not rotation.due(builder, started)
+
+    builder.append_rows('spectrum', np.zeros((1000, 1024), dtype='f4'), np.arange(1000.))
+    assert not rotation.due(builder, started)
+    builder.append_rows('spectrum', np.zeros((5000, 1024), dtype='f4'), 1000 + np.arange(5000.))
+    assert rotation.due(builder, started)
+    builder.close()
+
+
+@pytest.fixture
+def now(monkeypatch):
+    """Set the time seen by File_Rotation"""
+    def set_now(value: datetime):
+        class FrozenDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return value
+        monkeypatch.setattr(File_Rotation, 'datetime', FrozenDatetime)
+    return set_now
+
+
+def test_next_date_daily_rotation_is_next_day(now):
+    now(datetime(2026, 3, 1, 23, 59, 30))
+    rotation = FileRotation(max_bytes=2 ** 30)
+    assert rotation.next_date(datetime(2026, 3, 1, 8)) == datetime(2026, 3, 2)
+
+
+@pytest.mark.parametrize('at_midnight', [True, False])
+def test_next_date_size_rotation_stays_in_current_folder(now, at_midnight):
+    now(datetime(2026, 3, 1, 14, 0))
+    rotation = FileRotation(max_bytes=2 ** 30, at_midnight=at_midnight)
+    assert rotation.next_date(datetime(2026, 3, 1, 8)).date() == datetime(2026, 3, 1).date()
+
+
+def test_next_date_size_rotation_just_before_midnight_without_daily_rotation(now):
+    now(datetime(2026, 3, 1, 23, 59, 50))
+    rotation = FileRotation(max_bytes=2 ** 30, at_midnight=False)
+    assert rotation.next_date(datetime(2026, 3, 1, 8)).date() == datetime(2026, 3, 1).date()
+
+
+def test_prepare_daily_rotation_folder(now, tmp_path):
+    now(datetime(2026, 3, 1, 23, 59, 30))
+    name, date = FileRotation().prepare(tmp_path, 'laser.h5', datetime(2026, 3, 1, 8))
+    assert name == 'laser.h5' and date == datetime(2026, 3, 2)
+    assert (tmp_path / '2026' / '03' / '02').is_dir()
@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from laser_monitoring.Data_Saver.h5_Builder import H5Builder
+from laser_monitoring.Data_Saver.h5_Loader import H5Loader
+from laser_monitoring.Data_Saver.Journal import Journal
+
+
+def spectra(start: int, rows: int) -> tuple[np.ndarray, np.ndarray]:
+    return np.arange(start * 8, (start + rows) * 8, dtype='f4').reshape(rows, 8), 1000. + np.arange(start, start + rows)
+
+
+def test_crash_recovery_compacts_into_hdf5(tmp_path):
+    journal = Journal(tmp_path / 'journal', segment_bytes=4096 + 10 * 40)  # 10 rows per segment
+    journal.open()
+    data, timestamps = spectra(0, 25)
+    for row, timestamp in zip(data, timestamps):
+        journal.append('spectrum', row, timestamp)
+    del journal  # Crash: segments neither closed nor compacted
+
+    recovered = Journal(tmp_path / 'journal')
+    recovered.open()
+    device = SimpleNamespace(name='spectrum', graph_type='static_1d', shape=(8,), dtype='float32',
+                             compression=None, chunks=None, bit_depth=None)
+    builder = H5Builder(persistent=True)
+    builder.create_file(file_name='test.h5', root_path=str(tmp_path), devices={'spectrum': device})
+
+    def write_rows(device_id, rows, timestamps) -> bool:
+        builder.append_rows(device_id, rows, timestamps)
+        return True
+
+    assert recovered.compact(write_rows) == 25
+    builder.close()
+    assert not list((tmp_path / 'journal').glob('*/*.seg'))
+    with H5Loader(builder.file) as loader:
+        saved_timestamps, saved = loader.get_range('spectrum', 0, 2000)
+    np.testing.assert_array_equal(saved_timestamps, timestamps)
+    np.testing.assert_array_equal(saved, data)
+
+
+def test_segments_not_written_are_kept(tmp_path):
+    journal = Journal(tmp_path / 'journal', max_age=0.)
+    journal.open()
+    for i in range(3):
+        journal.append('ghost', float(i), 1000. + i)
+
+    assert journal.compact(lambda device_id, rows, timestamps: False) == 0
+    assert journal.kept_rows == 3 and list((tmp_path / 'journal').glob('*/*.seg'))
+    assert journal.compact(lambda device_id, rows, timestamps: True) == 0  # Kept until retry_kept
+
+    written = []
+    journal.retry_kept()
+    assert journal.compact(lambda device_id, rows, timestamps: written.append(timestamps) or True) == 3
+    np.testing.assert_array_equal(written[0], 1000. + np.arange(3))
+    assert journal.kept_rows == 0 and not list((tmp_path / 'journal').glob('*/*.seg'))
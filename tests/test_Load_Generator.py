@@ -0,0 +1,44 @@
+import json
+from importlib.resources import files
+
+import numpy as np
+from PyQt6.QtCore import Qt
+
+from laser_monitoring.Device_Classes.Devices import LoadGenerator
+from laser_monitoring.Device_Classes.Load_Generator import expand_counts
+
+
+def definition(name: str, **config) -> dict:
+    return {'name': name, 'address': '', 'type': 'load generator', 'is virtual': True,
+            'polling period': 0.01, 'saving period': 0.1, **config}
+
+
+def test_expand_counts():
+    expanded = expand_counts([definition('Load scalar', count=3, rate=2000), definition('Load camera')])
+    assert [device['name'] for device in expanded] == ['Load scalar 1', 'Load scalar 2', 'Load scalar 3',
+                                                       'Load camera']
+    assert all('count' not in device for device in expanded)
+    assert all(device['rate'] == 2000 for device in expanded[:3])
+
+
+def test_load_test_config_devices():
+    config = json.loads((files('laser_monitoring.Config') / 'load_test_config.json').read_text())
+    definitions = list(config.values())
+    devices = [LoadGenerator(device) for device in expand_counts(definitions)]
+    names = [device.name for device in devices]
+    assert len(names) == len(set(names)) == sum(device.get('count', 1) for device in definitions)
+    assert all(device.worker.device_id == device.name for device in devices)
+
+
+def test_burst_of_frames_in_native_dtype():
+    device = LoadGenerator(definition('Load scalar', rate=2000, dtype='float32'))
+    worker = device.worker
+    frames = []
+    worker.data_received.connect(lambda device_id, data, timestamp: frames.append((data, timestamp)),
+                                 Qt.ConnectionType.DirectConnection)
+    worker._t0 = worker._started = 0.
+    worker._emit_burst()
+    assert len(frames) == worker.frames_per_tick == 10  # 2 kHz on 5 ms ticks
+    assert all(data['y'].dtype == np.float32 for data, _ in frames)
+    timestamps = [timestamp for _, timestamp in frames]
+    np.testing.assert_allclose(np.diff(timestamps), 1 / 2000, atol=1e-6)  # Epoch seconds in float64
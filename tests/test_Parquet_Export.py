@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+from laser_monitoring.Data_Saver.h5_Builder import H5Builder
+from laser_monitoring.Data_Saver.Parquet_Export import archive_files, export
+
+midnight = datetime(2026, 3, 2, tzinfo=timezone.utc).timestamp()
+
+
+def write_day(root_path, date: datetime, timestamps: np.ndarray):
+    device = SimpleNamespace(name='energy', graph_type='rolling_1d', shape=(1,), dtype='float64',
+                             compression=None, chunks=None, bit_depth=None)
+    builder = H5Builder(persistent=True)
+    # Every day folder holds a file of the same name, as with daily rotation
+    builder.create_file(file_name='laser.h5', root_path=str(root_path), devices={'energy': device}, date=date)
+    builder.append_rows('energy', timestamps.reshape(-1, 1), timestamps)
+    builder.close()
+    return builder.file
+
+
+def test_export_same_file_name_of_adjacent_days(tmp_path):
+    root = tmp_path / 'data'
+    # The file of the first day folder runs past midnight: both files hold rows of the same UTC day
+    before = midnight - 50 + np.arange(100.)
+    after = midnight + 100 + np.arange(100.)
+    write_day(root, datetime(2026, 3, 1), before)
+    write_day(root, datetime(2026, 3, 2), after)
+    (root / '2026' / '03' / '02' / 'damaged.h5').write_bytes(b'not an HDF5 file')
+
+    exported = export(archive_files([root]), tmp_path / 'parquet', workers=2)
+
+    assert exported == {'energy': 200}
+    table = pq.read_table(tmp_path / 'parquet' / 'device=energy').sort_by('timestamp')
+    np.testing.assert_array_equal(table['timestamp'].to_numpy(), np.r_[before, after])
+    np.testing.assert_array_equal(table['value'].to_numpy(), np.r_[before, after])
@@ -0,0 +1,64 @@
+import pytest
+
+from laser_monitoring.Device_Classes import Poll_Scheduler
+from laser_monitoring.Device_Classes.Poll_Scheduler import DeadlineScheduler
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 100.
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(Poll_Scheduler, 'time', clock)
+    return clock
+
+
+def test_deadlines_do_not_drift(clock):
+    scheduler = DeadlineScheduler(0.1)
+    scheduler.start()
+    for k in range(1, 6):
+        scheduler.tick()
+        clock.now += 0.03  # Read time
+        delay = scheduler.next_delay()
+        assert delay == pytest.approx(0.07)  # Next deadline is start + k * period, read time included
+        clock.now += delay
+        assert clock.now == pytest.approx(100 + k * 0.1)
+    assert scheduler.missed_ticks == 0
+
+
+def test_missed_ticks_skipped_and_counted(clock):
+    scheduler = DeadlineScheduler(0.1)
+    scheduler.start()
+    scheduler.tick()
+    clock.now += 0.35  # Slow read: deadlines at 0.1, 0.2 and 0.3 passed
+    assert scheduler.next_delay() == pytest.approx(0.05)  # Catches up on the 0.4 deadline
+    assert scheduler.missed_ticks == 3
+    clock.now += 0.05
+    scheduler.tick()
+    clock.now += 0.01
+    assert scheduler.next_delay() == pytest.approx(0.09)
+    assert scheduler.missed_ticks == 3
+
+
+def test_jitter_statistics(clock):
+    scheduler = DeadlineScheduler(0.1)
+    scheduler.start()
+    # Woken up 0.7 ms late once, then on time, then 3 ms late, then on time
+    for tick_time in (0., 0.1007, 0.2, 0.303, 0.4):
+        clock.now = 100 + tick_time
+        scheduler.tick()
+        clock.now += 0.01
+        scheduler.next_delay()
+    stats = scheduler.stats
+    assert stats['ticks'] == 5 and stats['missed_ticks'] == 0
+    assert stats['jitter_max_ms'] == pytest.approx(3.0)
+    assert stats['jitter_mean_ms'] == pytest.approx((0.7 + 0.7 + 3.0 + 3.0) / 4)
+    histogram = {interval: count for interval, count in stats['jitter_histogram_ms'].items() if count}
+    assert histogram == {'0.5-1': 2, '2-5': 2}
@@ -0,0 +1,62 @@
+import queue
+import threading
+from types import SimpleNamespace
+
+import h5py
+import numpy as np
+
+from laser_monitoring.Data_Saver.h5_Builder import H5Builder
+from laser_monitoring.Device_Classes.Replay import ReplaySource
+
+
+def recorded(tmp_path, timestamps: np.ndarray) -> str:
+    device = SimpleNamespace(name='energy', graph_type='rolling_1d', shape=(1,), dtype='float64',
+                             compression=None, chunks=None, bit_depth=None)
+    builder = H5Builder(persistent=True)
+    builder.create_file(file_name='recorded.h5', root_path=str(tmp_path), devices={'energy': device})
+    if len(timestamps):
+        builder.append_rows('energy', timestamps.reshape(-1, 1), timestamps)
+    builder.close()
+    return builder.file
+
+
+def replay(file, loop: bool = False) -> ReplaySource:
+    parent = SimpleNamespace(name='energy', graph_type='rolling_1d', polling_period=0.1, file=file,
+                             source='energy', speed='max', loop=loop, recorded_timestamps=True)
+    return ReplaySource(parent=parent)
+
+
+def test_replay_skips_rows_allocated_past_the_written_ones(tmp_path):
+    timestamps = 1000 + np.arange(300.)
+    file = recorded(tmp_path, timestamps)
+    # As left by a crash: over-allocated datasets, padding not trimmed to the 'rows' attribute
+    with h5py.File(file, 'r+') as f:
+        for name in ('data', 'timestamps'):
+            f[f'devices/energy/{name}'].resize(1000, axis=0)
+
+    chunks = queue.Queue()
+    replay(file)._prefetch(chunks, threading.Event())
+    replayed = []
+    while (chunk := chunks.get_nowait()) is not None:
+        replayed.append(chunk[0])
+    np.testing.assert_array_equal(np.concatenate(replayed), timestamps)
+
+
+def test_looped_replay_of_an_empty_recording_ends(tmp_path):
+    chunks = queue.Queue()
+    thread = threading.Thread(target=replay(recorded(tmp_path, np.empty(0)), loop=True)._prefetch,
+                              args=(chunks, threading.Event()), daemon=True)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive() and chunks.get_nowait() is None
+
+
+def test_looped_replay_stops(tmp_path):
+    chunks, stop = queue.Queue(maxsize=2), threading.Event()
+    thread = threading.Thread(target=replay(recorded(tmp_path, 1000 + np.arange(10.)), loop=True)._prefetch,
+                              args=(chunks, stop), daemon=True)
+    thread.start()
+    chunks.get(timeout=5)
+    stop.set()
+    thread.join(5)
+    assert not thread.is_alive()
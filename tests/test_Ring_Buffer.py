@@ -0,0 +1,72 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from laser_monitoring.Data_Saver.Ring_Buffer import RingBuffer
+
+
+def filled(policy: str, rows: int = 4, **options) -> RingBuffer:
+    buffer = RingBuffer(4, (2,), 'f4', policy, **options)
+    for i in range(rows):
+        assert buffer.put([i, i], float(i))
+    return buffer
+
+
+def test_drop_newest():
+    buffer = filled('drop newest')
+    assert not buffer.put([9, 9], 9.)
+    timestamps = buffer.drain()[1]
+    np.testing.assert_array_equal(timestamps, [0, 1, 2, 3])
+    assert buffer.dropped == 1
+
+
+def test_drop_oldest():
+    buffer = filled('drop oldest')
+    assert buffer.put([4, 4], 4.) and buffer.put([5, 5], 5.)
+    rows, timestamps = buffer.drain()
+    np.testing.assert_array_equal(timestamps, [2, 3, 4, 5])
+    np.testing.assert_array_equal(rows[:, 0], [2, 3, 4, 5])
+    assert buffer.dropped == 2
+
+
+def test_spill_refuses_without_counting_a_drop():
+    buffer = filled('spill')
+    assert not buffer.put([9, 9], 9.)
+    assert buffer.dropped == 0 and len(buffer) == 4
+
+
+def test_block_waits_for_the_writer():
+    buffer = filled('block', block_timeout=5.)
+    drained = []
+    writer = threading.Timer(0.1, lambda: drained.append(buffer.drain()))
+    writer.start()
+    t_0 = time.monotonic()
+    assert buffer.put([4, 4], 4.)
+    assert time.monotonic() - t_0 >= 0.05
+    writer.join()
+    np.testing.assert_array_equal(drained[0][1], [0, 1, 2, 3])
+    np.testing.assert_array_equal(buffer.drain()[1], [4])
+
+
+def test_block_times_out_and_drops():
+    buffer = filled('block', block_timeout=0.05)
+    assert not buffer.put([4, 4], 4.)
+    assert buffer.dropped == 1
+
+
+def test_drain_wraps_around_in_order():
+    buffer = filled('drop newest', rows=3)
+    buffer.drain()
+    for i in range(3, 7):  # Rows 3 to 6 fill slots 3, 0, 1, 2
+        assert buffer.put([i, i], float(i))
+    rows, timestamps = buffer.drain()
+    np.testing.assert_array_equal(timestamps, [3, 4, 5, 6])
+    np.testing.assert_array_equal(rows, [[3, 3], [4, 4], [5, 5], [6, 6]])
+    assert len(buffer) == 0
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        RingBuffer(4, (2,), 'f4', 'drop everything')
@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import h5py
+import numpy as np
+import pytest
+
+from laser_monitoring.Data_Saver.h5_Builder import H5Builder, bit_depth
+from laser_monitoring.Data_Saver.h5_Loader import H5Loader
+
+
+def camera(shape=(6, 8)):
+    return SimpleNamespace(name='camera', graph_type='density_2d', shape=shape, dtype='uint16',
+                           compression=None, chunks=None, bit_depth=None)
+
+
+def test_format_change_before_first_row_recreates_datasets(tmp_path):
+    # Datasets made from a stale cached shape, the first frames have the new ROI
+    builder = H5Builder(persistent=True)
+    builder.create_file(file_name='test.h5', root_path=str(tmp_path), devices={'camera': camera()})
+    frames = np.arange(3 * 4 * 5, dtype='uint16').reshape(3, 4, 5)
+    builder.append_rows('camera', frames, np.arange(3.))
+    builder.close()
+
+    with H5Loader(builder.file) as loader:
+        timestamps, data = loader.get_range('camera', 0, 10)
+    np.testing.assert_array_equal(data, frames)
+    with h5py.File(builder.file, 'r') as f:
+        assert not any(name.startswith('previous_') for name in f['devices/camera'])
+
+
+def test_format_change_keeps_rows_written(tmp_path):
+    builder = H5Builder(persistent=True)
+    builder.create_file(file_name='test.h5', root_path=str(tmp_path), devices={'camera': camera()})
+    before = np.ones((2, 6, 8), dtype='uint16')
+    after = np.full((3, 4, 5), 2, dtype='uint16')
+    builder.append_rows('camera', before, np.arange(2.))
+    builder.append_rows('camera', after, 2 + np.arange(3.))
+    builder.close()
+
+    with h5py.File(builder.file, 'r') as f:
+        np.testing.assert_array_equal(f['devices/camera/previous_1/data'][:], before)
+        np.testing.assert_array_equal(f['devices/camera/data'][:], after)
+        np.testing.assert_array_equal(f['devices/camera/timestamps'][:, 0], 2 + np.arange(3.))
+
+
+@pytest.mark.parametrize('data, depth', [
+    (np.array([0, 4095], dtype='uint16'), 12),
+    (np.array([0, 4096], dtype='uint16'), 14),
+    (np.array([-32768, 0], dtype='int16'), 16),
+    (np.array([-2048, 2047], dtype='int16'), 12),
+    (np.array([-1, 0], dtype='int8'), 8),
+    (np.array([0, 255], dtype='uint8'), 8),
+    (np.array([0., 1.], dtype='float32'), 32),
+])
+def test_bit_depth(data, depth):
+    assert bit_depth(data) == depth
+
+
+def test_bit_depth_recorded_from_the_frames_written(tmp_path):
+    builder = H5Builder(persistent=True)
+    builder.create_file(file_name='test.h5', root_path=str(tmp_path), devices={'camera': camera()})
+    frames = np.zeros((64, 6, 8), dtype='uint16')
+    frames[:, 0, 0] = 1000
+    builder.append_rows('camera', frames, np.arange(64.))
+    frames[:, 0, 0] = 4000
+    builder.append_rows('camera', frames, 64 + np.arange(64.))
+    builder.close()
+    with h5py.File(builder.file, 'r') as f:
+        assert f['devices/camera/data'].attrs['bit_depth'] == 12
+
+
+@pytest.mark.parametrize('compression, direct', [
+    ({'codec': 'gzip', 'level': 4}, True),
+    ({'codec': 'gzip', 'level': 1, 'shuffle': True}, True),
+    ('lzf', False),  # Not gzip: compressed by the HDF5 filter pipeline
+    ('none', False),
+])
+def test_compression_workers_files_read_with_standard_filters(tmp_path, monkeypatch, compression, direct):
+    direct_writes = []
+    write_direct_chunks = H5Builder._write_direct_chunks
+    monkeypatch.setattr(H5Builder, '_write_direct_chunks',
+                        lambda self, *args: direct_writes.append(args) or write_direct_chunks(self, *args))
+    device = camera(shape=(16, 24))
+    device.compression = compression
+    builder = H5Builder(persistent=True, compression_workers=2)
+    builder.create_file(file_name='test.h5', root_path=str(tmp_path), devices={'camera': device})
+    frames = np.random.default_rng(0).integers(0, 4096, (10, 16, 24), dtype='uint16')
+    builder.append_rows('camera', frames[:6], np.arange(6.))
+    builder.append_rows('camera', frames[6:], 6 + np.arange(4.))
+    builder.close()
+
+    assert bool(direct_writes) == direct
+    with h5py.File(builder.file, 'r') as f:
+        np.testing.assert_array_equal(f['devices/camera/data'][:10], frames)
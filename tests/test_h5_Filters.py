@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+import h5py
+import pytest
+
+from laser_monitoring.Data_Saver import h5_Filters
+from laser_monitoring.Data_Saver.h5_Builder import H5Builder
+
+
+def recorded_compression(tmp_path, compression) -> str:
+    device = SimpleNamespace(name='spectrum', graph_type='static_1d', shape=(64,), dtype='float32',
+                             compression=compression, chunks=None, bit_depth=None)
+    builder = H5Builder(persistent=True)
+    builder.create_file(file_name='test.h5', root_path=str(tmp_path), devices={'spectrum': device})
+    builder.close()
+    with h5py.File(builder.file, 'r') as f:
+        return f['devices/spectrum/data'].attrs['compression']
+
+
+@pytest.mark.parametrize('compression, recorded', [
+    (None, 'gzip level=4'),
+    ('none', 'none'),
+    ('lzf', 'lzf'),
+    ({'codec': 'gzip', 'level': 1, 'shuffle': True}, 'gzip level=1 shuffle=True'),
+])
+def test_recorded_compression(tmp_path, compression, recorded):
+    assert recorded_compression(tmp_path, compression) == recorded
+
+
+def test_recorded_compression_is_the_fallback_without_hdf5plugin(tmp_path, monkeypatch):
+    monkeypatch.setattr(h5_Filters, 'hdf5plugin', None)
+    assert recorded_compression(tmp_path, {'codec': 'zstd', 'level': 5}) == 'gzip level=4'
+
+
+@pytest.mark.parametrize('compression', [
+    {'codec': 'zstd', 'level': 5},
+    {'codec': 'lz4', 'shuffle': True},
+    {'codec': 'blosc', 'cname': 'zstd', 'level': 5, 'shuffle': 'bit'},
+])
+def test_recorded_plugin_compression(tmp_path, compression):
+    pytest.importorskip('hdf5plugin')
+    assert recorded_compression(tmp_path, compression) == h5_Filters.describe(compression)
@@ -0,0 +1,140 @@
+from types import SimpleNamespace
+
+import h5py
+import numpy as np
+import pytest
+
+from laser_monitoring.Data_Saver.h5_Builder import H5Builder
+from laser_monitoring.Data_Saver.h5_Loader import H5Loader
+
+rows = 5000  # One sample every 0.1 s
+
+
+def spectrum_device(**config):
+    return SimpleNamespace(name='spectrum', graph_type='static_1d', shape=(16,), dtype='float32',
+                           compression=None, chunks=None, bit_depth=None, **config)
+
+
+def write_file(root_path, swmr=False, **config):
+    builder = H5Builder(persistent=True, swmr=swmr)
+    builder.create_file(file_name='test.h5', root_path=str(root_path), devices={'spectrum': spectrum_device(**config)})
+    builder.start_swmr()
+    data = np.arange(rows * 16, dtype='f4').reshape(rows, 16)
+    timestamps = 1000 + np.arange(rows) * 0.1
+    for start in range(0, rows, 700):
+        builder.append_rows('spectrum', data[start:start + 700], timestamps[start:start + 700])
+    builder.close()
+    return builder.file, data, timestamps
+
+
+@pytest.fixture(params=[False, True], ids=['persistent', 'swmr'])
+def saved(tmp_path, request):
+    return write_file(tmp_path, swmr=request.param)
+
+
+def test_get_range(saved):
+    file, data, timestamps = saved
+    with H5Loader(file) as loader:
+        for _ in range(2):  # Second query from the cached timestamps
+            t, d = loader.get_range('spectrum', 1010, 1020)
+            selected = (timestamps >= 1010) & (timestamps <= 1020)
+            np.testing.assert_array_equal(t, timestamps[selected])
+            np.testing.assert_array_equal(d, data[selected])
+
+
+def test_get_range_step_and_columns(saved):
+    file, data, timestamps = saved
+    with H5Loader(file) as loader:
+        t, d = loader.get_range('spectrum', 1000, 1100, step=3, columns=slice(2, 5))
+    selected = np.flatnonzero(timestamps <= 1100)[::3]
+    np.testing.assert_array_equal(t, timestamps[selected])
+    np.testing.assert_array_equal(d, data[selected, 2:5])
+
+
+def test_iter_range(saved):
+    file, data, timestamps = saved
+    with H5Loader(file) as loader:
+        chunks = list(loader.iter_range('spectrum', 1050, 1250, chunk_rows=300))
+        assert loader.timestamps('spectrum').shape == (rows,)
+    assert max(len(t) for t, _ in chunks) == 300
+    selected = (timestamps >= 1050) & (timestamps <= 1250)
+    np.testing.assert_array_equal(np.concatenate([t for t, _ in chunks]), timestamps[selected])
+    np.testing.assert_array_equal(np.concatenate([d for _, d in chunks]), data[selected])
+
+
+def test_get_summary_raw_when_it_fits(saved):
+    file, data, timestamps = saved
+    with H5Loader(file) as loader:
+        tier, summary = loader.get_summary('spectrum', 1000, 1010, max_points=200)
+    assert tier == 'raw'
+    np.testing.assert_array_equal(summary['data'], data[timestamps <= 1010])
+
+
+def test_get_summary_tier(saved):
+    file, data, timestamps = saved
+    with H5Loader(file) as loader:
+        tier, summary = loader.get_summary('spectrum', 1000, 1500, max_points=1000)
+    assert tier == '1s'
+    assert summary['count'].sum() == rows
+    np.testing.assert_allclose(summary['mean'][0], data[:10].mean(axis=0))
+
+
+def test_get_summary_raw_fallback_without_tiers(tmp_path):
+    file, data, timestamps = write_file(tmp_path)
+    with h5py.File(file, 'a') as f:
+        del f['devices/spectrum/tiers']  # File written before summary tiers
+    with H5Loader(file) as loader:
+        tier, summary = loader.get_summary('spectrum', 1000, 1500, max_points=1000)
+    assert tier == 'raw'
+    np.testing.assert_array_equal(summary['timestamps'], timestamps[::5])
+    np.testing.assert_array_equal(summary['data'], data[::5])
+
+
+def test_get_summary_coarsest_tier_when_none_fits(saved):
+    file, _, _ = saved
+    with H5Loader(file) as loader:
+        tier, summary = loader.get_summary('spectrum', 1000, 1500, max_points=0)
+    assert tier == '3600s'
+    assert summary['count'].sum() == rows
+
+
+def test_contiguous_as_memmap(tmp_path):
+    file, data, timestamps = write_file(tmp_path, contiguous_rows=2 * rows)
+    with H5Loader(file) as loader:
+        t, d = loader.as_memmap('spectrum')
+        assert isinstance(d, np.memmap) and d.shape == data.shape
+        np.testing.assert_array_equal(t, timestamps)
+        np.testing.assert_array_equal(d, data)
+        np.testing.assert_array_equal(loader.get_range('spectrum', 1010, 1020)[1],
+                                      data[(timestamps >= 1010) & (timestamps <= 1020)])
+
+
+def test_chunked_as_memmap_falls_back(saved):
+    file, data, _ = saved
+    with H5Loader(file) as loader:
+        _, d = loader.as_memmap('spectrum')
+    assert not isinstance(d, np.memmap)
+    np.testing.assert_array_equal(d, data)
+
+
+def test_follow_live_swmr_writer(tmp_path):
+    builder = H5Builder(persistent=True, swmr=True)
+    builder.create_file(file_name='live.h5', root_path=str(tmp_path), devices={'spectrum': spectrum_device()})
+    builder.write_static('axis_only', {'x': np.arange(16.)}, 1000.)  # Static data, no rows
+    builder.start_swmr()
+    data = np.arange(300 * 16, dtype='f4').reshape(300, 16)
+    timestamps = 1000 + np.arange(300) * 0.1
+
+    with H5Loader(builder.file) as loader:
+        assert loader.device_ids() == ['spectrum'] and loader.frame_shape('spectrum') == (16,)
+        written = 0
+        for end in (100, 250, 250, 300):  # Nothing new on the third call
+            if end > written:
+                builder.append_rows('spectrum', data[written:end], timestamps[written:end])
+            new_rows = loader.follow()
+            assert list(new_rows) == ['spectrum']
+            t, d = new_rows['spectrum']
+            np.testing.assert_array_equal(t, timestamps[written:end])
+            np.testing.assert_array_equal(d, data[written:end])
+            written = end
+    builder.close()